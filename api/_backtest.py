@@ -0,0 +1,265 @@
+"""
+Backtest rolling-origin dos forecasters do /api/forecast.
+
+Uso:
+    python _backtest.py --synthetic 40
+    python _backtest.py --fixture series.json --config prophet --config damped_trend
+    python _backtest.py --parquet ../src/market_parquet --max-series 100 \\
+        --config prophet --config "prophet:changepoint_prior_scale=0.2" \\
+        --config "prophet:weekly_seasonality=false" --save-fixture series.json
+
+Para cada série e configuração, refaz o forecast a partir de várias origens
+(as últimas --max-origins, a cada --step pontos, com pelo menos --min-train
+pontos de treino) exatamente como a API faria com o histórico até ali, e
+compara os HORIZON_DAYS dias previstos com os preços observados. Reporta por
+configuração:
+- MAPE dos pontos previstos que têm preço observado;
+- cobertura do intervalo [lower, upper] contra o interval_width nominal;
+- latência de fit + previsão p50/p95/p99 (cada worker faz antes um fit de
+  aquecimento, fora da medição).
+
+Configuração: nome do forecaster (_forecasters.FORECASTERS) e, depois de ':',
+parâmetros que substituem os da API (valores em JSON: 0.1, false, "x").
+
+Fontes de séries (formato do modo batch: {"id": [{"date", "price"}, ...]}):
+- --fixture: arquivo JSON nesse formato;
+- --parquet: export de src/market_parquet.py (mediana diária por carta,
+  idioma e estado de myp_cards_meg);
+- --synthetic: séries sintéticas de _bench_forecasters.py.
+
+Os fits rodam num ProcessPoolExecutor (uma tarefa por série e configuração).
+A latência é medida dentro do worker; com vários workers disputando CPU ela
+sobe, então use --workers 1 quando o custo absoluto importar mais que o tempo
+total do backtest.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _forecast_core import HORIZON_DAYS
+from _forecasters import FORECASTERS
+
+# Silenciar logs do Prophet / cmdstanpy (também nos workers)
+logging.getLogger('cmdstanpy').disabled = True
+logging.getLogger('prophet').disabled = True
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+
+
+def parse_config(spec):
+    """'prophet:changepoint_prior_scale=0.2,weekly_seasonality=false' -> (nome, modelo, params)"""
+    model, _, overrides = spec.partition(':')
+    if model not in FORECASTERS:
+        raise ValueError(f"Modelo desconhecido: {model} (use {', '.join(FORECASTERS)})")
+    params = dict(FORECASTERS[model]['params'])
+    for item in filter(None, (part.strip() for part in overrides.split(','))):
+        key, _, value = item.partition('=')
+        try:
+            params[key.strip()] = json.loads(value)
+        except ValueError:
+            params[key.strip()] = value
+    return spec, model, params
+
+
+def origins(n_points, min_train, step, max_origins):
+    """Tamanhos de treino avaliados: os mais recentes, deixando ao menos um ponto para conferir"""
+    cutoffs = list(range(n_points - 1, min_train - 1, -step))[:max_origins]
+    return cutoffs[::-1]
+
+
+def warm_up(models):
+    """Um fit descartado por modelo: imports e compilação não entram nas latências medidas"""
+    from datetime import date, timedelta
+    series = [{'date': (date(2024, 1, 1) + timedelta(days=i)).isoformat(), 'price': 100.0 + i % 7}
+              for i in range(40)]
+    for model in models:
+        try:
+            FORECASTERS[model]['fit'](series, FORECASTERS[model]['params'])
+        except Exception:
+            pass
+
+
+def backtest_series(config, series_id, series, min_train, step, max_origins, horizon=HORIZON_DAYS):
+    """Todas as origens de uma série numa configuração (roda no worker)"""
+    name, model, params = config
+    fit = FORECASTERS[model]['fit']
+    actual = {str(point['date'])[:10]: float(point['price']) for point in series}
+    result = {'config': name, 'series': series_id, 'latencies': [], 'ape': [], 'covered': [], 'errors': []}
+
+    for cutoff in origins(len(series), min_train, step, max_origins):
+        start = time.perf_counter()
+        try:
+            points, _ = fit(series[:cutoff], params)
+        except Exception as e:
+            result['errors'].append(f"{series_id}@{cutoff}: {e}")
+            continue
+        result['latencies'].append(time.perf_counter() - start)
+        for point in points[:horizon]:
+            observed = actual.get(point['date'])
+            if observed is None or observed <= 0:
+                continue
+            result['ape'].append(abs(point['predicted'] - observed) / observed)
+            result['covered'].append(point['lower'] <= observed <= point['upper'])
+    return result
+
+
+def run(configs, series_by_id, workers, min_train, step, max_origins):
+    """Resultados de todas as tarefas (série x configuração), em paralelo quando workers > 1"""
+    tasks = [(config, series_id, series, min_train, step, max_origins)
+             for config in configs for series_id, series in series_by_id.items()]
+    models = sorted({model for _, model, _ in configs})
+    pool = None
+    if workers > 1 and len(tasks) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        try:
+            pool = ProcessPoolExecutor(max_workers=workers, initializer=warm_up, initargs=(models,))
+        except (OSError, NotImplementedError):
+            pool = None
+    if pool is None:
+        warm_up(models)
+        return [backtest_series(*task) for task in tasks]
+    with pool:
+        futures = [pool.submit(backtest_series, *task) for task in tasks]
+        return [future.result() for future in futures]
+
+
+def summarize(configs, results):
+    """Métricas agregadas por configuração, na ordem de --config"""
+    import numpy as np
+    report = {}
+    for name, model, params in configs:
+        own = [result for result in results if result['config'] == name]
+        latencies = np.array([value for result in own for value in result['latencies']]) * 1000
+        ape = np.array([value for result in own for value in result['ape']])
+        covered = np.array([value for result in own for value in result['covered']])
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if len(latencies) else (None, None, None)
+        report[name] = {
+            'model': model,
+            'params': params,
+            'series': len(own),
+            'fits': int(len(latencies)),
+            'points': int(len(ape)),
+            'mape': float(ape.mean() * 100) if len(ape) else None,
+            'coverage': float(covered.mean()) if len(covered) else None,
+            'nominal_coverage': params.get('interval_width'),
+            'latency_ms': {'p50': p50, 'p95': p95, 'p99': p99,
+                           'mean': float(latencies.mean()) if len(latencies) else None},
+            'cpu_seconds': float(latencies.sum() / 1000),
+            'errors': [error for result in own for error in result['errors']][:20],
+            'error_count': sum(len(result['errors']) for result in own),
+        }
+    return report
+
+
+def load_fixture(path):
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    return data.get('batch', data)
+
+
+def load_parquet(root, min_points, max_series, metric='preco_mediana'):
+    """Mediana (ou outra métrica) diária das variantes com mais dias em myp_cards_meg"""
+    sys.path.insert(0, SRC_DIR)
+    from market_parquet import MarketDataset
+
+    rollup = MarketDataset(root).daily_rollup('myp_cards_meg')
+    if rollup.empty:
+        return {}
+    rollup = rollup.sort_values('dia')
+    groups = rollup.groupby(['carta', 'idioma', 'estado'], observed=True)
+    sizes = groups.size()
+    chosen = sizes[sizes >= min_points].sort_values(ascending=False).head(max_series).index
+    series = {}
+    for key in chosen:
+        rows = groups.get_group(key)
+        series[' | '.join(key)] = [{'date': day.isoformat(), 'price': round(float(price), 2)}
+                                   for day, price in zip(rows['dia'], rows[metric])]
+    return series
+
+
+def load_synthetic(count, length):
+    from _bench_forecasters import synthetic_series
+    series = {}
+    for seed in range(count):
+        train, holdout = synthetic_series(length, seed)
+        series[f"synthetic-{seed}"] = train + holdout
+    return series
+
+
+def _fmt(value, pattern):
+    return pattern.format(value) if value is not None else '-'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--fixture', help='JSON {"id": [{"date", "price"}, ...]}')
+    source.add_argument('--parquet', help='Diretório do export de src/market_parquet.py')
+    source.add_argument('--synthetic', type=int, help='Número de séries sintéticas')
+    parser.add_argument('--config', action='append', help='Forecaster[:param=valor,...] (repetível)')
+    parser.add_argument('--length', type=int, default=90, help='Pontos por série sintética')
+    parser.add_argument('--max-series', type=int, default=50)
+    parser.add_argument('--metric', default='preco_mediana', help='Métrica diária das séries do Parquet')
+    parser.add_argument('--min-train', type=int, default=30)
+    parser.add_argument('--step', type=int, default=7, help='Pontos entre origens')
+    parser.add_argument('--max-origins', type=int, default=8, help='Origens por série')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--output', help='Grava o relatório em JSON')
+    parser.add_argument('--save-fixture', help='Grava as séries usadas como fixture JSON')
+    args = parser.parse_args()
+
+    configs = [parse_config(spec) for spec in (args.config or ['prophet', 'damped_trend'])]
+    if args.fixture:
+        series_by_id = load_fixture(args.fixture)
+    elif args.parquet:
+        series_by_id = load_parquet(args.parquet, args.min_train + 1, args.max_series, args.metric)
+    else:
+        series_by_id = load_synthetic(args.synthetic, args.length)
+    # Ordem cronológica, e só séries com pelo menos uma origem
+    series_by_id = {
+        series_id: sorted(series, key=lambda point: str(point['date']))
+        for series_id, series in list(series_by_id.items())[:args.max_series]
+        if len(series) > args.min_train
+    }
+    if not series_by_id:
+        print(f"[ERROR] Nenhuma série com mais de {args.min_train} pontos")
+        sys.exit(1)
+    if args.save_fixture:
+        with open(args.save_fixture, 'w', encoding='utf-8') as f:
+            json.dump(series_by_id, f)
+
+    print(f"[INFO] {len(series_by_id)} séries, {len(configs)} configurações, até {args.max_origins} origens "
+          f"por série, horizonte {HORIZON_DAYS} dias, {args.workers} workers")
+    start = time.perf_counter()
+    report = summarize(configs, run(configs, series_by_id, args.workers, args.min_train, args.step,
+                                    args.max_origins))
+    elapsed = time.perf_counter() - start
+
+    print("-" * 96)
+    print(f"  {'configuração':<44} {'fits':>5} {'MAPE':>7} {'cobertura':>10} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, metrics in report.items():
+        latency = metrics['latency_ms']
+        coverage = _fmt(metrics['coverage'], '{:.0%}')
+        if metrics['nominal_coverage'] is not None:
+            coverage += f"/{metrics['nominal_coverage']:.0%}"
+        print(f"  {name[:44]:<44} {metrics['fits']:>5} {_fmt(metrics['mape'], '{:.2f}%'):>7} {coverage:>10} "
+              f"{_fmt(latency['p50'], '{:.1f}'):>8} {_fmt(latency['p95'], '{:.1f}'):>8} "
+              f"{_fmt(latency['p99'], '{:.1f}'):>8}")
+        for error in metrics['errors'][:3]:
+            print(f"    [ERROR] {error}")
+    print("-" * 96)
+    print(f"[OK] Backtest concluído em {elapsed:.1f} s")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'horizon_days': HORIZON_DAYS, 'series': len(series_by_id), 'configs': report}, f, indent=2)
+        print(f"[OK] Relatório gravado em {args.output}")
+
+
+if __name__ == "__main__":
+    main()
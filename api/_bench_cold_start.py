@@ -0,0 +1,173 @@
+"""
+Harness de cold start da função /api/forecast.
+
+Uso:
+    python _bench_cold_start.py [--runs 5] [--max-import-ms 150]
+
+Cada rodada sobe um interpretador novo (como uma instância fria do Vercel) e
+mede, em sequência:
+- tempo de `import forecast` e quais módulos pesados ele carregou;
+- OPTIONS (preflight), request inválido (caminho de erro) e acerto de cache,
+  conferindo que nenhum deles importa numpy/pandas/prophet;
+- primeiro POST (damped_trend e prophet, pagando os imports) e POSTs quentes.
+
+Sai com código 1 se algum orçamento for violado, para uso em CI.
+"""
+import argparse
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+API_DIR = os.path.dirname(os.path.abspath(__file__))
+HEAVY_MODULES = ('numpy', 'pandas', 'prophet', 'multiprocessing')
+
+
+def _series(n_points, offset=0.0):
+    return [{'date': f"2024-{1 + i // 28:02d}-{1 + i % 28:02d}", 'price': 100 + offset + i * 0.3 + (i % 7)}
+            for i in range(n_points)]
+
+
+def _heavy_loaded():
+    return [name for name in HEAVY_MODULES if name in sys.modules]
+
+
+def _call(handler_cls, method, payload=None):
+    """Executa o handler sem socket; retorna (latência em ms, corpo JSON ou None)"""
+    body = json.dumps(payload).encode() if payload is not None else b''
+
+    class Request(handler_cls):
+        def __init__(self):
+            self.rfile = io.BytesIO(body)
+            self.wfile = io.BytesIO()
+            self.headers = {'Content-Length': str(len(body))}
+            self.request_version = 'HTTP/1.1'
+            self.requestline = f'{method} /api/forecast HTTP/1.1'
+            self.command = method
+            self.client_address = ('127.0.0.1', 0)
+
+        def log_message(self, *args):
+            pass
+
+    request = Request()
+    start = time.perf_counter()
+    getattr(request, f'do_{method}')()
+    elapsed = (time.perf_counter() - start) * 1000
+    response = request.wfile.getvalue().split(b'\r\n\r\n', 1)[1]
+    return elapsed, json.loads(response) if response else None
+
+
+def child():
+    """Uma instância fria: imprime as medições em JSON"""
+    import logging
+    sys.path.insert(0, API_DIR)
+    # Sem diretório em disco: o cache precisa começar vazio em toda rodada
+    os.environ.pop('FORECAST_CACHE_DIR', None)
+
+    start = time.perf_counter()
+    import forecast
+    result = {'import_ms': (time.perf_counter() - start) * 1000, 'import_heavy': _heavy_loaded()}
+
+    result['options_ms'], _ = _call(forecast.handler, 'OPTIONS')
+    result['error_ms'], _ = _call(forecast.handler, 'POST', {'historical': []})
+    result['light_paths_heavy'] = _heavy_loaded()
+
+    short, long_ = _series(20), _series(90)
+    result['first_damped_ms'], _ = _call(forecast.handler, 'POST', {'historical': short})
+    logging.getLogger('cmdstanpy').disabled = True
+    result['first_prophet_ms'], _ = _call(forecast.handler, 'POST', {'historical': long_})
+
+    # O acerto de cache numa instância fria é medido em cache_hit_child
+    result['warm_hit_ms'], body = _call(forecast.handler, 'POST', {'historical': long_})
+    result['warm_hit_cached'] = body['cached']
+    result['warm_damped_ms'], _ = _call(forecast.handler, 'POST', {'historical': _series(20, offset=1)})
+    result['warm_prophet_ms'], _ = _call(forecast.handler, 'POST', {'historical': _series(90, offset=1)})
+    print(json.dumps(result))
+
+
+def cache_hit_child():
+    """Instância fria servindo um acerto do cache em disco: não pode importar nada pesado"""
+    sys.path.insert(0, API_DIR)
+    import forecast
+    start = time.perf_counter()
+    _, body = _call(forecast.handler, 'POST', {'historical': _series(90)})
+    print(json.dumps({
+        'cold_hit_ms': (time.perf_counter() - start) * 1000,
+        'cold_hit_cached': body['cached'],
+        'cold_hit_heavy': _heavy_loaded()
+    }))
+
+
+def run_child(mode, env=None):
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), mode],
+        capture_output=True, text=True, check=True, env={**os.environ, **(env or {})}
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-import-ms', type=float, default=150.0)
+    args = parser.parse_args()
+
+    runs = [run_child('--child') for _ in range(args.runs)]
+
+    # Cache em disco populado por uma instância e lido por outra, fria
+    with tempfile.TemporaryDirectory() as cache_dir:
+        env = {'FORECAST_CACHE_DIR': cache_dir}
+        subprocess.run(
+            [sys.executable, '-c', 'import sys, logging; sys.path.insert(0, sys.argv[1]); '
+             'logging.getLogger("cmdstanpy").disabled = True; import forecast, _bench_cold_start as b; '
+             'b._call(forecast.handler, "POST", {"historical": b._series(90)})', API_DIR],
+            check=True, capture_output=True, env={**os.environ, **env}
+        )
+        cold_hit = run_child('--cache-hit-child', env)
+
+    def median(name):
+        return statistics.median(run[name] for run in runs)
+
+    print("-" * 60)
+    print(f"  import forecast:          {median('import_ms'):8.1f} ms")
+    print(f"  OPTIONS:                  {median('options_ms'):8.1f} ms")
+    print(f"  POST inválido:            {median('error_ms'):8.1f} ms")
+    print(f"  Acerto de cache (frio):   {cold_hit['cold_hit_ms']:8.1f} ms")
+    print(f"  1º POST damped_trend:     {median('first_damped_ms'):8.1f} ms")
+    print(f"  1º POST prophet:          {median('first_prophet_ms'):8.1f} ms")
+    print(f"  POST quente (cache):      {median('warm_hit_ms'):8.1f} ms")
+    print(f"  POST quente damped_trend: {median('warm_damped_ms'):8.1f} ms")
+    print(f"  POST quente prophet:      {median('warm_prophet_ms'):8.1f} ms")
+    print("-" * 60)
+
+    failures = []
+    if median('import_ms') > args.max_import_ms:
+        failures.append(f"import forecast levou {median('import_ms'):.1f} ms (limite {args.max_import_ms:.0f} ms)")
+    for run in runs:
+        if run['import_heavy']:
+            failures.append(f"import forecast carregou {run['import_heavy']}")
+        if run['light_paths_heavy']:
+            failures.append(f"OPTIONS/erro carregaram {run['light_paths_heavy']}")
+        if not run['warm_hit_cached']:
+            failures.append("POST repetido não veio do cache")
+    if cold_hit['cold_hit_heavy'] or not cold_hit['cold_hit_cached']:
+        failures.append(f"acerto de cache frio carregou {cold_hit['cold_hit_heavy']}")
+
+    for failure in sorted(set(failures)):
+        print(f"[ERROR] {failure}")
+    if failures:
+        sys.exit(1)
+    print("[OK] Cold start dentro do orçamento")
+
+
+if __name__ == "__main__":
+    if '--child' in sys.argv:
+        child()
+    elif '--cache-hit-child' in sys.argv:
+        cache_hit_child()
+    else:
+        main()
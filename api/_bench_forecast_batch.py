@@ -0,0 +1,72 @@
+"""
+Benchmark: forecast em batch (ProcessPoolExecutor) vs um card por request.
+
+Uso:
+    python _bench_forecast_batch.py [--cards 32] [--points 120] [--workers 1 2 4]
+
+O caminho "um por request" chama fit_forecast sequencialmente, como o
+dashboard faz hoje com N POSTs; o cache é limpo entre as rodadas para que
+todos os fits sejam medidos.
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import forecast
+from _forecasters import fit_forecast
+
+# Silenciar logs do Prophet / cmdstanpy
+logging.getLogger('cmdstanpy').disabled = True
+logging.getLogger('prophet').disabled = True
+
+
+def synthetic_series(n_points, seed):
+    rng = random.Random(seed)
+    start = date(2024, 1, 1)
+    price = rng.uniform(20, 500)
+    series = []
+    for i in range(n_points):
+        price = max(1.0, price * (1 + rng.gauss(0.001, 0.02)))
+        series.append({'date': (start + timedelta(days=i)).isoformat(), 'price': round(price, 2)})
+    return series
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cards', type=int, default=32)
+    parser.add_argument('--points', type=int, default=120)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    batch = {f"card-{i}": synthetic_series(args.points, i) for i in range(args.cards)}
+
+    print(f"[INFO] {args.cards} cards, {args.points} pontos cada, {os.cpu_count()} CPUs")
+    print("-" * 60)
+
+    start = time.perf_counter()
+    for historical in batch.values():
+        fit_forecast(historical, 'prophet')
+    sequential = time.perf_counter() - start
+    print(f"  Um card por request:   {sequential:7.2f} s  {args.cards / sequential:6.2f} cards/s")
+
+    for workers in sorted(set(args.workers)):
+        forecast.cache._entries.clear()
+        start = time.perf_counter()
+        forecasts, errors, _, _ = forecast.batch_forecast(batch, workers=workers, model='prophet')
+        elapsed = time.perf_counter() - start
+        print(f"  Batch, {workers:2d} workers:    {elapsed:7.2f} s  {args.cards / elapsed:6.2f} cards/s"
+              f"  ({sequential / elapsed:.1f}x, {len(errors)} erros)")
+
+    start = time.perf_counter()
+    forecast.batch_forecast(batch, model='prophet')
+    print(f"  Batch, cache quente:   {time.perf_counter() - start:7.2f} s")
+    print("-" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark: Prophet vs damped_trend (NumPy) em latência e erro.
+
+Uso:
+    python _bench_forecasters.py [--series 20] [--lengths 10 20 30 60 120]
+
+Para cada tamanho de série, gera séries sintéticas (tendência + ruído +
+padrão semanal), separa os últimos HORIZON_DAYS dias como holdout e mede
+o tempo de fit + previsão, o MAPE e a cobertura do intervalo de cada modelo.
+"""
+import argparse
+import logging
+import math
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _forecast_core import HORIZON_DAYS
+from _forecasters import FORECASTERS, MIN_PROPHET_POINTS, fit_forecast
+
+# Silenciar logs do Prophet / cmdstanpy
+logging.getLogger('cmdstanpy').disabled = True
+logging.getLogger('prophet').disabled = True
+
+
+def synthetic_series(n_points, seed):
+    rng = random.Random(seed)
+    start = date(2024, 1, 1)
+    base = rng.uniform(20, 500)
+    drift = rng.gauss(0.002, 0.004)
+    series = []
+    for i in range(n_points + HORIZON_DAYS):
+        weekly = 1 + 0.02 * math.sin(2 * math.pi * i / 7)
+        price = base * (1 + drift) ** i * weekly * (1 + rng.gauss(0, 0.02))
+        series.append({'date': (start + timedelta(days=i)).isoformat(), 'price': round(price, 2)})
+    return series[:n_points], series[n_points:]
+
+
+def evaluate(model, train, holdout):
+    start = time.perf_counter()
+    points, _ = fit_forecast(train, model)
+    elapsed = time.perf_counter() - start
+    actual = [p['price'] for p in holdout]
+    ape = [abs(f['predicted'] - a) / a for f, a in zip(points, actual)]
+    covered = [f['lower'] <= a <= f['upper'] for f, a in zip(points, actual)]
+    return elapsed, sum(ape) / len(ape), sum(covered) / len(covered)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--series', type=int, default=20)
+    parser.add_argument('--lengths', type=int, nargs='+', default=[10, 20, 30, 60, 120])
+    args = parser.parse_args()
+
+    print(f"[INFO] {args.series} séries por tamanho; Prophet é o padrão a partir de {MIN_PROPHET_POINTS} pontos")
+    print("-" * 72)
+    print(f"  {'pontos':>6}  {'modelo':<13} {'latência (ms)':>14} {'MAPE':>8} {'cobertura':>10}")
+    for length in args.lengths:
+        for model in FORECASTERS:
+            latencies, mapes, coverages = [], [], []
+            for seed in range(args.series):
+                train, holdout = synthetic_series(length, seed)
+                elapsed, mape, coverage = evaluate(model, train, holdout)
+                latencies.append(elapsed)
+                mapes.append(mape)
+                coverages.append(coverage)
+            print(f"  {length:>6}  {model:<13} {1000 * sum(latencies) / len(latencies):>14.1f}"
+                  f" {100 * sum(mapes) / len(mapes):>7.2f}% {100 * sum(coverages) / len(coverages):>9.1f}%")
+    print("-" * 72)
+
+
+if __name__ == "__main__":
+    main()
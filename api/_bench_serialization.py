@@ -0,0 +1,183 @@
+"""
+Microbenchmarks da serialização do /api/forecast.
+
+Uso:
+    python _bench_serialization.py [--rows 7 365 5000] [--cards 200] [--stream-cards 8] [--model prophet]
+
+Mede, conferindo antes que as saídas são iguais às do caminho anterior:
+- DataFrame -> pontos: iterrows() + strftime/float por linha vs
+  frame_records (coluna a coluna), em frames com --rows linhas;
+- resposta batch com --cards cards: json.dumps(...).encode() vs dumps
+  (orjson quando instalado);
+- modo batch pelo handler com --stream-cards cards (cache limpo): tempo até
+  o primeiro byte e total, resposta JSON única vs NDJSON em streaming.
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import _serialization
+import forecast
+from _bench_forecast_batch import synthetic_series
+from _forecast_core import FORECAST_FIELDS
+from _serialization import NDJSON_CONTENT_TYPE, dumps, frame_records
+
+# Silenciar logs do Prophet / cmdstanpy
+logging.getLogger('cmdstanpy').disabled = True
+logging.getLogger('prophet').disabled = True
+
+
+def forecast_frame(rows):
+    """Frame com as colunas do predict() do Prophet"""
+    import numpy as np
+    import pandas as pd
+    rng = np.random.default_rng(rows)
+    yhat = 100 + rng.normal(0, 5, rows).cumsum()
+    return pd.DataFrame({
+        'ds': pd.date_range('2024-01-01', periods=rows, freq='D'),
+        'yhat': yhat,
+        'yhat_lower': yhat - 10,
+        'yhat_upper': yhat + 10,
+        'trend': yhat,
+    })
+
+
+def iterrows_points(frame):
+    """Caminho anterior de fit_prophet"""
+    return [
+        {
+            'date': row['ds'].strftime('%Y-%m-%d'),
+            'predicted': float(row['yhat']),
+            'lower': float(row['yhat_lower']),
+            'upper': float(row['yhat_upper'])
+        }
+        for _, row in frame.iterrows()
+    ]
+
+
+def timed(fn, min_seconds=0.2):
+    """Melhor tempo por chamada, repetindo até somar min_seconds"""
+    best, total, result = float('inf'), 0.0, None
+    while total < min_seconds or best == float('inf'):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best, total = min(best, elapsed), total + elapsed
+    return best, result
+
+
+class TimedWriter(io.BytesIO):
+    """wfile que anota o instante da primeira escrita do corpo"""
+
+    def __init__(self):
+        super().__init__()
+        self.first_byte = None
+
+    def write(self, data):
+        if self.first_byte is None and self.tell() and not data.startswith(b'HTTP/'):
+            self.first_byte = time.perf_counter()
+        return super().write(data)
+
+
+def post(payload, accept=None):
+    """POST no handler sem socket; retorna (primeiro byte s, total s, corpo)"""
+    body = json.dumps(payload).encode()
+
+    class Request(forecast.handler):
+        def __init__(self):
+            self.rfile = io.BytesIO(body)
+            self.wfile = TimedWriter()
+            self.headers = {'Content-Length': str(len(body)), 'Accept': accept or 'application/json'}
+            self.request_version = 'HTTP/1.1'
+            self.requestline = 'POST /api/forecast HTTP/1.1'
+            self.command = 'POST'
+            self.client_address = ('127.0.0.1', 0)
+
+        def log_message(self, *args):
+            pass
+
+    request = Request()
+    start = time.perf_counter()
+    request.do_POST()
+    total = time.perf_counter() - start
+    response = request.wfile.getvalue().split(b'\r\n\r\n', 1)[1]
+    return request.wfile.first_byte - start, total, response
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[7, 365, 5000])
+    parser.add_argument('--cards', type=int, default=200, help='Cards da resposta batch serializada')
+    parser.add_argument('--stream-cards', type=int, default=8, help='Cards do batch pelo handler')
+    parser.add_argument('--points', type=int, default=60, help='Pontos por série do batch pelo handler')
+    parser.add_argument('--model', default='prophet')
+    args = parser.parse_args()
+
+    failures = []
+    encoder = 'orjson' if _serialization.orjson is not None else 'json (orjson não instalado)'
+    print(f"[INFO] Encoder: {encoder}")
+    print("-" * 72)
+
+    for rows in args.rows:
+        frame = forecast_frame(rows)
+        old, expected = timed(lambda: iterrows_points(frame))
+        new, points = timed(lambda: frame_records(frame, FORECAST_FIELDS))
+        if points != expected:
+            failures.append(f"frame_records difere de iterrows ({rows} linhas)")
+        print(f"  pontos, {rows:>5} linhas  iterrows {old * 1000:9.3f} ms   colunas {new * 1000:9.3f} ms"
+              f"  ({old / new:5.1f}x)")
+
+    points = frame_records(forecast_frame(7), FORECAST_FIELDS)
+    result = {
+        'forecasts': {f"card-{i}": points for i in range(args.cards)},
+        'errors': {},
+        'cached': [f"card-{i}" for i in range(0, args.cards, 2)],
+        'models': {f"card-{i}": 'prophet' for i in range(args.cards)},
+        'success': True,
+        'message': f'{args.cards} forecasts gerados, 0 com erro'
+    }
+    old, expected = timed(lambda: json.dumps(result).encode())
+    new, encoded = timed(lambda: dumps(result))
+    if json.loads(encoded) != json.loads(expected):
+        failures.append("dumps difere de json.dumps")
+    print(f"  resposta, {args.cards:>4} cards  json.dumps {old * 1000:7.3f} ms   dumps {new * 1000:9.3f} ms"
+          f"  ({old / new:5.1f}x, {len(encoded) / 1024:.0f} KB)")
+
+    payload = {
+        'batch': {f"card-{i}": synthetic_series(args.points, i) for i in range(args.stream_cards)},
+        'model': args.model
+    }
+    post({'historical': payload['batch']['card-0'], 'model': args.model})  # imports fora da medição
+    forecast.cache._entries.clear()
+    first, total, body = post(payload)
+    batch = json.loads(body)
+    forecast.cache._entries.clear()
+    stream_first, stream_total, stream_body = post(payload, accept=NDJSON_CONTENT_TYPE)
+    lines = [json.loads(line) for line in stream_body.splitlines()]
+    streamed = {line['card_id']: line['forecast'] for line in lines if 'forecast' in line}
+
+    def central(forecasts):
+        # lower/upper do Prophet vêm de amostragem aleatória; a previsão central é determinística
+        return {card_id: [(p['date'], p['predicted']) for p in points] for card_id, points in forecasts.items()}
+
+    if central(streamed) != central(batch['forecasts']) or not lines[-1].get('done'):
+        failures.append("NDJSON difere da resposta batch")
+    print(f"  batch, {args.stream_cards:>2} cards {args.model:<12}  JSON: 1º byte {first * 1000:7.0f} ms, "
+          f"total {total * 1000:7.0f} ms")
+    print(f"  {'':<27}  NDJSON: 1º byte {stream_first * 1000:5.0f} ms, total {stream_total * 1000:7.0f} ms")
+    print("-" * 72)
+
+    if failures:
+        for failure in failures:
+            print(f"[ERROR] {failure}")
+        sys.exit(1)
+    print("[OK] Saídas iguais às do caminho anterior")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Cache de forecasts para /api/forecast.
+
+- Chave: sha256 da série `historical` + parâmetros do modelo.
+- Memória: LRU com TTL (sobrevive entre requests enquanto a função estiver quente).
+- Disco (opcional): JSON em FORECAST_CACHE_DIR, ex. /tmp no Vercel.
+- Warm start: guarda os parâmetros Stan de cada fit para reaproveitar (`init=`)
+  quando a mesma série chega de novo com poucos pontos a mais.
+
+Arquivos com prefixo `_` não viram endpoints no Vercel.
+"""
+import hashlib
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Namespaces dentro do cache
+FORECASTS = 'forecast'
+WARM_PARAMS = 'warm'
+
+logger = logging.getLogger(__name__)
+
+
+def env_number(name, default, cast=int, minimum=0):
+    """
+    Variável de ambiente numérica; vazia, inválida ou abaixo de minimum vira
+    default com um aviso, em vez de derrubar o import (cold start) da função.
+    """
+    raw = os.getenv(name)
+    if raw is None or not raw.strip():
+        return default
+    try:
+        value = cast(raw)
+    except ValueError:
+        value = None
+    if value is None or not math.isfinite(value) or value < minimum:
+        logger.warning("%s=%r inválido; usando %s", name, raw, default)
+        return default
+    return value
+
+
+def _points(historical):
+    """Normaliza a série para pares [data, preço] na ordem recebida"""
+    return [list(point.values())[:2] for point in historical]
+
+
+def series_keys(historical, params, max_new_points=0):
+    """
+    Retorna (chave_completa, chaves_de_prefixo).
+
+    As chaves de prefixo são as das séries sem os últimos 1..max_new_points
+    pontos (da mais longa para a mais curta), calculadas num único passe
+    copiando o estado do hash.
+    """
+    points = _points(historical)
+    digest = hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode())
+
+    first_prefix = max(len(points) - max_new_points, 1)
+    prefixes = []
+    for i, point in enumerate(points, 1):
+        digest.update(json.dumps(point, default=str).encode())
+        if first_prefix <= i < len(points):
+            prefixes.append(digest.copy().hexdigest())
+
+    return digest.hexdigest(), prefixes[::-1]
+
+
+class ForecastCache:
+    def __init__(self, max_entries=256, ttl=3600, disk_dir=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_entries=env_number('FORECAST_CACHE_SIZE', 256, int, minimum=1),
+            ttl=env_number('FORECAST_CACHE_TTL', 3600.0, float),
+            disk_dir=os.getenv('FORECAST_CACHE_DIR') or None
+        )
+
+    def get(self, key, namespace=FORECASTS):
+        entry_key = (namespace, key)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(entry_key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(entry_key)
+                    return value
+                del self._entries[entry_key]
+
+        value, expires_at = self._read_disk(namespace, key, now)
+        if value is not None:
+            self._store(entry_key, value, expires_at)
+        return value
+
+    def put(self, key, value, namespace=FORECASTS):
+        expires_at = time.time() + self.ttl
+        self._store((namespace, key), value, expires_at)
+        self._write_disk(namespace, key, value, expires_at)
+
+    def _store(self, entry_key, value, expires_at):
+        with self._lock:
+            self._entries[entry_key] = (expires_at, value)
+            self._entries.move_to_end(entry_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _path(self, namespace, key):
+        return os.path.join(self.disk_dir, f"{namespace}-{key}.json")
+
+    def _read_disk(self, namespace, key, now):
+        if not self.disk_dir:
+            return None, None
+        path = self._path(namespace, key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None, None
+        if entry['expires_at'] <= now:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None, None
+        return entry['value'], entry['expires_at']
+
+    def _write_disk(self, namespace, key, value, expires_at):
+        if not self.disk_dir:
+            return
+        path = self._path(namespace, key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump({'expires_at': expires_at, 'value': value}, f)
+            os.replace(tmp_path, path)
+        except OSError:
+            # Disco é só uma camada extra; falhas não podem derrubar o request
+            pass
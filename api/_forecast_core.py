@@ -0,0 +1,78 @@
+"""
+Fit do Prophet usado por /api/forecast.
+
+Fica fora de forecast.py para que os workers do ProcessPoolExecutor do modo
+batch importem as funções por um nome estável. A escolha entre Prophet e o
+modelo leve fica em _forecasters.py.
+
+pandas/prophet são importados dentro de fit_prophet: o import deles domina o
+cold start e não deve ser pago por OPTIONS, erros ou acertos de cache.
+"""
+import math
+
+from _serialization import frame_records
+
+# Configuração do modelo Prophet
+MODEL_PARAMS = {
+    'daily_seasonality': False,
+    'weekly_seasonality': True,
+    'yearly_seasonality': False,
+    'interval_width': 0.95,  # 95% intervalo de confiança
+    'changepoint_prior_scale': 0.05  # Sensibilidade a mudanças de tendência
+}
+HORIZON_DAYS = 7
+
+# Pontos do forecast: {chave no JSON: coluna do predict() do Prophet}
+FORECAST_FIELDS = {'date': 'ds', 'predicted': 'yhat', 'lower': 'yhat_lower', 'upper': 'yhat_upper'}
+
+
+def expected_changepoints(n_points, n_changepoints=25, changepoint_range=0.8):
+    """Tamanho de `delta` que o Prophet vai usar para uma série com n_points"""
+    hist_size = int(math.floor(n_points * changepoint_range))
+    if n_changepoints + 1 > hist_size:
+        n_changepoints = hist_size - 1
+    return max(n_changepoints, 1)
+
+
+def stan_init(model):
+    """Parâmetros do fit anterior no formato aceito por `Prophet.fit(init=...)`"""
+    params = {}
+    for name in ['k', 'm', 'sigma_obs']:
+        params[name] = float(model.params[name][0][0])
+    for name in ['delta', 'beta']:
+        params[name] = model.params[name][0].tolist()
+    return params
+
+
+def fit_prophet(historical, params=MODEL_PARAMS, init=None):
+    """Treina o Prophet e retorna (forecast, parâmetros Stan do fit)"""
+    import numpy as np
+    import pandas as pd
+    from prophet import Prophet
+
+    # Formato esperado: [{"date": "2024-01-01", "price": 100}, ...]
+    df = pd.DataFrame(historical)
+    df.columns = ['ds', 'y']  # Prophet requer essas colunas específicas
+    df['ds'] = pd.to_datetime(df['ds'])
+
+    # O warm start só vale se o número de changepoints não mudou
+    if init is not None and len(init['delta']) != expected_changepoints(len(df)):
+        init = None
+
+    model = Prophet(**params)
+    if init is not None:
+        init = {name: np.asarray(value) if isinstance(value, list) else value for name, value in init.items()}
+        model.fit(df, init=init)
+    else:
+        model.fit(df)
+
+    # Fazer previsão para os próximos dias
+    future = model.make_future_dataframe(periods=HORIZON_DAYS)
+    forecast = model.predict(future)
+
+    # Pegar apenas os últimos dias (forecast)
+    forecast_data = forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']].tail(HORIZON_DAYS)
+
+    # Converter para formato JSON-friendly, coluna a coluna
+    points = frame_records(forecast_data, FORECAST_FIELDS)
+    return points, stan_init(model)
@@ -0,0 +1,125 @@
+"""
+Camada de forecasters do /api/forecast.
+
+Todos seguem o mesmo contrato: fit(historical, params, init=None) retorna
+(forecast, parâmetros para warm start ou None), com forecast no formato
+[{"date", "predicted", "lower", "upper"}, ...].
+
+- prophet: modelo completo, para séries com pelo menos MIN_PROPHET_POINTS pontos.
+- damped_trend: suavização exponencial com tendência amortecida (ETS A,Ad,N)
+  em NumPy; roda em milissegundos e é mais estável em séries curtas/esparsas.
+
+NumPy e Prophet só são importados quando um fit realmente acontece.
+"""
+from datetime import date, timedelta
+from functools import lru_cache
+from statistics import NormalDist
+
+from _forecast_core import HORIZON_DAYS, MODEL_PARAMS, fit_prophet
+
+# Séries com menos pontos que isso usam o modelo leve
+MIN_PROPHET_POINTS = 30
+
+DAMPED_TREND_PARAMS = {
+    'interval_width': MODEL_PARAMS['interval_width']
+}
+
+# Grade de busca (alpha, beta/alpha, phi) avaliada de uma vez, vetorizada
+ALPHAS = [0.05, 0.15, 0.25, 0.35, 0.45, 0.55, 0.65, 0.75, 0.85, 0.95]
+BETA_RATIOS = [0.01, 0.05, 0.1, 0.3, 0.6]
+PHIS = [0.8, 0.9, 0.95, 0.98]
+
+
+@lru_cache(maxsize=1)
+def _grid():
+    """Arrays (alpha, beta, phi) com todas as combinações da grade"""
+    import numpy as np
+    alpha, ratio, phi = [g.ravel() for g in np.meshgrid(ALPHAS, BETA_RATIOS, PHIS, indexing='ij')]
+    return alpha, alpha * ratio, phi
+
+
+def _parse_date(value):
+    return date.fromisoformat(str(value)[:10])
+
+
+def _daily_series(historical):
+    """Série em grade diária: médias por dia + interpolação linear dos buracos"""
+    if not historical:
+        raise ValueError('Série histórica vazia')
+    import numpy as np
+    points = [list(point.values())[:2] for point in historical]
+    days = np.array([_parse_date(d).toordinal() for d, _ in points])
+    prices = np.array([float(p) for _, p in points])
+
+    unique_days, inverse = np.unique(days, return_inverse=True)
+    means = np.bincount(inverse, weights=prices) / np.bincount(inverse)
+    grid = np.arange(unique_days[0], unique_days[-1] + 1)
+    return grid, np.interp(grid, unique_days, means)
+
+
+def fit_damped_trend(historical, params=DAMPED_TREND_PARAMS, init=None):
+    """ETS(A,Ad,N) com parâmetros escolhidos por SSE numa grade vetorizada"""
+    grid, y = _daily_series(historical)
+    import numpy as np
+
+    n = len(y)
+    alphas, betas, phis = _grid()
+
+    # Estado inicial igual para todas as combinações da grade
+    level = np.full(alphas.shape, y[0])
+    trend = np.full(alphas.shape, y[1] - y[0] if n > 1 else 0.0)
+    sse = np.zeros(alphas.shape)
+    for t in range(1, n):
+        error = y[t] - (level + phis * trend)
+        sse += error ** 2
+        level = level + phis * trend + alphas * error
+        trend = phis * trend + betas * error
+
+    best = int(np.argmin(sse))
+    alpha, beta, phi = alphas[best], betas[best], phis[best]
+    sigma = np.sqrt(sse[best] / max(n - 1, 1))
+
+    # phi_h = phi + phi^2 + ... + phi^h
+    h = np.arange(1, HORIZON_DAYS + 1)
+    phi_h = np.cumsum(phi ** h)
+    predicted = level[best] + phi_h * trend[best]
+
+    # Variância h passos à frente: sigma^2 * (1 + sum_{j<h} (alpha + beta * phi_j)^2)
+    c = alpha + beta * phi_h[:-1]
+    variance_factor = 1 + np.concatenate(([0.0], np.cumsum(c ** 2)))
+    z = NormalDist().inv_cdf((1 + params['interval_width']) / 2)
+    margin = z * sigma * np.sqrt(variance_factor)
+
+    last_day = date.fromordinal(int(grid[-1]))
+    dates = [(last_day + timedelta(days=step)).isoformat() for step in h.tolist()]
+    points = [
+        {'date': day, 'predicted': p, 'lower': lower, 'upper': upper}
+        for day, p, lower, upper in zip(dates, predicted.tolist(), (predicted - margin).tolist(),
+                                        (predicted + margin).tolist())
+    ]
+    return points, None
+
+
+FORECASTERS = {
+    'prophet': {'fit': fit_prophet, 'params': MODEL_PARAMS},
+    'damped_trend': {'fit': fit_damped_trend, 'params': DAMPED_TREND_PARAMS},
+}
+
+
+def choose_model(historical, requested=None):
+    """Modelo pedido no request ou, em 'auto', o adequado ao tamanho da série"""
+    if requested in (None, 'auto'):
+        return 'prophet' if len(historical) >= MIN_PROPHET_POINTS else 'damped_trend'
+    if requested not in FORECASTERS:
+        raise ValueError(f"Modelo desconhecido: {requested}")
+    return requested
+
+
+def cache_params(model):
+    """Parâmetros que entram na chave do cache"""
+    return {'model': model, **FORECASTERS[model]['params']}
+
+
+def fit_forecast(historical, model, init=None):
+    forecaster = FORECASTERS[model]
+    return forecaster['fit'](historical, forecaster['params'], init=init)
@@ -0,0 +1,88 @@
+"""
+Serialização JSON do /api/forecast.
+
+- dumps(): bytes UTF-8; usa orjson quando instalado e cai no json da stdlib
+  quando não. Para o que o forecast serializa (str, números, listas, dicts
+  com chaves str, NumPy, datas) os dois geram o mesmo JSON, byte a byte
+  exceto o expoente de floats muito grandes ou pequenos (1e20 vs 1e+20);
+  NaN e Infinity não são JSON válido e saem como null nos dois.
+- frame_records(): DataFrame -> [{...}] coluna a coluna, com as datas
+  formatadas de uma vez por `.dt.strftime` e os números por `.tolist()`, no
+  lugar de iterrows() + strftime/float linha a linha.
+- ndjson(): registros em NDJSON (um JSON por linha), para o modo batch em
+  streaming.
+
+Fica fora de forecast.py porque também roda nos workers do modo batch
+(_forecast_core.fit_prophet). Não importa pandas: frame_records recebe o
+DataFrame pronto.
+"""
+import json
+import math
+
+try:
+    import orjson
+except ImportError:  # Opcional: a stdlib abaixo é mais lenta
+    orjson = None
+
+DATE_FORMAT = '%Y-%m-%d'
+
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+
+
+def _default(value):
+    """Tipos que nenhum dos encoders trata sozinho (NumPy, datas)"""
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    raise TypeError(f"Tipo não serializável em JSON: {type(value).__name__}")
+
+
+if orjson is not None:
+    def dumps(obj):
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+else:
+    def _finite(obj):
+        """obj com NaN / Infinity trocados por None, como o orjson escreve"""
+        if isinstance(obj, float):
+            return obj if math.isfinite(obj) else None
+        if isinstance(obj, dict):
+            return {key: _finite(value) for key, value in obj.items()}
+        if isinstance(obj, (list, tuple)):
+            return [_finite(value) for value in obj]
+        return obj
+
+    _encoder = json.JSONEncoder(default=lambda value: _finite(_default(value)), ensure_ascii=False,
+                                separators=(',', ':'), allow_nan=False)
+
+    def dumps(obj):
+        try:
+            text = _encoder.encode(obj)
+        except ValueError:
+            # Algum float não finito: copia a estrutura com None no lugar
+            text = _encoder.encode(_finite(obj))
+        return text.encode('utf-8')
+
+
+def frame_records(frame, fields, date_format=DATE_FORMAT):
+    """
+    Linhas do DataFrame como dicts, convertidas por coluna.
+
+    fields: {chave no JSON: coluna}; colunas datetime viram texto em
+    date_format, as demais viram tipos Python (float, int, str).
+    """
+    columns = []
+    for column in fields.values():
+        values = frame[column]
+        if values.dtype.kind == 'M':
+            values = values.dt.strftime(date_format)
+        columns.append(values.tolist())
+    keys = tuple(fields)
+    return [dict(zip(keys, row)) for row in zip(*columns)]
+
+
+def ndjson(records):
+    """Registros como um bloco NDJSON (um por linha, terminando em '\\n')"""
+    if not records:
+        return b''
+    return b'\n'.join(map(dumps, records)) + b'\n'
@@ -1,65 +1,198 @@
 from http.server import BaseHTTPRequestHandler
 import json
-import pandas as pd
-from prophet import Prophet
-from datetime import datetime, timedelta
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _forecast_cache import ForecastCache, WARM_PARAMS, series_keys
+from _forecasters import cache_params, choose_model, fit_forecast
+from _serialization import NDJSON_CONTENT_TYPE, dumps, ndjson
+
+# Warm start só quando a série ganhou no máximo esse número de pontos
+WARM_START_MAX_NEW_POINTS = 7
+
+# Vive enquanto a função estiver quente; ver _forecast_cache.py
+cache = ForecastCache.from_env()
+
+
+# Workers do modo batch (limitado ao número de CPUs)
+MAX_WORKERS = os.cpu_count() or 1
+
+
+def worker_count(value, default=MAX_WORKERS):
+    """value como inteiro em [1, MAX_WORKERS]; vazio ou inválido vira default"""
+    try:
+        workers = int(value)
+    except (TypeError, ValueError):
+        workers = default
+    return max(1, min(workers, MAX_WORKERS))
+
+
+# FORECAST_WORKERS inválido não pode derrubar o import da função
+DEFAULT_WORKERS = worker_count(os.getenv('FORECAST_WORKERS'))
+
+
+def lookup(historical, model):
+    """Consulta o cache; retorna (chave, forecast ou None, init do warm start)"""
+    key, prefix_keys = series_keys(historical, cache_params(model), WARM_START_MAX_NEW_POINTS)
+
+    points = cache.get(key)
+    if points is not None:
+        return key, points, None
+
+    # Mesma série com poucos pontos novos: parte dos parâmetros do fit anterior
+    for prefix_key in prefix_keys:
+        init = cache.get(prefix_key, namespace=WARM_PARAMS)
+        if init is not None:
+            return key, None, init
+    return key, None, None
+
+
+def store(key, points, fitted_params):
+    cache.put(key, points)
+    if fitted_params is not None:
+        cache.put(key, fitted_params, namespace=WARM_PARAMS)
+
+
+def cached_forecast(historical, model=None):
+    """Forecast com cache; retorna (forecast, veio_do_cache, modelo)"""
+    model = choose_model(historical, model)
+    key, points, init = lookup(historical, model)
+    if points is not None:
+        return points, True, model
+
+    points, fitted_params = fit_forecast(historical, model, init=init)
+    store(key, points, fitted_params)
+    return points, False, model
+
+
+def iter_batch_forecast(series_by_card, workers=None, model=None):
+    """
+    Forecast de vários cards ({card_id: historical}) conforme cada um fica pronto.
+
+    Acertos de cache saem primeiro; os fits restantes são distribuídos num
+    ProcessPoolExecutor e saem na ordem em que terminam. Gera tuplas
+    (card_id, forecast, erro, veio_do_cache, modelo), com forecast e modelo
+    None quando há erro.
+    """
+    pending = {}
+
+    for card_id, historical in series_by_card.items():
+        try:
+            card_model = choose_model(historical, model)
+            key, points, init = lookup(historical, card_model)
+        except Exception as e:
+            yield card_id, None, str(e), False, None
+            continue
+        if points is not None:
+            yield card_id, points, None, True, card_model
+        else:
+            pending[card_id] = (historical, key, init, card_model)
+
+    if not pending:
+        return
+
+    workers = min(worker_count(workers, DEFAULT_WORKERS) if workers else DEFAULT_WORKERS, len(pending))
+    pool = None
+    if workers > 1:
+        # Import tardio: multiprocessing só é carregado quando há fits paralelos
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        try:
+            pool = ProcessPoolExecutor(max_workers=workers)
+        except (OSError, NotImplementedError):
+            # Ambientes sem /dev/shm (ex. AWS Lambda) não suportam multiprocessing
+            pool = None
+
+    if pool is None:
+        for card_id, (historical, key, init, card_model) in pending.items():
+            try:
+                points, fitted_params = fit_forecast(historical, card_model, init=init)
+                store(key, points, fitted_params)
+            except Exception as e:
+                yield card_id, None, str(e), False, None
+                continue
+            yield card_id, points, None, False, card_model
+        return
+
+    with pool:
+        futures = {
+            pool.submit(fit_forecast, historical, card_model, init): card_id
+            for card_id, (historical, key, init, card_model) in pending.items()
+        }
+        for future in as_completed(futures):
+            card_id = futures[future]
+            _, key, _, card_model = pending[card_id]
+            try:
+                points, fitted_params = future.result()
+                store(key, points, fitted_params)
+            except Exception as e:
+                yield card_id, None, str(e), False, None
+                continue
+            yield card_id, points, None, False, card_model
+
+
+def batch_forecast(series_by_card, workers=None, model=None):
+    """Forecast de vários cards: {card_id: historical}. Retorna (forecasts, errors, cached_ids, models)."""
+    forecasts, errors, cached_ids, models = {}, {}, [], {}
+    for card_id, points, error, cached, card_model in iter_batch_forecast(series_by_card, workers, model):
+        if error is not None:
+            errors[card_id] = error
+            continue
+        forecasts[card_id] = points
+        models[card_id] = card_model
+        if cached:
+            cached_ids.append(card_id)
+    return forecasts, errors, cached_ids, models
+
 
 class handler(BaseHTTPRequestHandler):
     def do_POST(self):
+        # Modo batch em streaming: um card por linha, enviado assim que fica pronto
+        streaming = NDJSON_CONTENT_TYPE in (self.headers.get('Accept') or '')
+
         # CORS headers
         self.send_response(200)
-        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-type', NDJSON_CONTENT_TYPE if streaming else 'application/json')
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, Accept')
         self.end_headers()
-        
+
         try:
             # Ler dados do request
             content_length = int(self.headers['Content-Length'])
             post_data = self.rfile.read(content_length)
             data = json.loads(post_data)
-            
-            # Preparar dados para Prophet
-            # Formato esperado: {"historical": [{"date": "2024-01-01", "price": 100}, ...]}
-            df = pd.DataFrame(data['historical'])
-            df.columns = ['ds', 'y']  # Prophet requer essas colunas específicas
-            df['ds'] = pd.to_datetime(df['ds'])
-            
-            # Criar e treinar modelo Prophet
-            model = Prophet(
-                daily_seasonality=False,
-                weekly_seasonality=True,
-                yearly_seasonality=False,
-                interval_width=0.95,  # 95% intervalo de confiança
-                changepoint_prior_scale=0.05  # Sensibilidade a mudanças de tendência
-            )
-            model.fit(df)
-            
-            # Fazer previsão para os próximos 7 dias
-            future = model.make_future_dataframe(periods=7)
-            forecast = model.predict(future)
-            
-            # Pegar apenas os últimos 7 dias (forecast)
-            forecast_data = forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']].tail(7)
-            
-            # Converter para formato JSON-friendly
-            result = {
-                'forecast': [
-                    {
-                        'date': row['ds'].strftime('%Y-%m-%d'),
-                        'predicted': float(row['yhat']),
-                        'lower': float(row['yhat_lower']),
-                        'upper': float(row['yhat_upper'])
-                    }
-                    for _, row in forecast_data.iterrows()
-                ],
-                'success': True,
-                'message': 'Forecast gerado com sucesso'
-            }
-            
-            self.wfile.write(json.dumps(result).encode())
-            
+
+            if 'batch' in data and streaming:
+                self.stream_batch(data)
+                return
+
+            if 'batch' in data:
+                # Formato batch: {"batch": {"card_id": [{"date": ..., "price": ...}, ...]}, "workers": 4}
+                forecasts, errors, cached_ids, models = batch_forecast(
+                    data['batch'], workers=data.get('workers'), model=data.get('model')
+                )
+                result = {
+                    'forecasts': forecasts,
+                    'errors': errors,
+                    'cached': cached_ids,
+                    'models': models,
+                    'success': True,
+                    'message': f'{len(forecasts)} forecasts gerados, {len(errors)} com erro'
+                }
+            else:
+                points, cached, model = cached_forecast(data['historical'], model=data.get('model'))
+                result = {
+                    'forecast': points,
+                    'model': model,
+                    'cached': cached,
+                    'success': True,
+                    'message': 'Forecast gerado com sucesso'
+                }
+
+            self.wfile.write(dumps(result))
+
         except Exception as e:
             # Em caso de erro, retornar mensagem de erro
             error_result = {
@@ -67,8 +200,32 @@ class handler(BaseHTTPRequestHandler):
                 'error': str(e),
                 'message': 'Erro ao gerar forecast'
             }
-            self.wfile.write(json.dumps(error_result).encode())
-        
+            self.wfile.write(ndjson([error_result]) if streaming else dumps(error_result))
+
+    def stream_batch(self, data):
+        """
+        Modo batch em NDJSON: uma linha por card
+        ({"card_id", "forecast", "model", "cached"} ou {"card_id", "error"})
+        e uma linha final com "success", "done" e "message".
+        """
+        generated = failed = 0
+        for card_id, points, error, cached, model in iter_batch_forecast(
+            data['batch'], workers=data.get('workers'), model=data.get('model')
+        ):
+            if error is not None:
+                failed += 1
+                line = {'card_id': card_id, 'error': error}
+            else:
+                generated += 1
+                line = {'card_id': card_id, 'forecast': points, 'model': model, 'cached': cached}
+            self.wfile.write(ndjson([line]))
+            self.wfile.flush()
+        self.wfile.write(ndjson([{
+            'success': True,
+            'done': True,
+            'message': f'{generated} forecasts gerados, {failed} com erro'
+        }]))
+
     def do_OPTIONS(self):
         # Handle preflight CORS
         self.send_response(200)
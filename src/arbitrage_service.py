@@ -0,0 +1,263 @@
+"""
+Arbitrage scanner: MYP (ING/NM lowest offer) vs PriceCharting ungraded price.
+
+Server-side version of getArbitrageOpportunities (supabase.service.ts). The
+DISTINCT ON, the name-normalized join and the spread math run as one SQL
+statement that writes its result into arbitrage_opportunities
+(create_arbitrage_table.sql), once per (MYP date, PriceCharting date, FX rate).
+A refresh replaces the older snapshots of its own FX rate; snapshots of other
+rates stay readable until they are SNAPSHOT_MAX_AGE_HOURS old.
+Reads are indexed pages from that table:
+
+    service = ArbitrageService(fx_rate=5.3)
+    page = service.get_opportunities(limit=20, sort_by='roi_percent')
+
+Environment: ARBITRAGE_FX_RATE (BRL per USD, default 5.3).
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, datetime
+from decimal import Decimal
+
+from sqlalchemy import text
+
+from db_connection import engine
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+DEFAULT_FX_RATE = float(os.getenv('ARBITRAGE_FX_RATE', '5.3'))
+
+# Seconds between checks for a new collection date
+CHECK_INTERVAL = 60
+
+MAX_PAGE_SIZE = 500
+
+# Snapshots of FX rates nobody refreshed for this long are deleted
+SNAPSHOT_MAX_AGE_HOURS = 24
+
+# Columns clients may sort by (interpolated into ORDER BY, so whitelist only)
+SORT_COLUMNS = ('roi_percent', 'lucro_potencial', 'liquidity', 'preco_compra_myp', 'preco_venda_raw', 'card_name')
+
+LATEST_DATES_SQL = text("""
+    SELECT (SELECT max(data_coleta) FROM myp_cards_meg) AS data_myp,
+           (SELECT max(data_coleta) FROM pricecharting_overview) AS data_pc
+""")
+
+# Same rules as the frontend: lowest ING/NM offer per card on the latest MYP
+# date, liquidity = number of offers, avg of the 3 lowest, PriceCharting names
+# matched lower/trim, only positive spreads
+OPPORTUNITIES_SQL = """
+    WITH pc AS (
+        SELECT DISTINCT ON (lower(trim(card_name)))
+               lower(trim(card_name)) AS nome, ungraded_price::numeric AS ungraded_price, data_coleta
+        FROM pricecharting_overview
+        WHERE data_coleta = :data_pc AND ungraded_price > 0
+        ORDER BY lower(trim(card_name)), ungraded_price
+    ),
+    offers AS (
+        SELECT carta, valor::numeric AS valor, data_coleta,
+               row_number() OVER (PARTITION BY carta ORDER BY valor::numeric) AS posicao,
+               count(*) OVER (PARTITION BY carta) AS liquidity
+        FROM myp_cards_meg
+        WHERE idioma = 'ING' AND estado = 'NM' AND data_coleta = :data_myp AND valor::numeric > 0
+    ),
+    myp AS (
+        SELECT carta, min(valor) AS preco_compra_myp, avg(valor) AS avg_myp_3,
+               max(liquidity) AS liquidity, max(data_coleta) AS data_myp
+        FROM offers
+        WHERE posicao <= 3
+        GROUP BY carta
+    )
+    SELECT CAST(:fx_rate AS numeric) AS fx_rate, myp.data_myp, pc.data_coleta AS data_pc,
+           myp.carta AS card_name, myp.carta AS card_slug,
+           myp.preco_compra_myp, myp.avg_myp_3, myp.liquidity,
+           pc.ungraded_price AS preco_raw_usd,
+           pc.ungraded_price * CAST(:fx_rate AS numeric) AS preco_venda_raw,
+           pc.ungraded_price * CAST(:fx_rate AS numeric) - myp.preco_compra_myp AS lucro_potencial,
+           round((pc.ungraded_price * CAST(:fx_rate AS numeric) / myp.preco_compra_myp - 1) * 100, 2) AS roi_percent,
+           now() AS computed_at
+    FROM myp
+    JOIN pc ON pc.nome = lower(trim(myp.carta))
+    WHERE pc.ungraded_price * CAST(:fx_rate AS numeric) > myp.preco_compra_myp
+"""
+
+SNAPSHOT_EXISTS_SQL = text("""
+    SELECT EXISTS (
+        SELECT 1 FROM arbitrage_opportunities
+        WHERE fx_rate = CAST(:fx_rate AS numeric) AND data_myp = :data_myp AND data_pc = :data_pc
+    )
+""")
+
+# Two processes refreshing at once: the second waits for the first to commit
+REFRESH_LOCK_SQL = text("SELECT pg_advisory_xact_lock(hashtext('arbitrage_opportunities'))")
+
+# Every row written by this run gets the transaction's now() as computed_at
+REFRESH_SQL = text(f"""
+    INSERT INTO arbitrage_opportunities (fx_rate, data_myp, data_pc, card_name, card_slug, preco_compra_myp,
+        avg_myp_3, liquidity, preco_raw_usd, preco_venda_raw, lucro_potencial, roi_percent, computed_at)
+    {OPPORTUNITIES_SQL}
+    ON CONFLICT (fx_rate, data_myp, data_pc, card_name) DO UPDATE SET
+        card_slug = EXCLUDED.card_slug, preco_compra_myp = EXCLUDED.preco_compra_myp,
+        avg_myp_3 = EXCLUDED.avg_myp_3, liquidity = EXCLUDED.liquidity, preco_raw_usd = EXCLUDED.preco_raw_usd,
+        preco_venda_raw = EXCLUDED.preco_venda_raw, lucro_potencial = EXCLUDED.lucro_potencial,
+        roi_percent = EXCLUDED.roi_percent, computed_at = EXCLUDED.computed_at
+""")
+
+# Rows of this FX rate the run did not write: older collection dates and cards
+# that are no longer opportunities (same transaction, so readers never see a
+# half-replaced snapshot). Other rates are only dropped once they are
+# max_age_hours old, so callers using another rate keep their snapshot.
+DELETE_STALE_SQL = text("""
+    DELETE FROM arbitrage_opportunities
+    WHERE (fx_rate = CAST(:fx_rate AS numeric) AND computed_at <> now())
+       OR (fx_rate <> CAST(:fx_rate AS numeric) AND computed_at < now() - make_interval(hours => :max_age_hours))
+""")
+
+
+def _json_value(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+class ArbitrageService:
+    """Precomputed, paginated arbitrage opportunities"""
+    def __init__(self, bind=engine, fx_rate=DEFAULT_FX_RATE, check_interval=CHECK_INTERVAL,
+                 max_age_hours=SNAPSHOT_MAX_AGE_HOURS):
+        self.bind = bind
+        self.fx_rate = fx_rate
+        self.check_interval = check_interval
+        self.max_age_hours = max_age_hours
+        # fx_rate -> (checked_at, data_myp, data_pc) of the snapshot known to be in the table
+        self._snapshots = {}
+
+    def latest_dates(self):
+        """(latest MYP data_coleta, latest PriceCharting data_coleta)"""
+        with self.bind.connect() as connection:
+            row = connection.execute(LATEST_DATES_SQL).one()
+        return row.data_myp, row.data_pc
+
+    def refresh(self, fx_rate=None, force=False):
+        """Make sure the snapshot for the latest collection dates exists; returns (data_myp, data_pc)"""
+        fx_rate = round(float(fx_rate or self.fx_rate), 4)
+        data_myp, data_pc = self.latest_dates()
+        if data_myp is None or data_pc is None:
+            return None, None
+        params = {'fx_rate': fx_rate, 'data_myp': data_myp, 'data_pc': data_pc}
+
+        try:
+            with self.bind.begin() as connection:
+                exists = connection.execute(SNAPSHOT_EXISTS_SQL, params).scalar()
+                if force or not exists:
+                    start = time.perf_counter()
+                    connection.execute(REFRESH_LOCK_SQL)
+                    written = connection.execute(REFRESH_SQL, params).rowcount
+                    removed = connection.execute(DELETE_STALE_SQL, {**params, 'max_age_hours': self.max_age_hours}).rowcount
+                    print(f"[OK] {written} oportunidades calculadas para {data_myp} / {data_pc} "
+                          f"(câmbio {fx_rate}, {removed} antigas removidas) "
+                          f"em {(time.perf_counter() - start) * 1000:.0f} ms")
+        except Exception as e:
+            print(f"[ERROR] Erro ao calcular oportunidades de arbitragem: {e}")
+            return None, None
+
+        self._snapshots[fx_rate] = (time.monotonic(), data_myp, data_pc)
+        return data_myp, data_pc
+
+    def _snapshot(self, fx_rate):
+        """(data_myp, data_pc, cached): cached is True when the table was not checked"""
+        cached = self._snapshots.get(fx_rate)
+        if cached and time.monotonic() - cached[0] < self.check_interval:
+            return cached[1], cached[2], True
+        return (*self.refresh(fx_rate), False)
+
+    def _page_rows(self, where, order, params):
+        with self.bind.connect() as connection:
+            return connection.execute(text(f"""
+                SELECT card_name, card_slug, preco_compra_myp, avg_myp_3, liquidity, preco_raw_usd,
+                       preco_venda_raw, lucro_potencial, roi_percent, data_myp, data_pc,
+                       count(*) OVER () AS total
+                FROM arbitrage_opportunities
+                WHERE {where}
+                ORDER BY {order}
+                LIMIT :limit OFFSET :offset
+            """), params).mappings().all()
+
+    def get_opportunities(self, limit=50, offset=0, sort_by='roi_percent', descending=True,
+                          min_liquidity=None, fx_rate=None):
+        """
+        One page of opportunities, computing the snapshot first if the latest
+        collection date has none yet.
+
+        Returns {'opportunities': [...], 'total', 'limit', 'offset', 'sort_by',
+        'descending', 'fx_rate', 'data_myp', 'data_pc'}; each opportunity has the
+        fields getArbitrageOpportunities returns.
+        """
+        if sort_by not in SORT_COLUMNS:
+            raise ValueError(f"sort_by inválido: {sort_by!r} (use {', '.join(SORT_COLUMNS)})")
+        fx_rate = round(float(fx_rate or self.fx_rate), 4)
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        offset = max(0, int(offset))
+        page = {'opportunities': [], 'total': 0, 'limit': limit, 'offset': offset, 'sort_by': sort_by,
+                'descending': descending, 'fx_rate': fx_rate, 'data_myp': None, 'data_pc': None}
+
+        data_myp, data_pc, cached = self._snapshot(fx_rate)
+        if data_myp is None:
+            return page
+
+        where = "fx_rate = CAST(:fx_rate AS numeric) AND data_myp = :data_myp AND data_pc = :data_pc"
+        params = {'fx_rate': fx_rate, 'data_myp': data_myp, 'data_pc': data_pc, 'limit': limit, 'offset': offset}
+        if min_liquidity:
+            where += " AND liquidity >= :min_liquidity"
+            params['min_liquidity'] = int(min_liquidity)
+        # card_name breaks ties so pages never overlap
+        order = f"{sort_by} {'DESC' if descending else 'ASC'}" + (", card_name" if sort_by != 'card_name' else "")
+
+        try:
+            rows = self._page_rows(where, order, params)
+            if not rows and cached:
+                # Another process may have replaced or aged out the cached snapshot
+                data_myp, data_pc = self.refresh(fx_rate)
+                if data_myp is None:
+                    return page
+                params.update(data_myp=data_myp, data_pc=data_pc)
+                rows = self._page_rows(where, order, params)
+        except Exception as e:
+            print(f"[ERROR] Erro ao buscar oportunidades de arbitragem: {e}")
+            return page
+
+        page['total'] = rows[0]['total'] if rows else 0
+        page['data_myp'], page['data_pc'] = _json_value(data_myp), _json_value(data_pc)
+        page['opportunities'] = [
+            {**{key: _json_value(value) for key, value in row.items() if key != 'total'}, 'eh_oportunidade': True}
+            for row in rows
+        ]
+        return page
+
+
+# Example usage
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fx-rate', type=float, default=DEFAULT_FX_RATE)
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--sort-by', default='roi_percent', choices=SORT_COLUMNS)
+    parser.add_argument('--force', action='store_true', help='Recalcula mesmo se o snapshot já existir')
+    args = parser.parse_args()
+
+    service = ArbitrageService(fx_rate=args.fx_rate)
+    service.refresh(force=args.force)
+    start = time.perf_counter()
+    page = service.get_opportunities(limit=args.top, sort_by=args.sort_by)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    print("\n" + "-" * 60)
+    print(f"  {page['total']} oportunidades (MYP {page['data_myp']}, PC {page['data_pc']}), página em {elapsed:.0f} ms")
+    for i, item in enumerate(page['opportunities'], 1):
+        print(f"  {i:>3}. {item['card_name']}: R$ {item['preco_compra_myp']:.2f} -> R$ {item['preco_venda_raw']:.2f}"
+              f" ({item['roi_percent']:+.1f}%, {item['liquidity']} ofertas)")
+    print("-" * 60)
@@ -0,0 +1,117 @@
+"""
+Benchmark: CardCatalog.search vs the ilike '%term%' path of searchCards.
+
+Usage:
+    python bench_card_search.py [--names 20000] [--rows 500000]
+    python bench_card_search.py --database-url postgresql+psycopg2://...
+
+Synthetic mode builds a myp_cards_meg-like list of offer rows (several rows
+per card, some names with accents) and times the ilike path as it behaves
+today: a case-insensitive substring scan over every row, then dedupe. With
+--database-url the real ILIKE query on myp_cards_meg is timed and the catalog
+is loaded from card_price_daily of the same database.
+
+Besides latency, it reports how many accent-folded matches each path finds
+for queries typed without accents.
+"""
+import argparse
+import random
+import statistics
+import time
+
+from sqlalchemy import create_engine, text
+
+from card_catalog import CardCatalog, fold
+
+ILIKE_SQL = text("""
+    SELECT carta FROM myp_cards_meg
+    WHERE carta ILIKE :pattern
+    ORDER BY carta
+    LIMIT 20
+""")
+
+WORDS = ['Pikachu', 'Charizard', 'Mewtwo', 'Eevee', 'Gardevoir', 'Umbreon', 'Rayquaza', 'Lugia', 'Gengar',
+         'Flabébé', 'Pokémon', 'Café', 'Poké Ball', 'Energia', 'Treinador', 'Ídolo', 'Dragão', 'Ação', 'Mestre']
+SUFFIXES = ['ex', 'V', 'VMAX', 'VSTAR', 'GX', '']
+
+QUERIES = ['pika', 'charizard ex', 'pokemon', 'cafe', 'dragao', 'gardevoir v', 'mew', 'pokeball', 'acao mestre', 'umbr']
+
+
+def synthetic_rows(names, rows):
+    random.seed(11)
+    cards = sorted({
+        f"{random.choice(WORDS)} {random.choice(WORDS)} {random.choice(SUFFIXES)} {i % 400}".replace('  ', ' ')
+        for i in range(names)
+    })
+    return [random.choice(cards) for _ in range(rows)]
+
+
+def ilike_scan(rows, term):
+    """searchCards today: substring match over every row, then unique names"""
+    needle = term.lower()
+    return list(dict.fromkeys(carta for carta in sorted(carta for carta in rows if needle in carta.lower())))[:20]
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--names', type=int, default=20000, help='Cartas distintas (modo sintético)')
+    parser.add_argument('--rows', type=int, default=500000, help='Linhas de oferta (modo sintético)')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+
+    if args.database_url:
+        bind = create_engine(args.database_url)
+        catalog = CardCatalog(bind)
+        connection = bind.connect()
+
+        def ilike(term):
+            return list(dict.fromkeys(connection.execute(ILIKE_SQL, {'pattern': f"%{term}%"}).scalars()))
+    else:
+        rows = synthetic_rows(args.names, args.rows)
+        counts = {}
+        for carta in rows:
+            counts[carta] = counts.get(carta, 0) + 1
+        print(f"[INFO] {len(rows)} linhas, {len(counts)} cartas distintas")
+        catalog = None
+
+        def ilike(term):
+            return ilike_scan(rows, term)
+
+    start = time.perf_counter()
+    catalog = catalog or CardCatalog.from_names(counts.items())
+    size = len(catalog.index)
+    print(f"[INFO] Catálogo: {size} nomes, índice em {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    print("-" * 60)
+    print(f"  {'termo':<14} {'ilike ms':>10} {'catálogo ms':>12} {'ilike':>6} {'catálogo':>9}")
+    ilike_times, catalog_times = [], []
+    for term in QUERIES:
+        ilike_ms, ilike_result = timed(lambda: ilike(term), max(1, args.repeat // 2))
+        catalog_ms, catalog_result = timed(lambda: catalog.search(term), args.repeat)
+        ilike_times.append(ilike_ms)
+        catalog_times.append(catalog_ms)
+        # Results an accent-insensitive substring search should find
+        folded_hits = sum(1 for name in catalog_result if fold(term) in fold(name))
+        print(f"  {term:<14} {ilike_ms:>10.2f} {catalog_ms:>12.3f} {len(ilike_result):>6} {folded_hits:>9}")
+    print("-" * 60)
+    print(f"  Mediana ilike:    {statistics.median(ilike_times):9.2f} ms")
+    print(f"  Mediana catálogo: {statistics.median(catalog_times):9.3f} ms (máx {max(catalog_times):.3f} ms)")
+    print(f"  Meta < 5 ms: {'OK' if max(catalog_times) < 5 else 'NAO'}")
+    print("-" * 60)
+
+    if args.database_url:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmark: ledger replay of 1M transactions and incremental application.
+
+Usage:
+    python bench_ledger.py [--transactions 1000000] [--users 20000] [--new 1000]
+
+Generates a synthetic transactions history (buys, sells and trades, never
+selling more than is held) and times, for FIFO and average cost:
+  - a full replay of every transaction in one sorted pass;
+  - applying a batch of new transactions on top of the replayed positions,
+    what LedgerEngine.update() does instead of replaying everything.
+The incremental positions must equal a full replay of the longer history, and
+realized P&L must equal proceeds - purchases + open cost.
+"""
+import argparse
+import random
+import time
+from collections import namedtuple
+from datetime import date, datetime, timedelta, timezone
+
+from ledger import METHODS, replay
+
+Transaction = namedtuple('Transaction', 'id user_id carta idioma estado tipo quantidade preco_unitario data created_at')
+
+
+def synthetic(count, users, start=0, held=None, first_day=date(2024, 1, 1)):
+    random.seed(13 + start)
+    held = {} if held is None else held
+    created = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    rows = []
+    for i in range(start, start + count):
+        # Each user trades a dozen or so variants of their own
+        user = random.randrange(users)
+        variant = (user * 7919 + random.randrange(15)) % 1200
+        key = (f"user-{user}", f"Carta {variant // 4}", ['PT-BR', 'ING'][variant % 2], ['NM', 'SP'][variant // 2 % 2])
+        quantity = held.get(key, 0)
+        if quantity and random.random() < 0.4:
+            tipo = random.choice(['VENDA', 'VENDA', 'TRADE'])
+            amount = random.randint(1, quantity)
+            held[key] = quantity - amount
+        else:
+            tipo, amount = 'COMPRA', random.randint(1, 4)
+            held[key] = quantity + amount
+        # One day per 2000 transactions: the history is already in (data, created_at) order
+        rows.append(Transaction(f"{i:012d}", *key, tipo, amount, round(random.uniform(5, 500), 2),
+                                first_day + timedelta(days=i // 2000), created + timedelta(seconds=i)))
+    return rows, held
+
+
+def totals(positions):
+    return {key: (position.quantity, round(position.cost, 2), round(position.realized, 2))
+            for key, position in positions.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--transactions', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=20_000)
+    parser.add_argument('--new', type=int, default=1000, help='Transações novas aplicadas incrementalmente')
+    args = parser.parse_args()
+
+    history, held = synthetic(args.transactions, args.users)
+    new_rows, _ = synthetic(args.new, args.users, start=args.transactions, held=dict(held))
+    print(f"[INFO] {len(history)} transações, {len({row.user_id for row in history})} usuários")
+
+    print("-" * 60)
+    for method in METHODS:
+        start = time.perf_counter()
+        positions = replay(history, method)
+        full_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        replay(new_rows, method, positions)
+        incremental_time = time.perf_counter() - start
+
+        reference = replay(history + new_rows, method)
+        same = totals(positions) == totals(reference)
+
+        purchases = sum(row.quantidade * row.preco_unitario for row in history + new_rows if row.tipo == 'COMPRA')
+        proceeds = sum(position.proceeds for position in reference.values())
+        open_cost = sum(position.cost for position in reference.values())
+        realized = sum(position.realized for position in reference.values())
+        balanced = abs(realized - (proceeds - purchases + open_cost)) < 0.01 * len(reference)
+
+        print(f"  {method}:")
+        print(f"    Replay completo:       {full_time * 1000:9.0f} ms ({len(history) / full_time / 1e6:.2f} M transações/s)")
+        print(f"    {args.new} novas (incremental): {incremental_time * 1000:9.2f} ms")
+        print(f"    Incremental = replay completo: {'sim' if same else 'NAO'}; P&L fecha: {'sim' if balanced else 'NAO'}")
+    print("-" * 60)
+
+
+if __name__ == "__main__":
+    main()
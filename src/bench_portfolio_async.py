@@ -0,0 +1,188 @@
+"""
+Load benchmark: AsyncPortfolioCardService vs PortfolioCardService.
+
+Usage:
+    python bench_portfolio_async.py [--clients 1 16 128] [--seconds 10] [--database-url URL]
+
+For each client count the sync service runs on that many threads and the async
+service on that many tasks in one event loop, both with the pool settings from
+db_connection (DB_POOL_SIZE / DB_MAX_OVERFLOW). Every client loops over a read
+mix (get_card_by_id, get_cards_page, get_portfolio_stats) and the benchmark
+reports requests/sec and p50/p95 latency.
+
+Without --database-url the database from .env is used: the async gains come
+from network round trips, so measure against the real Supabase host (or a
+PostgreSQL URL with the same latency). Synthetic lots are inserted under a new
+random user_id and deleted at the end. A sqlite:/// file URL (needs aiosqlite)
+is accepted as a smoke test, not as a measurement.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine, delete, make_url
+from sqlalchemy.orm import sessionmaker
+
+from db_connection import (DATABASE_URL, MAX_OVERFLOW, POOL_SIZE, POOL_TIMEOUT, MeteredQueuePool,
+                           async_session_factory, create_async_db_engine)
+from portfolio_service import Base, PortfolioCard, PortfolioCardService
+from portfolio_service_async import AsyncPortfolioCardService
+
+
+def urls(database_url):
+    """(sync URL, async URL) for the same database"""
+    url = make_url(database_url or DATABASE_URL)
+    if url.get_backend_name() == 'sqlite':
+        return url.set(drivername='sqlite'), url.set(drivername='sqlite+aiosqlite')
+    query = {k: v for k, v in url.query.items() if k != 'sslmode'}
+    ssl = url.query.get('sslmode')
+    sync_url = url.set(drivername='postgresql+psycopg2')
+    async_url = url.set(drivername='postgresql+asyncpg', query={**query, **({'ssl': ssl} if ssl else {})})
+    return sync_url, async_url
+
+
+def populate(session_factory, user_id, rows):
+    today = date.today()
+    lots = [{
+        'id': uuid.uuid4(),
+        'carta': f"Carta {i % 200}",
+        'data_compra': today - timedelta(days=random.randint(0, 900)),
+        'preco_compra': round(random.uniform(1, 500), 2),
+        'idioma': random.choice(['PT-BR', 'ING', 'JPN']),
+        'qtd': random.randint(1, 4),
+        'estado': random.choice(['NM', 'SP', 'MP']),
+        'user_id': user_id
+    } for i in range(rows)]
+    session = session_factory()
+    session.bulk_insert_mappings(PortfolioCard, lots)
+    session.commit()
+    session.close()
+    return [lot['id'] for lot in lots]
+
+
+def sync_request(service, user_id, card_ids, n):
+    kind = n % 3
+    if kind == 0:
+        return service.get_card_by_id(random.choice(card_ids))
+    if kind == 1:
+        return service.get_cards_page(user_id, limit=50)
+    return service.get_portfolio_stats(user_id)
+
+
+async def async_request(service, user_id, card_ids, n):
+    kind = n % 3
+    if kind == 0:
+        return await service.get_card_by_id(random.choice(card_ids))
+    if kind == 1:
+        return await service.get_cards_page(user_id, limit=50)
+    return await service.get_portfolio_stats(user_id)
+
+
+def run_sync(service, user_id, card_ids, clients, seconds):
+    latencies = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def client(offset):
+        local, n = [], offset
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            sync_request(service, user_id, card_ids, n)
+            local.append(time.perf_counter() - start)
+            n += 1
+        with lock:
+            latencies.extend(local)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(client, range(clients)))
+    return latencies, time.perf_counter() - start
+
+
+async def run_async(service, user_id, card_ids, clients, seconds):
+    latencies = []
+    deadline = time.perf_counter() + seconds
+
+    async def client(offset):
+        n = offset
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            await async_request(service, user_id, card_ids, n)
+            latencies.append(time.perf_counter() - start)
+            n += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(clients)))
+    return latencies, time.perf_counter() - start
+
+
+def summary(latencies, elapsed):
+    latencies = sorted(latencies)
+    p95 = latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0.0
+    return len(latencies) / elapsed, statistics.median(latencies) * 1000 if latencies else 0.0, p95 * 1000
+
+
+async def main_async(args):
+    sync_url, async_url = urls(args.database_url)
+    sqlite = sync_url.get_backend_name() == 'sqlite'
+    connect_args = {'check_same_thread': False, 'timeout': 30} if sqlite else {}
+
+    engine = create_engine(sync_url, poolclass=MeteredQueuePool, pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW,
+                           pool_timeout=POOL_TIMEOUT, pool_pre_ping=True, connect_args=connect_args)
+    if sqlite:
+        Base.metadata.create_all(engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    async_engine = create_async_db_engine(async_url)
+
+    sync_service = PortfolioCardService(session_factory=session_factory)
+    async_service = AsyncPortfolioCardService(session_factory=async_session_factory(async_engine))
+
+    user_id = uuid.uuid4()
+    print(f"[INFO] Inserindo {args.rows} lotes sintéticos (user_id {user_id})...")
+    card_ids = populate(session_factory, user_id, args.rows)
+
+    results = []
+    try:
+        # Aquecimento: abre as conexões dos dois pools antes de medir
+        run_sync(sync_service, user_id, card_ids, min(POOL_SIZE, 4), 0.5)
+        await run_async(async_service, user_id, card_ids, min(POOL_SIZE, 4), 0.5)
+
+        for clients in args.clients:
+            sync_stats = summary(*run_sync(sync_service, user_id, card_ids, clients, args.seconds))
+            async_stats = summary(*await run_async(async_service, user_id, card_ids, clients, args.seconds))
+            results.append((clients, sync_stats, async_stats))
+            print(f"[INFO] {clients} clientes: sync {sync_stats[0]:.0f} req/s, async {async_stats[0]:.0f} req/s")
+    finally:
+        with session_factory() as session:
+            session.execute(delete(PortfolioCard).where(PortfolioCard.user_id == user_id))
+            session.commit()
+        await async_engine.dispose()
+        engine.dispose()
+
+    print("-" * 72)
+    print(f"  {'clientes':>8} | {'sync req/s':>10} {'p50':>8} {'p95':>8} | {'async req/s':>11} {'p50':>8} {'p95':>8}")
+    for clients, (sync_rps, sync_p50, sync_p95), (async_rps, async_p50, async_p95) in results:
+        print(f"  {clients:>8} | {sync_rps:>10.0f} {sync_p50:>6.1f}ms {sync_p95:>6.1f}ms"
+              f" | {async_rps:>11.0f} {async_p50:>6.1f}ms {async_p95:>6.1f}ms")
+    print("-" * 72)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 16, 128])
+    parser.add_argument('--seconds', type=float, default=10.0, help='Duração de cada medição')
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
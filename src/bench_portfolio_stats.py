@@ -0,0 +1,119 @@
+"""
+Benchmark: get_portfolio_stats (grouped SQL) vs the previous fetch-everything path.
+
+Usage:
+    python bench_portfolio_stats.py [--rows 100000] [--database-url URL]
+
+Without --database-url an in-memory SQLite database is used. When pointing at
+PostgreSQL use a scratch database: the portfolio_cards table is created and
+filled with synthetic rows.
+"""
+import argparse
+import random
+import time
+import uuid
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from portfolio_service import Base, PortfolioCard, PortfolioCardService
+
+CONDITIONS = ['NM', 'SP', 'MP', 'HP', 'D', None]
+LANGUAGES = ['PT-BR', 'ING', 'JPN', None]
+
+
+def populate(session_factory, rows, user_id):
+    """Insert `rows` synthetic lots for a single user"""
+    rng = random.Random(42)
+    start = date(2023, 1, 1)
+    session = session_factory()
+    batch = []
+    for i in range(rows):
+        batch.append({
+            'id': uuid.uuid4(),
+            'carta': f"Carta {rng.randint(1, 5000)}",
+            'data_compra': start + timedelta(days=rng.randint(0, 900)),
+            'preco_compra': round(rng.uniform(1, 2000), 2),
+            'idioma': rng.choice(LANGUAGES),
+            'qtd': rng.randint(1, 4),
+            'estado': rng.choice(CONDITIONS),
+            'user_id': user_id,
+        })
+        if len(batch) == 10000:
+            session.bulk_insert_mappings(PortfolioCard, batch)
+            batch = []
+    if batch:
+        session.bulk_insert_mappings(PortfolioCard, batch)
+    session.commit()
+    session.close()
+
+
+def legacy_stats(service, user_id):
+    """Previous implementation: load every row and aggregate in Python"""
+    cards = service.get_all_cards(user_id)
+    total_invested = sum(card['preco_compra'] * card['qtd'] for card in cards)
+    stats = {
+        'total_cards': len(cards),
+        'total_quantity': sum(card['qtd'] for card in cards),
+        'total_invested': round(total_invested, 2),
+        'cards_by_condition': {},
+        'cards_by_language': {}
+    }
+    for card in cards:
+        condition = card['estado'] or 'Unknown'
+        stats['cards_by_condition'][condition] = stats['cards_by_condition'].get(condition, 0) + card['qtd']
+    for card in cards:
+        language = card['idioma'] or 'Unknown'
+        stats['cards_by_language'][language] = stats['cards_by_language'].get(language, 0) + card['qtd']
+    return stats
+
+
+def timed(fn, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--database-url', default='sqlite://')
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    user_id = uuid.uuid4()
+
+    print(f"[INFO] Gerando {args.rows} lotes sintéticos...")
+    populate(session_factory, args.rows, user_id)
+
+    service = PortfolioCardService(session_factory=session_factory)
+    legacy_time, legacy = timed(lambda: legacy_stats(service, user_id), args.repeat)
+    grouped_time, grouped = timed(lambda: service.get_portfolio_stats(user_id), args.repeat)
+    service.close()
+
+    same = (
+        legacy['total_cards'] == grouped['total_cards']
+        and legacy['total_quantity'] == grouped['total_quantity']
+        and abs(legacy['total_invested'] - grouped['total_invested']) < 0.05
+        and legacy['cards_by_condition'] == grouped['cards_by_condition']
+        and legacy['cards_by_language'] == grouped['cards_by_language']
+    )
+
+    print("-" * 60)
+    print(f"  Caminho anterior (get_all_cards + loops): {legacy_time * 1000:9.1f} ms")
+    print(f"  Query agrupada (get_portfolio_stats):     {grouped_time * 1000:9.1f} ms")
+    print(f"  Speedup: {legacy_time / grouped_time:.1f}x")
+    print(f"  Resultados iguais: {'sim' if same else 'NAO'}")
+    print("-" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Benchmark: portfolio value curve, vectorized vs lot-by-lot and day-by-day.
+
+Usage:
+    python bench_portfolio_timeseries.py [--lots 500] [--days 730] [--since-days 30]
+
+Builds synthetic lots and daily rollup quotes, then times:
+  - a reference that looks up the last quote of every lot on every day
+    (O(lots x days), what a chart does without stored curves);
+  - portfolio_timeseries.build_curve over the whole history;
+  - build_curve from a recent data_compra only, the incremental recompute done
+    after a lot is added or edited.
+Both full curves must match.
+"""
+import argparse
+import bisect
+import random
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+from factor_registry import FactorRegistry
+from portfolio_timeseries import build_curve
+from valuation import _card_key
+
+IDIOMAS = {'PT-BR': 1.0, 'ING': 1.2, 'JAP': 0.8}
+ESTADOS = {'NM': 1.0, 'SP': 0.85, 'MP': 0.7}
+
+
+def synthetic(lots, days, cards=200):
+    random.seed(5)
+    end = date(2025, 12, 31)
+    start = end - timedelta(days=days - 1)
+    events = []
+    for _ in range(lots):
+        carta = f"Carta {random.randrange(cards)}"
+        quantity = random.randint(1, 4)
+        events.append((carta, random.choice(list(IDIOMAS)), random.choice(list(ESTADOS)),
+                       start + timedelta(days=random.randrange(days)), quantity,
+                       quantity * round(random.uniform(5, 500), 2)))
+    price_rows = []
+    for card in range(cards):
+        # One or two quoted variants per card, collected on most days
+        for idioma, estado in random.sample([(i, e) for i in IDIOMAS for e in ESTADOS], random.randint(1, 2)):
+            price = random.uniform(5, 500)
+            first = random.randrange(days // 2)
+            for offset in range(first, days):
+                if random.random() < 0.8:
+                    price *= random.uniform(0.97, 1.03)
+                    price_rows.append((f"Carta {card}", idioma, estado, start + timedelta(days=offset), round(price, 2)))
+    return events, price_rows, start, end
+
+
+def naive_curve(events, price_rows, start, end, snapshot):
+    """Last quote of every lot on every day, looked up one at a time"""
+    series = {}
+    for carta, idioma, estado, dia, preco in sorted(price_rows, key=lambda row: row[3]):
+        series.setdefault(_card_key(carta), {}).setdefault((idioma, estado), []).append((dia, preco))
+    values = []
+    day = start
+    while day <= end:
+        total = 0.0
+        for carta, idioma, estado, dia, quantidade, custo in events:
+            if dia > day:
+                continue
+            variants = series.get(_card_key(carta), {})
+            source = (idioma, estado) if (idioma, estado) in variants else (
+                max(sorted(variants, key=str), key=lambda variant: (variant[0] == idioma, variant[1] == estado))
+                if variants else None)
+            quotes = variants.get(source, [])
+            position = bisect.bisect_right(quotes, (day, float('inf'))) - 1
+            if position < 0:
+                total += custo
+                continue
+            price = float(snapshot.adjust(quotes[position][1], source[0], idioma, source[1], estado))
+            total += quantidade * price
+        values.append(round(total, 2))
+        day += timedelta(days=1)
+    return np.array(values)
+
+
+def timed(func, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lots', type=int, default=500)
+    parser.add_argument('--days', type=int, default=730)
+    parser.add_argument('--since-days', type=int, default=30, help='Dias recalculados no modo incremental')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    snapshot = FactorRegistry.static(IDIOMAS, ESTADOS).snapshot
+    events, price_rows, start, end = synthetic(args.lots, args.days)
+    since = end - timedelta(days=args.since_days - 1)
+    # What PRICES_SQL returns: quotes from `since` on plus the last one before it
+    last_before = {}
+    for row in sorted(price_rows, key=lambda row: row[3]):
+        if row[3] < since:
+            last_before[row[:3]] = row
+    recent_rows = [row for row in price_rows if row[3] >= since] + list(last_before.values())
+    print(f"[INFO] {len(events)} lotes, {len(price_rows)} cotações, {args.days} dias")
+
+    naive_time, naive = timed(lambda: naive_curve(events, price_rows, start, end, snapshot), 1)
+    full_time, full = timed(lambda: build_curve(events, price_rows, start, end, snapshot), args.repeat)
+    incremental_time, incremental = timed(lambda: build_curve(events, recent_rows, since, end, snapshot), args.repeat)
+
+    same = np.allclose(naive, full['valor_mercado'], atol=0.05)
+    tail = np.allclose(full['valor_mercado'][-args.since_days:], incremental['valor_mercado'], atol=0.05)
+
+    print("-" * 60)
+    print(f"  Lote a lote, dia a dia:       {naive_time * 1000:9.1f} ms")
+    print(f"  build_curve (histórico todo): {full_time * 1000:9.1f} ms ({naive_time / full_time:.0f}x)")
+    print(f"  build_curve ({args.since_days} dias):        {incremental_time * 1000:9.1f} ms")
+    print(f"  Curvas iguais: {'sim' if same else 'NAO'}; incremental igual ao fim da completa: {'sim' if tail else 'NAO'}")
+    print("-" * 60)
+
+
+if __name__ == "__main__":
+    main()
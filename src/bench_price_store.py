@@ -0,0 +1,107 @@
+"""
+Benchmark: memory and per-card reads of PriceStore vs a list of row dicts.
+
+Usage:
+    python bench_price_store.py [--offers 1000000] [--cards 20000] [--database-url URL]
+
+Generates a synthetic day of MYP offers the way a DB driver returns them (a new
+str object per value on every row) and measures with tracemalloc the memory
+kept by:
+  - the list of dicts (carta, idioma, estado, vendedor, valor, data_coleta);
+  - PriceStore built from the same tuples, including its interned names.
+Then times reading one card's offers (list filter vs array slice) and checks
+that both give the same rows. With --database-url, PriceStore.load() is also
+measured against fetching myp_cards_meg as dicts.
+"""
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import create_engine, text
+
+from price_store import PriceStore
+
+IDIOMAS = ['PT-BR', 'ING', 'JAP', 'ESP']
+ESTADOS = ['NM', 'SP', 'MP', 'HP', 'D']
+
+
+def synthetic(offers, cards, days=1):
+    random.seed(11)
+    start = date(2026, 10, 1)
+    for _ in range(offers):
+        card = random.randrange(cards)
+        # ''.join builds a fresh string per row, like a driver decoding a result set
+        yield (''.join(['Carta ', str(card)]), ''.join(random.choice(IDIOMAS)), ''.join(random.choice(ESTADOS)),
+               ''.join(['loja_', str(random.randrange(3000))]), round(random.uniform(1, 800), 2),
+               start + timedelta(days=random.randrange(days)))
+
+
+def as_dict(row):
+    carta, idioma, estado, vendedor, valor, dia = row
+    return {'carta': carta, 'idioma': idioma, 'estado': estado, 'vendedor': vendedor, 'valor': valor,
+            'data_coleta': datetime(dia.year, dia.month, dia.day, tzinfo=timezone.utc)}
+
+
+def measured(build):
+    """(result, traced bytes kept); tracemalloc slows the build, so it is not timed here"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    kept = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, kept
+
+
+def timed(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--offers', type=int, default=1_000_000)
+    parser.add_argument('--cards', type=int, default=20_000)
+    parser.add_argument('--days', type=int, default=1)
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+
+    dicts, dict_bytes = measured(lambda: [as_dict(row) for row in synthetic(args.offers, args.cards, args.days)])
+    store, store_bytes = measured(lambda: PriceStore.from_rows(synthetic(args.offers, args.cards, args.days)))
+
+    carta = 'Carta 7'
+    list_time = timed(lambda: [row for row in dicts if row['carta'] == carta], 5)
+    slice_time = timed(lambda: store.card(carta), 1000)
+    expected = sorted((row['valor'], row['vendedor'], row['data_coleta'].date()) for row in dicts if row['carta'] == carta)
+    got = sorted((round(row['valor'], 2), row['vendedor'], row['data_coleta']) for row in store.rows(carta))
+
+    print("-" * 60)
+    print(f"  {args.offers} ofertas, {len(store.dictionaries['carta'])} cartas, "
+          f"{len(store.dictionaries['vendedor'])} vendedores")
+    print(f"  Lista de dicts:  {dict_bytes / 1024 / 1024:8.1f} MB")
+    print(f"  PriceStore:      {store_bytes / 1024 / 1024:8.1f} MB  (arrays {store.nbytes / 1024 / 1024:.1f} MB)")
+    print(f"  Redução de memória: {dict_bytes / store_bytes:.1f}x")
+    print(f"  Ofertas de uma carta: filtro {list_time * 1000:.2f} ms, fatia {slice_time * 1e6:.1f} us")
+    print(f"  Mesmas ofertas: {'sim' if got == expected else 'NAO'}")
+    print("-" * 60)
+
+    if args.database_url:
+        bind = create_engine(args.database_url)
+        with bind.connect() as connection:
+            rows, rows_bytes = measured(lambda: [dict(row) for row in connection.execute(text(
+                "SELECT carta, idioma, estado, vendedor, valor, data_coleta FROM myp_cards_meg"
+            )).mappings()])
+        loaded, loaded_bytes = measured(lambda: PriceStore.load(bind))
+        print(f"  myp_cards_meg ({len(rows)} linhas):")
+        print(f"    dicts:      {rows_bytes / 1024 / 1024:8.1f} MB")
+        print(f"    PriceStore: {loaded_bytes / 1024 / 1024:8.1f} MB")
+        print("-" * 60)
+
+
+if __name__ == "__main__":
+    main()
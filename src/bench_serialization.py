@@ -0,0 +1,119 @@
+"""
+Microbenchmark: portfolio serialization, row-wise ORM vs column-wise rows.
+
+Usage:
+    python bench_serialization.py [--rows 100000] [--repeat 5] [--database-url URL]
+
+Times each step of turning one user's lots into a JSON response:
+- load:   ORM objects + PortfolioCard.to_dict (previous path) vs plain rows
+          converted column-wise (card_records, what get_all_cards does now);
+- encode: json.dumps(...).encode() vs serialization.dumps (orjson when
+          installed), and dumps of native rows (dates / UUIDs left to orjson);
+- stream: NDJSON of every card through iter_cards_ndjson vs iter_cards +
+          json.dumps per line.
+Every new path is checked against the previous output first; the benchmark
+exits with code 1 if any differs.
+
+Without --database-url an in-memory SQLite database is used. When pointing at
+PostgreSQL use a scratch database: the portfolio_cards table is created and
+filled with synthetic rows (deleted at the end).
+"""
+import argparse
+import json
+import sys
+import uuid
+
+from sqlalchemy import create_engine, delete, select
+from sqlalchemy.orm import sessionmaker
+
+import serialization
+from bench_portfolio_stats import populate, timed
+from portfolio_service import Base, CARD_COLUMNS, PortfolioCard, PortfolioCardService, card_records
+
+
+def legacy_cards(session_factory, user_id):
+    """Previous get_all_cards: ORM objects and to_dict per row"""
+    with session_factory() as session:
+        query = select(PortfolioCard).where(PortfolioCard.user_id == user_id).order_by(PortfolioCard.data_compra.desc())
+        return [card.to_dict() for card in session.scalars(query)]
+
+
+def native_cards(session_factory, user_id):
+    """Rows for dumps(): only preco_compra converted"""
+    with session_factory() as session:
+        query = select(*CARD_COLUMNS).where(PortfolioCard.user_id == user_id).order_by(PortfolioCard.data_compra.desc())
+        return card_records(session.execute(query).all(), native=True)
+
+
+def legacy_ndjson(service, user_id, batch_size):
+    return [''.join(json.dumps(card) + '\n' for card in batch).encode() for batch in service.iter_cards(user_id, batch_size)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--batch-size', type=int, default=1000, help='Cards per NDJSON chunk')
+    parser.add_argument('--database-url', default='sqlite://')
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine, expire_on_commit=False)
+    service = PortfolioCardService(session_factory)
+    user_id = uuid.uuid4()
+
+    print(f"[INFO] Inserindo {args.rows} lotes sintéticos...")
+    populate(session_factory, args.rows, user_id)
+    try:
+        expected = legacy_cards(session_factory, user_id)
+        failures = []
+        # Same ORDER BY as get_all_cards (data_compra only): ties may come back in any order
+        by_id = sorted(expected, key=lambda card: card['id'])
+        if sorted(service.get_all_cards(user_id), key=lambda card: card['id']) != by_id:
+            failures.append("card_records difere de to_dict")
+        native = native_cards(session_factory, user_id)
+        if sorted(json.loads(serialization.dumps(native)), key=lambda card: card['id']) != by_id:
+            failures.append("dumps das linhas nativas difere de to_dict")
+        streamed = b''.join(service.iter_cards_ndjson(user_id, args.batch_size))
+        keyset_order = [card for batch in service.iter_cards(user_id, args.batch_size) for card in batch]
+        if [json.loads(line) for line in streamed.splitlines()] != keyset_order:
+            failures.append("NDJSON difere de iter_cards")
+        if failures:
+            for failure in failures:
+                print(f"[ERROR] {failure}")
+            sys.exit(1)
+
+        steps = [
+            ('load', 'ORM + to_dict', lambda: legacy_cards(session_factory, user_id)),
+            ('load', 'linhas + card_records', lambda: service.get_all_cards(user_id)),
+            ('load', 'linhas nativas', lambda: native_cards(session_factory, user_id)),
+            ('encode', 'json.dumps(dicts)', lambda: json.dumps(expected).encode()),
+            ('encode', 'dumps(dicts)', lambda: serialization.dumps(expected)),
+            ('encode', 'dumps(nativas)', lambda: serialization.dumps(native)),
+            ('stream', 'iter_cards + json', lambda: legacy_ndjson(service, user_id, args.batch_size)),
+            ('stream', 'iter_cards_ndjson', lambda: list(service.iter_cards_ndjson(user_id, args.batch_size))),
+        ]
+        times = {}
+        for step, name, fn in steps:
+            times[step, name], _ = timed(fn, args.repeat)
+    finally:
+        with session_factory() as session:
+            session.execute(delete(PortfolioCard).where(PortfolioCard.user_id == user_id))
+            session.commit()
+
+    baseline = {}
+    encoder = 'orjson' if serialization.orjson is not None else 'json (orjson não instalado)'
+    print("-" * 60)
+    print(f"  {len(expected)} cartas, {len(streamed) / 1024 / 1024:.1f} MB de JSON, encoder {encoder}")
+    for (step, name), elapsed in times.items():
+        baseline.setdefault(step, elapsed)
+        print(f"  {step:<7} {name:<24} {elapsed * 1000:9.1f} ms  ({baseline[step] / elapsed:4.1f}x)")
+    print("-" * 60)
+    load = times['load', 'ORM + to_dict'] + times['encode', 'json.dumps(dicts)']
+    fast = times['load', 'linhas nativas'] + times['encode', 'dumps(nativas)']
+    print(f"[OK] Resposta completa: {load * 1000:.1f} ms -> {fast * 1000:.1f} ms ({load / fast:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Benchmark: PriceIndex.value_lots vs pricing lot by lot.
+
+Usage:
+    python bench_valuation.py [--lots 50000] [--cards 5000] [--database-url URL]
+
+Synthetic prices (several idioma/estado variants per card, some cards without
+any quote) and lots are generated in memory. The lot-by-lot path mirrors the
+frontend: newest quote of the card, then getAdjustedPrice, one lot at a time,
+here against an in-memory dict. Both paths build the same per-lot results and
+must agree on the market value. The frontend also pays one query per lot; that
+cost is reported as an estimate from --rtt-ms.
+
+With --database-url the DISTINCT ON load of the real myp_cards_meg is timed
+as well (read-only).
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine
+
+from factor_registry import FactorRegistry
+from valuation import PriceIndex
+
+IDIOMAS = {'PT-BR': 1.00, 'EN': 0.85, 'JPN': 1.15, 'ES': 0.90}
+ESTADOS = {'NM': 1.00, 'SP': 0.70, 'MP': 0.50, 'HP': 0.30, 'D': 0.10}
+
+
+def synthetic_prices(cards):
+    today = date.today()
+    rows = []
+    for card in range(cards):
+        for idioma in random.sample(list(IDIOMAS), random.randint(1, 3)):
+            for estado in random.sample(list(ESTADOS), random.randint(1, 3)):
+                rows.append((f"Carta {card}", idioma, estado, round(random.uniform(1, 800), 2),
+                             today - timedelta(days=random.randint(0, 30))))
+    return rows
+
+
+def synthetic_lots(n, cards):
+    # ~5% dos lotes apontam para cartas sem cotação
+    return [{
+        'id': str(i),
+        'carta': f"Carta {random.randint(0, int(cards * 1.05))}",
+        'idioma': random.choice(list(IDIOMAS) + ['ITA']),
+        'estado': random.choice(list(ESTADOS)),
+        'qtd': random.randint(1, 4),
+        'preco_compra': round(random.uniform(1, 800), 2),
+    } for i in range(n)]
+
+
+def lot_by_lot(rows, lots):
+    """Frontend equivalent: newest quote of the card, then the factor adjustment"""
+    newest = {}
+    for row in sorted(rows, key=lambda row: row[4]):
+        newest.setdefault(row[0].casefold(), {})[(row[1], row[2])] = row
+        newest[row[0].casefold()][None] = row
+
+    total, valued = 0.0, []
+    for lot in lots:
+        quotes = newest.get(lot['carta'].casefold())
+        if not quotes:
+            valued.append({**lot, 'cost': round(lot['preco_compra'] * lot['qtd'], 2), 'market_price': None,
+                           'market_value': None, 'pnl': None, 'pnl_pct': None, 'match': None, 'price_date': None})
+            continue
+        quote = quotes.get((lot['idioma'], lot['estado']))
+        match = 'exact'
+        if quote is None:
+            match = 'adjusted'
+            same_idioma = [q for k, q in quotes.items() if k and k[0] == lot['idioma']]
+            same_estado = [q for k, q in quotes.items() if k and k[1] == lot['estado']]
+            # Empate de data: vale a última cotação na ordem de carga, como no índice
+            candidates = same_idioma or same_estado or [quotes[None]]
+            quote = max(reversed(candidates), key=lambda q: q[4])
+        price = quote[3]
+        price *= (IDIOMAS.get(lot['idioma']) or 1.0) / (IDIOMAS.get(quote[1]) or 1.0)
+        price *= (ESTADOS.get(lot['estado']) or 1.0) / (ESTADOS.get(quote[2]) or 1.0)
+        market_value, cost = price * lot['qtd'], lot['preco_compra'] * lot['qtd']
+        valued.append({**lot, 'cost': round(cost, 2), 'market_price': round(price, 2),
+                       'market_value': round(market_value, 2), 'pnl': round(market_value - cost, 2),
+                       'pnl_pct': round((market_value - cost) / cost * 100, 2) if cost else None,
+                       'match': match, 'price_date': quote[4].isoformat()})
+        total += market_value
+    return total, valued
+
+
+def timed(func, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lots', type=int, default=50000)
+    parser.add_argument('--cards', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--rtt-ms', type=float, default=30.0, help='Round trip de uma consulta ao Supabase')
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+
+    random.seed(42)
+    rows = synthetic_prices(args.cards)
+    lots = synthetic_lots(args.lots, args.cards)
+    print(f"[INFO] {len(rows)} cotações, {len(lots)} lotes")
+
+    build_time, index = timed(lambda: PriceIndex(rows, FactorRegistry.static(IDIOMAS, ESTADOS)), args.repeat)
+    legacy_time, (legacy_total, _) = timed(lambda: lot_by_lot(rows, lots), args.repeat)
+    engine_time, result = timed(lambda: index.value_lots(lots), args.repeat)
+
+    load_time = None
+    if args.database_url:
+        bind = create_engine(args.database_url)
+        load_time, loaded = timed(lambda: PriceIndex.load(bind, FactorRegistry(bind)), 1)
+        bind.dispose()
+
+    print("-" * 60)
+    print(f"  Montagem do índice:          {build_time * 1000:9.1f} ms")
+    print(f"  Lote a lote:                 {legacy_time * 1000:9.1f} ms")
+    print(f"  PriceIndex.value_lots:       {engine_time * 1000:9.1f} ms")
+    print(f"  Speedup (em memória): {legacy_time / engine_time:.1f}x")
+    print(f"  Lote a lote com 1 consulta por lote (estimado, RTT {args.rtt_ms:.0f} ms): "
+          f"{len(lots) * args.rtt_ms / 1000:.0f} s")
+    if load_time is not None:
+        print(f"  Carga DISTINCT ON (banco):   {load_time * 1000:9.1f} ms ({len(loaded)} variantes)")
+    print(f"  Cobertura: {result['coverage']['priced_lots']}/{len(lots)} lotes")
+    print(f"  Resultados iguais: {'sim' if abs(legacy_total - result['total_market_value']) < 1 else 'NAO'}")
+    print("-" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Card-name catalog with ranked, accent-insensitive typeahead.
+
+Replaces searchCards / getAvailableCards (supabase.service.ts), which run
+`ilike '%term%'` over every myp_cards_meg row and dedupe names on the client.
+The catalog loads the distinct names once from card_price_daily
+(price_rollups.py), folds them (accents, case, punctuation) and keeps an
+in-memory trigram index:
+
+    catalog = CardCatalog()
+    catalog.search('pokemon cafe')     # finds "Pokémon Café ..." too
+    catalog.available_cards()
+
+Names that fold to the same text ("Pokémon" / "Pokemon") are one entry,
+shown with their most listed spelling; spellings() returns all of them for
+price queries. Ranking: exact match, name prefix, word prefix, substring, then
+fuzzy matches (pg_trgm-style similarity >= SIMILARITY_THRESHOLD); within a
+tier by trigram similarity, then by number of offers.
+"""
+import bisect
+import heapq
+import re
+import sys
+import threading
+import time
+import unicodedata
+
+import numpy as np
+from sqlalchemy import text
+
+from db_connection import engine
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+CATALOG_SQL = text("""
+    SELECT carta, sum(ofertas) AS ofertas
+    FROM card_price_daily
+    GROUP BY carta
+""")
+
+# Same default as pg_trgm's similarity_threshold
+SIMILARITY_THRESHOLD = 0.3
+
+MIN_TERM_LENGTH = 2
+
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+# Match tiers, best first
+EXACT, PREFIX, WORD_PREFIX, SUBSTRING, FUZZY = range(5)
+
+
+def fold(name):
+    """Lowercase, accent-free, punctuation collapsed to single spaces"""
+    decomposed = unicodedata.normalize('NFKD', name or '')
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return _NON_ALNUM.sub(' ', stripped.casefold()).strip()
+
+
+def trigrams(folded):
+    """pg_trgm trigrams: each word padded with two spaces before and one after"""
+    grams = set()
+    for word in folded.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _inner_trigrams(folded):
+    """Trigrams every name containing `folded` as a substring must have"""
+    grams = set()
+    for word in folded.split():
+        grams.update(word[i:i + 3] for i in range(len(word) - 2))
+    return grams
+
+
+class CatalogIndex:
+    """Immutable trigram/prefix index over deduplicated card names"""
+
+    def __init__(self, rows):
+        """rows: iterable of (carta, ofertas)"""
+        entries = {}
+        for carta, ofertas in rows:
+            folded = fold(carta)
+            if not folded:
+                continue
+            entry = entries.setdefault(folded, {})
+            entry[carta] = entry.get(carta, 0) + int(ofertas or 0)
+
+        self.folded = sorted(entries)
+        self.spellings = [sorted(entries[key], key=lambda carta: (-entries[key][carta], carta)) for key in self.folded]
+        self.names = [spellings[0] for spellings in self.spellings]
+        self.popularity = np.array([sum(entries[key].values()) for key in self.folded], dtype=np.int64)
+        self._id_by_folded = {key: i for i, key in enumerate(self.folded)}
+
+        postings = {}
+        self.gram_counts = np.empty(len(self.folded), dtype=np.int32)
+        for i, key in enumerate(self.folded):
+            grams = trigrams(key)
+            self.gram_counts[i] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(i)
+        self._postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+
+        # (word, id) sorted, for prefixes too short to have trigrams
+        self._words = sorted((word, i) for i, key in enumerate(self.folded) for word in set(key.split()))
+
+    def __len__(self):
+        return len(self.folded)
+
+    def _word_prefix_ids(self, prefix):
+        start = bisect.bisect_left(self._words, (prefix,))
+        ids = set()
+        for word, i in self._words[start:]:
+            if not word.startswith(prefix):
+                break
+            ids.add(i)
+        return ids
+
+    def _tier(self, i, term):
+        key = self.folded[i]
+        if key == term:
+            return EXACT
+        if key.startswith(term):
+            return PREFIX
+        if f" {term}" in f" {key}":
+            return WORD_PREFIX
+        if term in key:
+            return SUBSTRING
+        return FUZZY
+
+    def search(self, term, limit=20):
+        """Ranked [(name, tier, similarity)] for a typeahead term"""
+        term = fold(term)
+        if len(term) < MIN_TERM_LENGTH or not self.folded:
+            return []
+
+        # Substrings: names holding every inner trigram of the term, verified below
+        inner = _inner_trigrams(term)
+        if inner:
+            if not all(gram in self._postings for gram in inner):
+                matches = []
+            else:
+                shared = np.bincount(np.concatenate([self._postings[gram] for gram in inner]), minlength=len(self))
+                matches = [i for i in np.flatnonzero(shared == len(inner)).tolist() if term in self.folded[i]]
+        else:
+            # Words of 1-2 characters: prefix lookup on the word list
+            matches = [i for i in self._word_prefix_ids(term.split()[-1]) if term in self.folded[i]]
+
+        # Fuzzy matches rank below every substring, so they only matter when those run out
+        query_grams = trigrams(term)
+        similarity = None
+        lists = [self._postings[gram] for gram in query_grams if gram in self._postings]
+        if lists:
+            shared = np.bincount(np.concatenate(lists), minlength=len(self))
+            similarity = shared / (len(query_grams) + self.gram_counts - shared)
+        candidates = set(matches)
+        if similarity is not None and len(candidates) < limit:
+            candidates.update(np.flatnonzero(similarity >= SIMILARITY_THRESHOLD).tolist())
+
+        ranked = heapq.nsmallest(limit, (
+            (self._tier(i, term), -(similarity[i] if similarity is not None else 0.0),
+             -self.popularity[i], len(self.folded[i]), i)
+            for i in candidates
+        ))
+        return [(self.names[i], tier, float(-neg_similarity)) for tier, neg_similarity, _, _, i in ranked]
+
+    def spellings_of(self, name):
+        i = self._id_by_folded.get(fold(name))
+        return list(self.spellings[i]) if i is not None else []
+
+
+class CardCatalog:
+    """Card-name catalog reloaded from the database every `ttl` seconds"""
+    def __init__(self, bind=engine, ttl=600):
+        self.bind = bind
+        self.ttl = ttl
+        self._index = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_names(cls, rows):
+        """Catalog over fixed (carta, ofertas) rows, never reloaded"""
+        catalog = cls(bind=None, ttl=None)
+        catalog._index = CatalogIndex(rows)
+        return catalog
+
+    def _expired(self):
+        if self._index is None:
+            return True
+        return self.ttl is not None and time.monotonic() - self._loaded_at >= self.ttl
+
+    @property
+    def index(self):
+        if self._expired():
+            with self._lock:
+                if self._expired():
+                    self.refresh()
+        return self._index
+
+    def refresh(self):
+        """Reload the names; keeps the previous index if the query fails"""
+        start = time.perf_counter()
+        try:
+            with self.bind.connect() as connection:
+                rows = connection.execute(CATALOG_SQL).all()
+        except Exception as e:
+            print(f"[ERROR] Erro ao carregar catálogo de cartas: {e}")
+            # Retry after another ttl, not on every search
+            self._loaded_at = time.monotonic()
+            if self._index is None:
+                self._index = CatalogIndex([])
+            return self._index
+        self._index = CatalogIndex(rows)
+        self._loaded_at = time.monotonic()
+        print(f"[INFO] Catálogo com {len(self._index)} cartas carregado em {(time.perf_counter() - start) * 1000:.0f} ms")
+        return self._index
+
+    def search(self, term, limit=20):
+        """Card names for a typeahead term, best match first (searchCards)"""
+        return [name for name, _, _ in self.index.search(term, limit)]
+
+    def available_cards(self):
+        """Every distinct card name, alphabetical (getAvailableCards)"""
+        return sorted(self.index.names)
+
+    def spellings(self, name):
+        """Every stored spelling of a card, for `carta = ANY(...)` price queries"""
+        return self.index.spellings_of(name)
+
+
+# Example usage
+if __name__ == "__main__":
+    catalog = CardCatalog()
+    for term in sys.argv[1:] or ['pikachu']:
+        start = time.perf_counter()
+        results = catalog.search(term)
+        print(f"  {term!r}: {results[:5]} ({(time.perf_counter() - start) * 1000:.2f} ms)")
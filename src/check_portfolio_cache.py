@@ -0,0 +1,165 @@
+"""
+Check for the PortfolioCardService read-through cache (portfolio_cache.py).
+
+Usage:
+    python check_portfolio_cache.py [--users 20] [--cards 50] [--database-url URL] [--redis-url URL]
+
+Fills a few users' portfolios, then checks that:
+- repeated reads are served from the cache and equal the uncached service;
+- add/update/delete make the changed card and its user miss again, while the
+  other users' entries keep hitting;
+- bulk_import(cache=...) invalidates the users that received lots;
+- cached values cannot be changed through the returned objects;
+- the LRU evicts beyond max_entries and hit/miss/eviction metrics add up.
+
+Without --database-url a temporary SQLite file is used; without --redis-url the
+in-process backend is checked. Exits with code 1 on failure.
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import date
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from portfolio_cache import CachedPortfolioService, MemoryBackend, PortfolioCache, RedisBackend
+from portfolio_import import bulk_import
+from portfolio_service import Base, PortfolioCardService
+
+
+def timed(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--cards', type=int, default=50, help='Lotes por usuário')
+    parser.add_argument('--database-url')
+    parser.add_argument('--redis-url', help='Servidor compatível com Redis (ex.: redis://localhost:6379/15)')
+    args = parser.parse_args()
+
+    tmp_dir = None
+    if args.database_url:
+        url = args.database_url
+    else:
+        tmp_dir = tempfile.TemporaryDirectory()
+        url = f"sqlite:///{os.path.join(tmp_dir.name, 'cache.db')}"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    service = PortfolioCardService(session_factory=sessionmaker(autocommit=False, autoflush=False, bind=engine))
+
+    if args.redis_url:
+        cache = PortfolioCache(RedisBackend.from_url(args.redis_url, ttl=60, prefix=f"check-{uuid.uuid4()}"))
+    else:
+        cache = PortfolioCache(MemoryBackend(max_entries=2 * args.users + 16, ttl=60))
+    cached = CachedPortfolioService(service, cache)
+    failures = []
+
+    users = [uuid.uuid4() for _ in range(args.users)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        for u, user_id in enumerate(users):
+            for i in range(args.cards):
+                service.add_card(f"Carta {i}", date(2024, 1, 1 + i % 28), 5 + (u * i) % 40, qtd=1 + i % 3, user_id=user_id)
+
+    # Leituras repetidas: a primeira vai ao banco, as demais ao cache
+    for user_id in users:
+        for _ in range(3):
+            if cached.get_all_cards(user_id) != service.get_all_cards(user_id):
+                failures.append(f"get_all_cards({user_id}) difere do serviço")
+            if cached.get_portfolio_stats(user_id) != service.get_portfolio_stats(user_id):
+                failures.append(f"get_portfolio_stats({user_id}) difere do serviço")
+    if cached.get_top_cards(users[0], 5) != service.get_top_cards(users[0], 5):
+        failures.append("get_top_cards difere do serviço")
+    warm = cache.metrics.snapshot()
+    if warm['misses'] != 2 * args.users + 1 or warm['hits'] != 4 * args.users:
+        failures.append(f"{warm['hits']} hits / {warm['misses']} misses após aquecer, "
+                        f"esperado {4 * args.users} / {2 * args.users + 1}")
+
+    # Objetos devolvidos são cópias
+    cached.get_all_cards(users[0])[0]['qtd'] = 999
+    if cached.get_all_cards(users[0])[0]['qtd'] == 999:
+        failures.append("alteração no resultado vazou para o cache")
+
+    # Escritas invalidam só o usuário (e a carta) afetados
+    target, other = users[0], users[1]
+    card = cached.get_all_cards(target)[0]
+    cached.get_card_by_id(uuid.UUID(card['id']))
+    with contextlib.redirect_stdout(io.StringIO()):
+        steps = [
+            ('update', lambda: cached.update_card(uuid.UUID(card['id']), qtd=7)),
+            ('add', lambda: cached.add_card("Carta nova", date(2024, 2, 1), 12, user_id=target)),
+            ('delete', lambda: cached.delete_card(uuid.UUID(card['id']))),
+        ]
+        for name, write in steps:
+            write()
+            before = cache.metrics.snapshot()
+            cached.get_all_cards(other)
+            cached.get_portfolio_stats(other)
+            after_other = cache.metrics.snapshot()
+            target_cards = cached.get_all_cards(target)
+            target_stats = cached.get_portfolio_stats(target)
+            after_target = cache.metrics.snapshot()
+            if after_other['hits'] - before['hits'] != 2:
+                failures.append(f"{name}: entradas de outro usuário foram invalidadas")
+            if after_target['misses'] - after_other['misses'] != 2:
+                failures.append(f"{name}: entradas do usuário alterado continuaram no cache")
+            if target_cards != service.get_all_cards(target) or target_stats != service.get_portfolio_stats(target):
+                failures.append(f"{name}: cache devolveu dados antigos")
+            if cached.get_top_cards(target, 5) != service.get_top_cards(target, 5):
+                failures.append(f"{name}: get_top_cards devolveu dados antigos")
+    if cached.get_card_by_id(uuid.UUID(card['id'])) is not None:
+        failures.append("carta deletada continua no cache")
+
+    # Importação em massa grava sem passar pelo serviço: invalida pelo relatório
+    cached.get_all_cards(target)
+    with contextlib.redirect_stdout(io.StringIO()):
+        bulk_import([{'carta': 'Carta importada', 'data_compra': '2024-03-01', 'preco_compra': '9.90'}],
+                    user_id=target, bind=engine, cache=cache)
+    if cached.get_all_cards(target) != service.get_all_cards(target):
+        failures.append("bulk_import: cache devolveu dados antigos")
+
+    uncached_time = timed(lambda: service.get_all_cards(other), 50)
+    cached_time = timed(lambda: cached.get_all_cards(other), 50)
+
+    # LRU: mais chaves que max_entries geram evictions
+    if not args.redis_url:
+        for limit in range(1, cache.backend.max_entries + 10):
+            cached.get_top_cards(other, limit)
+        if cache.metrics.evictions == 0 or len(cache.backend) > cache.backend.max_entries:
+            failures.append(f"LRU não limitou o cache ({len(cache.backend)} entradas, "
+                            f"{cache.metrics.evictions} evictions)")
+
+    metrics = cached.cache_metrics()
+    print("-" * 60)
+    print(f"  Backend:                 {type(cache.backend).__name__}")
+    print(f"  get_all_cards sem cache: {uncached_time * 1000:8.3f} ms")
+    print(f"  get_all_cards com cache: {cached_time * 1000:8.3f} ms ({uncached_time / cached_time:.0f}x)")
+    print(f"  Hits / misses:           {metrics['hits']} / {metrics['misses']} (hit rate {metrics['hit_rate']:.0%})")
+    print(f"  Evictions / invalidações: {metrics['evictions']} / {metrics['invalidations']}")
+    print("-" * 60)
+    if metrics['errors']:
+        failures.append(f"{metrics['errors']} erros do backend de cache")
+
+    engine.dispose()
+    if tmp_dir:
+        tmp_dir.cleanup()
+
+    for failure in failures:
+        print(f"[ERROR] {failure}")
+    if failures:
+        sys.exit(1)
+    print("[OK] Cache do portfolio consistente com o banco")
+
+
+if __name__ == "__main__":
+    main()
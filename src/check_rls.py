@@ -1,24 +1,9 @@
-import os
-import psycopg2
-from dotenv import load_dotenv
+from db_connection import get_connection
 
-load_dotenv()
-
-DB_USER = os.getenv("user")
-DB_PASSWORD = os.getenv("password")
-DB_HOST = os.getenv("host")
-DB_PORT = os.getenv("port")
-DB_NAME = os.getenv("dbname")
 
 def check_rls_policies():
     try:
-        conn = psycopg2.connect(
-            user=DB_USER,
-            password=DB_PASSWORD,
-            host=DB_HOST,
-            port=DB_PORT,
-            dbname=DB_NAME
-        )
+        conn = get_connection()
         cursor = conn.cursor()
 
         # Check if RLS is enabled
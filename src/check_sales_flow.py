@@ -0,0 +1,102 @@
+"""
+Check for SalesFlowEngine's incremental updates on PostgreSQL.
+
+Usage:
+    python check_sales_flow.py [--database-url URL]
+
+On a single connection, creates TEMP myp_cards_meg and sales_flow tables (they
+shadow the real ones for the engine's unqualified queries) and checks that:
+- a day stored during a partial scrape, when offers not collected yet looked
+  sold, is recomputed and overwritten by the next update;
+- the days after it are still added, compared against the completed day;
+- every stored day matches diff_days over the full snapshots.
+Without --database-url the application database (db_connection) is used;
+nothing is written to its tables. Exits with code 1 on failure.
+"""
+import argparse
+import sys
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+from db_connection import engine as default_engine
+from sales_flow import SalesFlowEngine, diff_days, load_snapshot
+
+DAY_1, DAY_2, DAY_3 = date(2025, 3, 1), date(2025, 3, 2), date(2025, 3, 3)
+
+# carta, vendedor, valor per collected day; DAY_2 is scraped in two passes
+OFFERS = {
+    DAY_1: [('Pikachu', 'ana', 10), ('Pikachu', 'bia', 12), ('Mew', 'caio', 50), ('Mew', None, 55)],
+    DAY_2: [('Pikachu', 'ana', 10), ('Pikachu', 'bia', 12), ('Mew', 'caio', 50), ('Mew', None, 55)],
+    DAY_3: [('Pikachu', 'ana', 10), ('Mew', None, 55)],
+}
+# First pass of DAY_2: Mew was not collected yet
+PARTIAL = 2
+
+INSERT_SQL = text("INSERT INTO myp_cards_meg (carta, vendedor, valor, data_coleta) VALUES (:carta, :vendedor, :valor, :data_coleta)")
+
+STORED_SQL = text("SELECT data, sum(vendas) AS vendas FROM sales_flow WHERE fonte = 'myp' GROUP BY data ORDER BY data")
+
+
+def add_offers(connection, day, offers):
+    collected = datetime.combine(day, datetime.min.time()) + timedelta(hours=3)
+    connection.execute(INSERT_SQL, [
+        {'carta': carta, 'vendedor': vendedor, 'valor': valor, 'data_coleta': collected}
+        for carta, vendedor, valor in offers
+    ])
+    connection.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+
+    # One pooled connection, so every query of the engine sees the TEMP tables
+    bind = create_engine(args.database_url or default_engine.url, poolclass=StaticPool)
+    flow = SalesFlowEngine(bind)
+    failures = []
+
+    with bind.connect() as connection:
+        connection.execute(text("CREATE TEMP TABLE myp_cards_meg AS "
+                                "SELECT carta, vendedor, valor, data_coleta FROM public.myp_cards_meg LIMIT 0"))
+        connection.execute(text("CREATE TEMP TABLE sales_flow (LIKE public.sales_flow INCLUDING ALL)"))
+        connection.commit()
+        try:
+            add_offers(connection, DAY_1, OFFERS[DAY_1])
+            add_offers(connection, DAY_2, OFFERS[DAY_2][:PARTIAL])
+            flow.update('myp')
+            inflated = dict(connection.execute(STORED_SQL).all())
+            if inflated.get(DAY_2) != len(OFFERS[DAY_1]) - PARTIAL:
+                failures.append(f"scrape parcial: esperado {len(OFFERS[DAY_1]) - PARTIAL} vendas em {DAY_2}, "
+                                f"obtido {inflated.get(DAY_2)}")
+
+            # The rest of DAY_2 arrives, then DAY_3
+            add_offers(connection, DAY_2, OFFERS[DAY_2][PARTIAL:])
+            add_offers(connection, DAY_3, OFFERS[DAY_3])
+            if flow.pending_days('myp')[0] != (DAY_1, DAY_2):
+                failures.append(f"pending_days não refaz o último dia gravado: {flow.pending_days('myp')}")
+            flow.update('myp')
+
+            stored = dict(connection.execute(STORED_SQL).all())
+            for previous_day, day in [(DAY_1, DAY_2), (DAY_2, DAY_3)]:
+                expected = int(diff_days(load_snapshot(connection, 'myp', previous_day),
+                                         load_snapshot(connection, 'myp', day))['vendas'].sum())
+                print(f"  {day}: {stored.get(day)} vendas gravadas, {expected} esperadas")
+                if stored.get(day) != expected:
+                    failures.append(f"{day}: {stored.get(day)} vendas gravadas, esperado {expected}")
+        finally:
+            connection.rollback()
+            connection.execute(text("DROP TABLE IF EXISTS pg_temp.myp_cards_meg, pg_temp.sales_flow"))
+            connection.commit()
+
+    for failure in failures:
+        print(f"[ERROR] {failure}")
+    if failures:
+        sys.exit(1)
+    print("[OK] Dia gravado em scrape parcial recalculado; dias seguintes corretos")
+
+
+if __name__ == "__main__":
+    main()
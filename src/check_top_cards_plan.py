@@ -0,0 +1,137 @@
+"""
+Plan check for the per-user get_top_cards rankings on PostgreSQL.
+
+Usage:
+    python check_top_cards_plan.py [--rows 1000000] [--users 2000] [--database-url URL]
+
+Inside one transaction that is rolled back, creates a TEMP portfolio_cards
+(LIKE the real table, so it shadows it for unqualified queries), fills it with
+--rows lots, builds the indexes of create_portfolio_indexes.sql on it and runs
+EXPLAIN (ANALYZE, FORMAT JSON) for the statements the service issues:
+- top_cards_statement(user, by='price') and by='cost';
+- user_cards_statement(user), the read behind by='market_value'.
+The check fails if any plan has a Seq Scan or a Sort node, if no index (or not
+the expected one) is used, or if the rows differ from a plain ORDER BY in Python.
+Without --database-url the application database (db_connection) is used;
+nothing is written to it. Exits with code 1 on failure.
+"""
+import argparse
+import hashlib
+import os
+import re
+import sys
+import uuid
+
+from sqlalchemy import create_engine
+
+from db_connection import engine as default_engine
+from portfolio_service import PortfolioCard, top_cards_statement, user_cards_statement
+
+INDEXES_SQL = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'create_portfolio_indexes.sql')
+
+FILL_SQL = """
+INSERT INTO portfolio_cards (id, carta, data_compra, preco_compra, idioma, qtd, created_at, estado, user_id)
+SELECT md5('lot' || i)::uuid,
+       'Carta ' || (i %% 5000),
+       DATE '2020-01-01' + (i %% 2000),
+       round((random() * 2000)::numeric, 2),
+       (ARRAY['PT-BR', 'ING', 'JAP'])[1 + i %% 3],
+       1 + (i %% 4),
+       NOW(),
+       (ARRAY['NM', 'SP', 'MP'])[1 + i %% 3],
+       md5('user' || (i %% %(users)s))::uuid
+FROM generate_series(1, %(rows)s) AS i
+"""
+
+
+def index_statements():
+    """CREATE INDEX statements of create_portfolio_indexes.sql, aimed at the unqualified (temp) table"""
+    with open(INDEXES_SQL, encoding='utf-8') as f:
+        sql = re.sub(r'--[^\n]*', '', f.read())
+    statements = [s.strip() for s in sql.split(';') if s.strip().upper().startswith('CREATE INDEX')]
+    # Temp tables cannot be indexed CONCURRENTLY; the index names stay
+    return [s.replace(' CONCURRENTLY', '').replace('public.portfolio_cards', 'portfolio_cards') for s in statements]
+
+
+def plan_nodes(node):
+    yield node
+    for child in node.get('Plans', []):
+        yield from plan_nodes(child)
+
+
+def explain(connection, statement):
+    """(plan root, execution time in ms) of a SQLAlchemy statement"""
+    compiled = statement.compile(dialect=connection.dialect)
+    params = {key: str(value) if isinstance(value, uuid.UUID) else value for key, value in compiled.params.items()}
+    (result,) = connection.exec_driver_sql(f"EXPLAIN (ANALYZE, FORMAT JSON) {compiled.string}", params).scalar()
+    return result['Plan'], result['Execution Time']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--limit', type=int, default=5)
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+
+    bind = create_engine(args.database_url) if args.database_url else default_engine
+    failures = []
+    # Same id as md5('user' || 7)::uuid in FILL_SQL
+    user_id = uuid.UUID(hashlib.md5(b'user7').hexdigest())
+    cases = [
+        ('price', top_cards_statement(user_id, args.limit, 'price'), 'idx_portfolio_cards_user_preco_compra',
+         lambda card: (-card.preco_compra, str(card.id))),
+        ('cost', top_cards_statement(user_id, args.limit, 'cost'), 'idx_portfolio_cards_user_custo_total',
+         lambda card: (-card.preco_compra * card.qtd, str(card.id))),
+        ('market_value (lotes)', user_cards_statement(user_id), None, None),
+    ]
+
+    with bind.connect() as connection:
+        transaction = connection.begin()
+        try:
+            connection.exec_driver_sql(
+                "CREATE TEMP TABLE portfolio_cards (LIKE public.portfolio_cards INCLUDING DEFAULTS) ON COMMIT DROP"
+            )
+            connection.exec_driver_sql(FILL_SQL, {'rows': args.rows, 'users': args.users})
+            for statement in index_statements():
+                connection.exec_driver_sql(statement)
+            connection.exec_driver_sql("ANALYZE portfolio_cards")
+            print(f"[INFO] {args.rows} lotes de {args.users} usuários em tabela temporária")
+
+            # The user's lots, straight from the table, to check the ranking itself
+            user_rows = connection.execute(
+                PortfolioCard.__table__.select().where(PortfolioCard.user_id == user_id)
+            ).all()
+
+            print("-" * 60)
+            for name, statement, expected_index, order in cases:
+                plan, elapsed = explain(connection, statement)
+                nodes = list(plan_nodes(plan))
+                node_types = [node['Node Type'] for node in nodes]
+                indexes = {node.get('Index Name') for node in nodes} - {None}
+                print(f"  {name:22s} {' -> '.join(node_types)} [{', '.join(sorted(indexes))}] {elapsed:.3f} ms")
+
+                if any(kind == 'Seq Scan' or kind.endswith('Sort') for kind in node_types):
+                    failures.append(f"{name}: plano com scan sequencial ou sort ({', '.join(node_types)})")
+                if not indexes or (expected_index and expected_index not in indexes):
+                    failures.append(f"{name}: índice {expected_index or 'por user_id'} não usado")
+
+                if order:
+                    got = [row.id for row in connection.execute(statement).all()]
+                    expected = [row.id for row in sorted(user_rows, key=order)[:args.limit]]
+                    if got != expected:
+                        failures.append(f"{name}: ranking difere de ORDER BY em Python")
+            print("-" * 60)
+        finally:
+            transaction.rollback()
+
+    for failure in failures:
+        print(f"[ERROR] {failure}")
+    if failures:
+        sys.exit(1)
+    print("[OK] Top N por usuário servido por índice, sem scan sequencial nem sort")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Concurrency check for PortfolioCardService's session-per-operation units of work.
+
+Usage:
+    python check_unit_of_work.py [--calls 600] [--threads 32] [--database-url URL]
+
+Runs several rounds of parallel add/get/update calls through one shared service
+instance on a thread pool and checks that:
+- every call succeeded and every update is visible afterwards;
+- no connection is left checked out and there were never more than
+  pool_size + max_overflow connections open at once;
+- memory does not keep growing from round to round (no identity map or
+  session outliving its call).
+
+Without --database-url a temporary SQLite file is used. When pointing at
+PostgreSQL use a scratch database: the portfolio_cards table is created if
+missing. Exits with code 1 on failure.
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import threading
+import tracemalloc
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.orm import sessionmaker
+
+from db_connection import MeteredQueuePool, unit_of_work
+from portfolio_service import Base, PortfolioCard, PortfolioCardService
+
+POOL_SIZE = 5
+MAX_OVERFLOW = 5
+
+
+def one_lot(service, user_id, index):
+    """add -> get -> update -> get for a single lot; returns an error string or None"""
+    card = service.add_card(f"Carta {index % 50}", date(2024, 1, 1 + index % 28), 10 + index % 7, user_id=user_id)
+    if not card:
+        return f"add {index} falhou"
+    card_id = uuid.UUID(card['id'])
+    if not service.get_card_by_id(card_id):
+        return f"get {index} falhou"
+    if not service.update_card(card_id, qtd=2):
+        return f"update {index} falhou"
+    if service.get_card_by_id(card_id)['qtd'] != 2:
+        return f"update {index} não ficou visível"
+    return None
+
+
+class OpenConnections:
+    """Live DBAPI connections of an engine (overflow ones are closed on checkin)"""
+
+    def __init__(self, engine):
+        self._lock = threading.Lock()
+        self.current = self.peak = 0
+        event.listen(engine, 'connect', self._opened)
+        event.listen(engine, 'close', self._closed)
+
+    def _opened(self, *_):
+        with self._lock:
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+
+    def _closed(self, *_):
+        with self._lock:
+            self.current -= 1
+
+
+def run_round(service, user_id, calls, threads):
+    # Os prints [OK] do serviço para cada chamada não interessam aqui
+    with contextlib.redirect_stdout(io.StringIO()):
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            results = list(pool.map(lambda i: one_lot(service, user_id, i), range(calls)))
+    return [error for error in results if error]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=600, help='Lotes por rodada (4 chamadas cada)')
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--rounds', type=int, default=4)
+    parser.add_argument('--max-growth-kb', type=float, default=512.0,
+                        help='Crescimento de memória aceito entre a 2ª e a última rodada')
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+
+    tmp_dir = None
+    if args.database_url:
+        url, connect_args = args.database_url, {}
+    else:
+        tmp_dir = tempfile.TemporaryDirectory()
+        url = f"sqlite:///{os.path.join(tmp_dir.name, 'uow.db')}"
+        connect_args = {'check_same_thread': False, 'timeout': 30}
+
+    engine = create_engine(url, poolclass=MeteredQueuePool, pool_size=POOL_SIZE,
+                           max_overflow=MAX_OVERFLOW, pool_timeout=60, connect_args=connect_args)
+    connections = OpenConnections(engine)
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    @unit_of_work(session_factory=session_factory)
+    def count_lots(user_id, session):
+        return session.execute(
+            select(func.count(PortfolioCard.id), func.sum(PortfolioCard.qtd)).where(PortfolioCard.user_id == user_id)
+        ).one()
+
+    service = PortfolioCardService(session_factory=session_factory)
+    user_id = uuid.uuid4()
+    failures = []
+
+    tracemalloc.start()
+    memory = []
+    for round_number in range(1, args.rounds + 1):
+        errors = run_round(service, user_id, args.calls, args.threads)
+        failures.extend(errors[:10])
+        memory.append(tracemalloc.get_traced_memory()[0])
+        print(f"[INFO] Rodada {round_number}: {args.calls * 4} chamadas, {len(errors)} erros, "
+              f"memória {memory[-1] / 1024:.0f} KB, conexões abertas {connections.current} (pico {connections.peak}), "
+              f"em uso {engine.pool.checkedout()}")
+    tracemalloc.stop()
+
+    lots, quantity = count_lots(user_id)
+    expected = args.calls * args.rounds
+    # A 1ª rodada paga caches de compilação do SQLAlchemy; medimos a partir da 2ª
+    growth_kb = (memory[-1] - memory[min(1, len(memory) - 1)]) / 1024
+
+    print("-" * 60)
+    print(f"  Lotes gravados:            {lots} (esperado {expected})")
+    print(f"  Pico de conexões abertas:  {connections.peak} (limite {POOL_SIZE + MAX_OVERFLOW})")
+    print(f"  Conexões em uso ao final:  {engine.pool.checkedout()}")
+    print(f"  Crescimento de memória:    {growth_kb:.0f} KB (limite {args.max_growth_kb:.0f} KB)")
+    print("-" * 60)
+
+    if lots != expected or quantity != 2 * expected:
+        failures.append(f"{lots} lotes / qtd {quantity}, esperado {expected} / {2 * expected}")
+    if engine.pool.checkedout():
+        failures.append(f"{engine.pool.checkedout()} conexões não devolvidas ao pool")
+    if connections.peak > POOL_SIZE + MAX_OVERFLOW:
+        failures.append(f"{connections.peak} conexões abertas ao mesmo tempo (limite {POOL_SIZE + MAX_OVERFLOW})")
+    if connections.current > POOL_SIZE:
+        failures.append(f"{connections.current} conexões ociosas ao final (pool_size {POOL_SIZE})")
+    if growth_kb > args.max_growth_kb:
+        failures.append(f"memória cresceu {growth_kb:.0f} KB entre rodadas")
+
+    engine.dispose()
+    if tmp_dir:
+        tmp_dir.cleanup()
+
+    for failure in failures:
+        print(f"[ERROR] {failure}")
+    if failures:
+        sys.exit(1)
+    print("[OK] Unit of work estável sob concorrência")
+
+
+if __name__ == "__main__":
+    main()
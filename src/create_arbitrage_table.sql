@@ -0,0 +1,58 @@
+-- ====================================
+-- ARBITRAGE OPPORTUNITIES (MYP vs PriceCharting)
+-- ====================================
+-- Precomputed by arbitrage_service.py once per (MYP collection date,
+-- PriceCharting collection date, FX rate). Each refresh upserts its rows with
+-- computed_at = now() and, in the same transaction, deletes the other rows of
+-- its FX rate and the rows of other rates older than SNAPSHOT_MAX_AGE_HOURS.
+-- Clients read pages from here instead of downloading every offer and joining
+-- in the browser.
+
+CREATE TABLE IF NOT EXISTS public.arbitrage_opportunities (
+    fx_rate NUMERIC(8,4) NOT NULL,
+    data_myp TIMESTAMP WITH TIME ZONE NOT NULL,
+    data_pc TIMESTAMP WITH TIME ZONE NOT NULL,
+    card_name TEXT NOT NULL,
+    card_slug TEXT NOT NULL,
+    preco_compra_myp NUMERIC(12,2) NOT NULL,
+    avg_myp_3 NUMERIC(12,2) NOT NULL,
+    liquidity INTEGER NOT NULL,
+    preco_raw_usd NUMERIC(12,2) NOT NULL,
+    preco_venda_raw NUMERIC(12,2) NOT NULL,
+    lucro_potencial NUMERIC(12,2) NOT NULL,
+    roi_percent NUMERIC(12,2) NOT NULL,
+    computed_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc'::text, NOW()) NOT NULL,
+    PRIMARY KEY (fx_rate, data_myp, data_pc, card_name)
+);
+
+-- One index per sortable column, scoped to a snapshot
+CREATE INDEX IF NOT EXISTS idx_arbitrage_roi
+    ON public.arbitrage_opportunities (fx_rate, data_myp, data_pc, roi_percent DESC);
+CREATE INDEX IF NOT EXISTS idx_arbitrage_lucro
+    ON public.arbitrage_opportunities (fx_rate, data_myp, data_pc, lucro_potencial DESC);
+CREATE INDEX IF NOT EXISTS idx_arbitrage_liquidity
+    ON public.arbitrage_opportunities (fx_rate, data_myp, data_pc, liquidity DESC);
+
+-- Source lookups: latest collection date and the ING/NM offers of that date
+CREATE INDEX IF NOT EXISTS idx_myp_cards_meg_data_coleta
+    ON public.myp_cards_meg (data_coleta DESC);
+CREATE INDEX IF NOT EXISTS idx_myp_cards_meg_idioma_estado_data
+    ON public.myp_cards_meg (idioma, estado, data_coleta, carta, valor);
+CREATE INDEX IF NOT EXISTS idx_pricecharting_overview_data_coleta
+    ON public.pricecharting_overview (data_coleta DESC);
+
+-- ====================================
+-- RLS
+-- ====================================
+-- Market data: readable by everyone, written only by the service connection
+ALTER TABLE public.arbitrage_opportunities ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Arbitrage opportunities are public" ON public.arbitrage_opportunities;
+CREATE POLICY "Arbitrage opportunities are public"
+    ON public.arbitrage_opportunities FOR SELECT
+    USING (true);
+
+-- ====================================
+-- COMMENTS
+-- ====================================
+COMMENT ON TABLE public.arbitrage_opportunities IS 'MYP ING/NM lowest offer vs PriceCharting ungraded price, latest snapshot per FX rate (rates not refreshed for SNAPSHOT_MAX_AGE_HOURS are dropped)';
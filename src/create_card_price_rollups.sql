@@ -0,0 +1,93 @@
+-- ====================================
+-- CARD PRICE ROLLUPS (myp_cards_meg offer prices per card and period)
+-- ====================================
+-- Maintained by price_rollups.py. Each run only reads the collection days from
+-- the day of the watermark in rollup_watermarks on (that day is always redone,
+-- it may have been partial), and rewrites those days (and their weeks/months)
+-- as a whole, so re-runs are idempotent.
+-- idioma/estado are stored as '' when missing, to be part of the key.
+
+CREATE TABLE IF NOT EXISTS public.card_price_daily (
+    carta TEXT NOT NULL,
+    idioma TEXT NOT NULL,
+    estado TEXT NOT NULL,
+    dia DATE NOT NULL,
+    ofertas INTEGER NOT NULL,
+    preco_min NUMERIC(12,2) NOT NULL,
+    preco_mediana NUMERIC(12,2) NOT NULL,
+    preco_medio NUMERIC(12,2) NOT NULL,
+    preco_max NUMERIC(12,2) NOT NULL,
+    preco_soma NUMERIC(16,2) NOT NULL,
+    computed_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc'::text, NOW()) NOT NULL,
+    PRIMARY KEY (carta, idioma, estado, dia)
+);
+
+-- Weekly (ISO week, starting Monday) and monthly rollups, built from the daily table
+CREATE TABLE IF NOT EXISTS public.card_price_weekly (
+    carta TEXT NOT NULL,
+    idioma TEXT NOT NULL,
+    estado TEXT NOT NULL,
+    periodo DATE NOT NULL,
+    dias INTEGER NOT NULL,
+    ofertas INTEGER NOT NULL,
+    preco_min NUMERIC(12,2) NOT NULL,
+    preco_mediana NUMERIC(12,2) NOT NULL,
+    preco_medio NUMERIC(12,2) NOT NULL,
+    preco_max NUMERIC(12,2) NOT NULL,
+    preco_soma NUMERIC(16,2) NOT NULL,
+    computed_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc'::text, NOW()) NOT NULL,
+    PRIMARY KEY (carta, idioma, estado, periodo)
+);
+
+CREATE TABLE IF NOT EXISTS public.card_price_monthly (
+    LIKE public.card_price_weekly INCLUDING DEFAULTS,
+    PRIMARY KEY (carta, idioma, estado, periodo)
+);
+
+-- Last data_coleta folded into the rollups, per job
+CREATE TABLE IF NOT EXISTS public.rollup_watermarks (
+    job TEXT PRIMARY KEY,
+    watermark TIMESTAMP WITH TIME ZONE NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc'::text, NOW()) NOT NULL
+);
+
+-- Whole-market views of one day (top movers, charts across cards)
+CREATE INDEX IF NOT EXISTS idx_card_price_daily_dia
+    ON public.card_price_daily (dia DESC);
+
+-- New rows since the watermark
+CREATE INDEX IF NOT EXISTS idx_myp_cards_meg_data_coleta
+    ON public.myp_cards_meg (data_coleta DESC);
+
+-- ====================================
+-- RLS
+-- ====================================
+-- Market data: readable by everyone, written only by the service connection
+ALTER TABLE public.card_price_daily ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.card_price_weekly ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.card_price_monthly ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.rollup_watermarks ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Daily card prices are public" ON public.card_price_daily;
+CREATE POLICY "Daily card prices are public"
+    ON public.card_price_daily FOR SELECT
+    USING (true);
+
+DROP POLICY IF EXISTS "Weekly card prices are public" ON public.card_price_weekly;
+CREATE POLICY "Weekly card prices are public"
+    ON public.card_price_weekly FOR SELECT
+    USING (true);
+
+DROP POLICY IF EXISTS "Monthly card prices are public" ON public.card_price_monthly;
+CREATE POLICY "Monthly card prices are public"
+    ON public.card_price_monthly FOR SELECT
+    USING (true);
+
+-- ====================================
+-- COMMENTS
+-- ====================================
+COMMENT ON TABLE public.card_price_daily IS 'Offer price (valor) statistics per card, idioma, estado and collection day';
+COMMENT ON TABLE public.card_price_weekly IS 'card_price_daily folded per ISO week; preco_mediana is the median of the daily medians';
+COMMENT ON TABLE public.card_price_monthly IS 'card_price_daily folded per month; preco_mediana is the median of the daily medians';
+COMMENT ON COLUMN public.card_price_daily.preco_soma IS 'Sum of offer prices, so longer periods get an exact mean';
+COMMENT ON TABLE public.rollup_watermarks IS 'Newest source data_coleta already folded into each rollup job';
@@ -0,0 +1,31 @@
+-- ====================================
+-- CONVERSION FACTOR CHANGE NOTIFICATIONS
+-- ====================================
+-- Sends NOTIFY conversion_factors_changed whenever idioma_factor or
+-- estado_factor change, so FactorRegistry.listen() (factor_registry.py)
+-- reloads the factors without waiting for its TTL.
+
+CREATE OR REPLACE FUNCTION public.notify_conversion_factors_changed()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM pg_notify('conversion_factors_changed', TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_idioma_factor_notify ON public.idioma_factor;
+CREATE TRIGGER trg_idioma_factor_notify
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON public.idioma_factor
+    FOR EACH STATEMENT EXECUTE FUNCTION public.notify_conversion_factors_changed();
+
+DROP TRIGGER IF EXISTS trg_estado_factor_notify ON public.estado_factor;
+CREATE TRIGGER trg_estado_factor_notify
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON public.estado_factor
+    FOR EACH STATEMENT EXECUTE FUNCTION public.notify_conversion_factors_changed();
+
+-- ====================================
+-- COMMENTS
+-- ====================================
+COMMENT ON FUNCTION public.notify_conversion_factors_changed() IS 'NOTIFY conversion_factors_changed after any change to the conversion factor tables';
@@ -0,0 +1,104 @@
+-- ====================================
+-- TRANSACTION LEDGER (holdings and realized P&L per card variant)
+-- ====================================
+-- Maintained by ledger.py from transactions (database/transactions-schema.sql:
+-- tipo COMPRA / VENDA / TRADE in any case). One row per user, matching method and
+-- (carta, idioma, estado); idioma/estado are '' when missing. New transactions
+-- are applied on top of these rows; only users that receive a backdated
+-- transaction, or whose transactions were edited or deleted (ledger_pending),
+-- are replayed from their full history.
+
+CREATE TABLE IF NOT EXISTS public.ledger_positions (
+    user_id UUID NOT NULL,
+    metodo VARCHAR(10) NOT NULL CHECK (metodo IN ('fifo', 'average')),
+    carta TEXT NOT NULL,
+    idioma TEXT NOT NULL,
+    estado TEXT NOT NULL,
+    quantidade INTEGER NOT NULL,
+    custo NUMERIC(14,2) NOT NULL,
+    realizado NUMERIC(14,2) NOT NULL,
+    receita NUMERIC(14,2) NOT NULL,
+    -- Open FIFO lots, oldest first: [[quantidade, preco_unitario], ...]
+    lotes JSONB NOT NULL DEFAULT '[]'::jsonb,
+    transacoes INTEGER NOT NULL,
+    -- Sort key (data, created_at, id) of the last transaction applied
+    ultima_data DATE NOT NULL,
+    ultima_criacao TIMESTAMP WITH TIME ZONE NOT NULL,
+    ultimo_id UUID NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc'::text, NOW()) NOT NULL,
+    PRIMARY KEY (user_id, metodo, carta, idioma, estado)
+);
+
+-- Transactions already applied, per method
+CREATE TABLE IF NOT EXISTS public.ledger_state (
+    metodo VARCHAR(10) PRIMARY KEY,
+    watermark TIMESTAMP WITH TIME ZONE NOT NULL,
+    -- Ids applied within the overlap window before the watermark
+    ids_recentes UUID[] NOT NULL DEFAULT '{}',
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc'::text, NOW()) NOT NULL
+);
+
+-- Users whose transactions were edited or deleted since the last run, per
+-- method. Filled by the trigger below (the frontend updates and deletes
+-- transactions directly); update() replays these users from their history.
+CREATE TABLE IF NOT EXISTS public.ledger_pending (
+    metodo VARCHAR(10) NOT NULL,
+    user_id UUID NOT NULL,
+    changed_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc'::text, NOW()) NOT NULL,
+    PRIMARY KEY (metodo, user_id)
+);
+
+-- SECURITY DEFINER: runs for the frontend's own writes, which cannot see ledger_pending under RLS
+CREATE OR REPLACE FUNCTION public.ledger_mark_pending()
+RETURNS trigger
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    INSERT INTO public.ledger_pending (metodo, user_id)
+    SELECT metodo, affected.user_id
+    FROM (VALUES ('fifo'), ('average')) AS methods (metodo)
+    CROSS JOIN (
+        SELECT OLD.user_id
+        UNION
+        SELECT NEW.user_id WHERE TG_OP = 'UPDATE'
+    ) AS affected (user_id)
+    WHERE affected.user_id IS NOT NULL
+    ON CONFLICT (metodo, user_id) DO NOTHING;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_transactions_ledger_pending ON public.transactions;
+CREATE TRIGGER trg_transactions_ledger_pending
+    AFTER UPDATE OR DELETE ON public.transactions
+    FOR EACH ROW EXECUTE FUNCTION public.ledger_mark_pending();
+
+-- New transactions since the watermark, and full replays of one user
+CREATE INDEX IF NOT EXISTS idx_transactions_created_at
+    ON public.transactions (created_at);
+CREATE INDEX IF NOT EXISTS idx_transactions_user_data
+    ON public.transactions (user_id, data, created_at);
+
+-- ====================================
+-- RLS
+-- ====================================
+ALTER TABLE public.ledger_positions ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.ledger_state ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.ledger_pending ENABLE ROW LEVEL SECURITY;
+
+-- Written only by the service connection; users read their own positions
+DROP POLICY IF EXISTS "Users can view own ledger positions" ON public.ledger_positions;
+CREATE POLICY "Users can view own ledger positions"
+    ON public.ledger_positions FOR SELECT
+    USING (auth.uid() = user_id);
+
+-- ====================================
+-- COMMENTS
+-- ====================================
+COMMENT ON TABLE public.ledger_positions IS 'Holdings, open cost and realized P&L per card variant, replayed from transactions';
+COMMENT ON COLUMN public.ledger_positions.custo IS 'Cost basis of the units still held';
+COMMENT ON COLUMN public.ledger_positions.realizado IS 'Sale/trade proceeds minus the cost of the units they consumed';
+COMMENT ON TABLE public.ledger_state IS 'Newest transactions.created_at applied by ledger.py, per matching method';
+COMMENT ON TABLE public.ledger_pending IS 'Users with edited or deleted transactions, replayed by the next ledger.py update';
@@ -0,0 +1,25 @@
+-- ====================================
+-- PORTFOLIO_CARDS INDEXES
+-- ====================================
+-- Indexes backing the paginated / streaming reads in portfolio_service.py.
+-- CONCURRENTLY avoids locking the table; run outside a transaction block.
+
+-- Keyset pagination: WHERE user_id = ? ORDER BY data_compra DESC, id
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_portfolio_cards_user_data_compra
+    ON public.portfolio_cards (user_id, data_compra DESC, id);
+
+-- Top N by purchase price: WHERE user_id = ? ORDER BY preco_compra DESC, id LIMIT n
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_portfolio_cards_user_preco_compra
+    ON public.portfolio_cards (user_id, preco_compra DESC, id);
+
+-- Top N by total cost: WHERE user_id = ? ORDER BY preco_compra * qtd DESC, id LIMIT n
+-- (the expression must stay identical to TOP_CARDS_ORDER['cost'])
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_portfolio_cards_user_custo_total
+    ON public.portfolio_cards (user_id, (preco_compra * qtd) DESC, id);
+
+-- ====================================
+-- COMMENTS
+-- ====================================
+COMMENT ON INDEX public.idx_portfolio_cards_user_data_compra IS 'Keyset pagination for get_cards_page / iter_cards';
+COMMENT ON INDEX public.idx_portfolio_cards_user_preco_compra IS 'get_top_cards(by=''price'') per user';
+COMMENT ON INDEX public.idx_portfolio_cards_user_custo_total IS 'get_top_cards(by=''cost'') per user';
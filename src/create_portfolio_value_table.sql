@@ -0,0 +1,92 @@
+-- ====================================
+-- PORTFOLIO VALUE (daily market-value curve per user)
+-- ====================================
+-- Filled by portfolio_timeseries.py from portfolio_cards and the daily price
+-- rollups (create_card_price_rollups.sql). Changing a lot only marks the user
+-- in portfolio_value_pending with the earliest affected day; the next read
+-- recomputes the curve from that day on. The marks come from triggers on
+-- portfolio_cards and transactions, so writes from the frontend (which go
+-- straight to the tables) count as well as the Python service's.
+
+CREATE TABLE IF NOT EXISTS public.portfolio_value_daily (
+    user_id UUID NOT NULL,
+    dia DATE NOT NULL,
+    quantidade INTEGER NOT NULL,
+    custo NUMERIC(14,2) NOT NULL,
+    valor_mercado NUMERIC(14,2) NOT NULL,
+    valor_sem_cotacao NUMERIC(14,2) NOT NULL,
+    computed_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc'::text, NOW()) NOT NULL,
+    PRIMARY KEY (user_id, dia)
+);
+
+-- Earliest day whose value is stale, per user
+CREATE TABLE IF NOT EXISTS public.portfolio_value_pending (
+    user_id UUID PRIMARY KEY,
+    desde DATE NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc'::text, NOW()) NOT NULL
+);
+
+-- Marks the users of the changed row stale from the earliest date involved
+-- (OLD and NEW, so moving a lot to a later day still redoes the old one).
+-- TG_ARGV[0] is the date column: data_compra or data.
+-- SECURITY DEFINER: runs for the frontend's own writes, which cannot see
+-- portfolio_value_pending under RLS.
+CREATE OR REPLACE FUNCTION public.portfolio_value_mark_pending()
+RETURNS trigger
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    old_row jsonb := CASE WHEN TG_OP <> 'INSERT' THEN to_jsonb(OLD) END;
+    new_row jsonb := CASE WHEN TG_OP <> 'DELETE' THEN to_jsonb(NEW) END;
+BEGIN
+    INSERT INTO public.portfolio_value_pending AS pending (user_id, desde, updated_at)
+    SELECT user_id, min(desde), clock_timestamp()
+    FROM (VALUES
+        ((old_row ->> 'user_id')::uuid, (old_row ->> TG_ARGV[0])::date),
+        ((new_row ->> 'user_id')::uuid, (new_row ->> TG_ARGV[0])::date)
+    ) AS changed (user_id, desde)
+    WHERE user_id IS NOT NULL AND desde IS NOT NULL
+    GROUP BY user_id
+    ON CONFLICT (user_id) DO UPDATE SET
+        desde = LEAST(pending.desde, EXCLUDED.desde),
+        updated_at = EXCLUDED.updated_at;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_portfolio_cards_value_pending ON public.portfolio_cards;
+CREATE TRIGGER trg_portfolio_cards_value_pending
+    AFTER INSERT OR UPDATE OR DELETE ON public.portfolio_cards
+    FOR EACH ROW EXECUTE FUNCTION public.portfolio_value_mark_pending('data_compra');
+
+DROP TRIGGER IF EXISTS trg_transactions_value_pending ON public.transactions;
+CREATE TRIGGER trg_transactions_value_pending
+    AFTER INSERT OR UPDATE OR DELETE ON public.transactions
+    FOR EACH ROW EXECUTE FUNCTION public.portfolio_value_mark_pending('data');
+
+-- Price series of a user's cards, matched case-insensitively
+CREATE INDEX IF NOT EXISTS idx_card_price_daily_carta_lower
+    ON public.card_price_daily (lower(carta), dia);
+
+-- ====================================
+-- RLS
+-- ====================================
+ALTER TABLE public.portfolio_value_daily ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.portfolio_value_pending ENABLE ROW LEVEL SECURITY;
+
+-- Written only by the service connection; users read their own curve
+DROP POLICY IF EXISTS "Users can view own portfolio value" ON public.portfolio_value_daily;
+CREATE POLICY "Users can view own portfolio value"
+    ON public.portfolio_value_daily FOR SELECT
+    USING (auth.uid() = user_id);
+
+-- ====================================
+-- COMMENTS
+-- ====================================
+COMMENT ON TABLE public.portfolio_value_daily IS 'Market value of each user''s holdings on every day since the first data_compra';
+COMMENT ON COLUMN public.portfolio_value_daily.valor_mercado IS 'Holdings at the last known daily minimum price; lots without any quote yet count at cost';
+COMMENT ON COLUMN public.portfolio_value_daily.valor_sem_cotacao IS 'Part of valor_mercado taken at cost because the card had no quote yet';
+COMMENT ON TABLE public.portfolio_value_pending IS 'Users whose curve must be recomputed from desde on';
+COMMENT ON FUNCTION public.portfolio_value_mark_pending() IS 'Marks the users of a changed portfolio_cards / transactions row in portfolio_value_pending';
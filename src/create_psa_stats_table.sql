@@ -0,0 +1,54 @@
+-- ====================================
+-- PSA CARD STATS (graded-price analytics per card and collection date)
+-- ====================================
+-- Maintained by psa_analytics.py from psa_raw_prices. One row per card
+-- (lower(trim(card_name))) and collection date, with the prices as of that
+-- date, so the PSA views read a finished table instead of raw scrape rows.
+-- Each run rewrites the newest date already computed and adds later ones.
+
+CREATE TABLE IF NOT EXISTS public.psa_card_stats (
+    data_coleta DATE NOT NULL,
+    card_key TEXT NOT NULL,
+    card_name TEXT NOT NULL,
+    -- Latest price per grade: median of the listings of the newest day seen for that grade
+    preco_raw NUMERIC(12,2),
+    preco_psa9 NUMERIC(12,2),
+    preco_psa10 NUMERIC(12,2),
+    precos_por_nota JSONB NOT NULL DEFAULT '{}'::jsonb,
+    multiplicador_psa10 NUMERIC(10,3),
+    roi_psa9 NUMERIC(10,4),
+    roi_psa10 NUMERIC(10,4),
+    ofertas_janela INTEGER NOT NULL,
+    dias_janela INTEGER NOT NULL,
+    liquidez NUMERIC(5,1) NOT NULL,
+    ultima_coleta DATE NOT NULL,
+    computed_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc'::text, NOW()) NOT NULL,
+    PRIMARY KEY (data_coleta, card_key)
+);
+
+-- Card ranking of one date (the PSA tab orders by ROI or multiplier)
+CREATE INDEX IF NOT EXISTS idx_psa_card_stats_roi
+    ON public.psa_card_stats (data_coleta, roi_psa10 DESC NULLS LAST);
+
+-- History of one card
+CREATE INDEX IF NOT EXISTS idx_psa_card_stats_card
+    ON public.psa_card_stats (card_key, data_coleta);
+
+-- ====================================
+-- RLS
+-- ====================================
+ALTER TABLE public.psa_card_stats ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "PSA card stats are public" ON public.psa_card_stats;
+CREATE POLICY "PSA card stats are public"
+    ON public.psa_card_stats FOR SELECT
+    USING (true);
+
+-- ====================================
+-- COMMENTS
+-- ====================================
+COMMENT ON TABLE public.psa_card_stats IS 'Graded-price analytics per card as of each psa_raw_prices collection date';
+COMMENT ON COLUMN public.psa_card_stats.precos_por_nota IS 'Latest price per grade: {"raw": 12.5, "9": 40.0, "10": 120.0, ...}';
+COMMENT ON COLUMN public.psa_card_stats.multiplicador_psa10 IS 'preco_psa10 / preco_raw';
+COMMENT ON COLUMN public.psa_card_stats.roi_psa10 IS 'Return of buying raw, grading and selling as PSA 10, after grading, shipping and selling fees';
+COMMENT ON COLUMN public.psa_card_stats.liquidez IS '0-100: log-scaled listings in the trailing window, relative to the most listed card';
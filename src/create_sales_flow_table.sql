@@ -0,0 +1,49 @@
+-- ====================================
+-- SALES FLOW (real sales detected from daily offer snapshots)
+-- ====================================
+-- Filled by sales_flow.py, one collected day at a time. A sale on `data` is an
+-- offer (carta + vendedor + preço) listed on `data_anterior` (the previous
+-- collected day) and gone on `data`, the rule of detectRealSales in
+-- src/utils/sales-detection.ts.
+
+CREATE TABLE IF NOT EXISTS public.sales_flow (
+    fonte VARCHAR(10) NOT NULL CHECK (fonte IN ('myp', 'liga')),
+    carta TEXT NOT NULL,
+    data DATE NOT NULL,
+    data_anterior DATE NOT NULL,
+    vendas INTEGER NOT NULL,
+    volume NUMERIC(14,2) NOT NULL,
+    ofertas INTEGER NOT NULL,
+    vendedores_ativos INTEGER NOT NULL,
+    vendedores_novos INTEGER NOT NULL,
+    vendedores_perdidos INTEGER NOT NULL,
+    computed_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc'::text, NOW()) NOT NULL,
+    PRIMARY KEY (fonte, carta, data)
+);
+
+-- Latest processed day per source, and "top sellers of the day" listings
+CREATE INDEX IF NOT EXISTS idx_sales_flow_fonte_data
+    ON public.sales_flow (fonte, data DESC, vendas DESC);
+
+-- Day snapshots are read by collection date
+CREATE INDEX IF NOT EXISTS idx_cartas_precos_liga_data_coleta
+    ON public.cartas_precos_liga (data_coleta);
+
+-- ====================================
+-- RLS
+-- ====================================
+-- Market data: readable by everyone, written only by the service connection
+ALTER TABLE public.sales_flow ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Sales flow is public" ON public.sales_flow;
+CREATE POLICY "Sales flow is public"
+    ON public.sales_flow FOR SELECT
+    USING (true);
+
+-- ====================================
+-- COMMENTS
+-- ====================================
+COMMENT ON TABLE public.sales_flow IS 'Daily sales per card detected from offers that disappeared between consecutive collections';
+COMMENT ON COLUMN public.sales_flow.vendedores_ativos IS 'Sellers with at least one sale on data';
+COMMENT ON COLUMN public.sales_flow.vendedores_novos IS 'Sellers listing the card on data but not on data_anterior';
+COMMENT ON COLUMN public.sales_flow.vendedores_perdidos IS 'Sellers listing the card on data_anterior but not on data';
@@ -1,30 +1,13 @@
-import os
 import uuid
 import bcrypt
-import psycopg2
-from dotenv import load_dotenv
+from db_connection import get_connection
 from datetime import datetime
 
-# Load environment variables
-load_dotenv()
-
-# Database connection details
-DB_USER = os.getenv("user")
-DB_PASSWORD = os.getenv("password")
-DB_HOST = os.getenv("host")
-DB_PORT = os.getenv("port")
-DB_NAME = os.getenv("dbname")
 
 def create_user(email, password):
     try:
         # Connect to the database
-        conn = psycopg2.connect(
-            user=DB_USER,
-            password=DB_PASSWORD,
-            host=DB_HOST,
-            port=DB_PORT,
-            dbname=DB_NAME
-        )
+        conn = get_connection()
         cursor = conn.cursor()
 
         # Generate User ID
@@ -1,7 +1,41 @@
-from sqlalchemy import create_engine
-# from sqlalchemy.pool import NullPool
+"""
+Shared database access for every Python entry point.
+
+Import `engine` (SQLAlchemy) or call `get_connection()` (DBAPI, for psycopg2
+style scripts) instead of building a connection from .env in each script:
+both come from one process-wide, tuned pool.
+
+Environment (besides user/password/host/port/dbname):
+    DB_POOL_MODE              session (default) or transaction. Use transaction
+                              behind pgbouncer / Supavisor transaction mode: the
+                              pooler does the pooling (NullPool here), there are
+                              no session-level SETs and no prepared statements.
+    DB_POOL_SIZE              persistent connections (default 5)
+    DB_MAX_OVERFLOW           extra connections under load (default 10)
+    DB_POOL_TIMEOUT           seconds to wait for a free connection (default 30)
+    DB_POOL_RECYCLE           seconds before a connection is replaced (default 1800)
+    DB_STATEMENT_TIMEOUT_MS   per-statement timeout, 0 disables (default 30000)
+
+Async code (asyncio + asyncpg) uses `get_async_engine()` and
+`async_session_scope()`; the async engine is only built on first use, so
+sync scripts never import asyncpg.
+
+Units of work: `session_scope()` (context manager) and `@unit_of_work`
+(decorator) check out one session per operation, commit or roll back, and
+close it, so no session or identity map outlives the operation.
+
+Run this file directly to test the connection.
+"""
+from sqlalchemy import create_engine, event, make_url, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool, QueuePool
+from contextlib import asynccontextmanager, contextmanager
 from dotenv import load_dotenv
+import functools
 import os
+import threading
+import time
+import uuid
 
 # Load environment variables from .env
 load_dotenv()
@@ -15,17 +49,259 @@ DBNAME = os.getenv("dbname")
 
 # Construct the SQLAlchemy connection string
 DATABASE_URL = f"postgresql+psycopg2://{USER}:{PASSWORD}@{HOST}:{PORT}/{DBNAME}?sslmode=require"
+ASYNC_DATABASE_URL = f"postgresql+asyncpg://{USER}:{PASSWORD}@{HOST}:{PORT}/{DBNAME}?ssl=require"
+
+# Pool settings
+POOL_MODE = os.getenv("DB_POOL_MODE", "session")
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+
+TRANSACTION_POOLER = POOL_MODE == "transaction"
+
+
+class PoolMetrics:
+    """Thread-safe counters for connection checkouts"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.waits = 0
+            self.timeouts = 0
+            self.connects = 0
+            self.total_wait = 0.0
+            self.max_wait = 0.0
+
+    def record_checkout(self, wait, waited):
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            if waited:
+                self.waits += 1
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def record_connect(self):
+        with self._lock:
+            self.connects += 1
+
+
+metrics = PoolMetrics()
+
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool that records checkout latency and how often callers had to wait"""
+
+    def _do_get(self):
+        # No idle connection and no overflow left: this checkout will block
+        waited = self._pool.empty() and self._max_overflow > -1 and self._overflow >= self._max_overflow
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except Exception:
+            metrics.record_timeout()
+            raise
+        metrics.record_checkout(time.perf_counter() - start, waited)
+        return connection
+
+
+def _engine_options():
+    options = {"pool_pre_ping": True}
+    if TRANSACTION_POOLER:
+        # The pooler owns the connections; a client-side pool would pin them.
+        # https://docs.sqlalchemy.org/en/20/core/pooling.html#switching-pool-implementations
+        options["poolclass"] = NullPool
+        # Only transaction-scoped settings survive in transaction mode (see _set_local_timeout)
+        options["pool_pre_ping"] = False
+    else:
+        options.update(
+            poolclass=MeteredQueuePool,
+            pool_size=POOL_SIZE,
+            max_overflow=MAX_OVERFLOW,
+            pool_timeout=POOL_TIMEOUT,
+            pool_recycle=POOL_RECYCLE,
+        )
+        if STATEMENT_TIMEOUT_MS:
+            options["connect_args"] = {"options": f"-c statement_timeout={STATEMENT_TIMEOUT_MS}"}
+    return options
+
+
+# Create the SQLAlchemy engine (process-wide)
+engine = create_engine(DATABASE_URL, **_engine_options())
+
+
+@event.listens_for(engine, "connect")
+def _count_connect(dbapi_connection, connection_record):
+    metrics.record_connect()
+
+
+if TRANSACTION_POOLER and STATEMENT_TIMEOUT_MS:
+    @event.listens_for(engine, "begin")
+    def _set_local_timeout(connection):
+        # SET LOCAL ends with the transaction, so it never leaks to other pooler clients
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {STATEMENT_TIMEOUT_MS}")
+
+
+# Create session factory
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@contextmanager
+def session_scope(session_factory=SessionLocal):
+    """Session for one unit of work: commit on success, rollback on error, always close"""
+    session = session_factory()
+    try:
+        yield session
+        session.commit()
+    except BaseException:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def unit_of_work(func=None, *, session_factory=SessionLocal):
+    """
+    Decorator version of session_scope: the function receives the session as
+    its `session` keyword argument.
+
+        @unit_of_work
+        def rename(card_id, carta, session):
+            session.get(PortfolioCard, card_id).carta = carta
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with session_scope(session_factory) as session:
+                return func(*args, session=session, **kwargs)
+        return wrapper
+    return decorator(func) if func is not None else decorator
+
+
+def _async_engine_options(url):
+    options = {"pool_pre_ping": True}
+    postgres = url.get_backend_name() == "postgresql"
+    if TRANSACTION_POOLER:
+        options.update(poolclass=NullPool, pool_pre_ping=False)
+        if postgres:
+            # The pooler may hand each transaction a different server connection:
+            # no asyncpg statement cache and unique names for the unnamed statements
+            # asyncpg still prepares. https://docs.sqlalchemy.org/en/20/dialects/postgresql.html#prepared-statement-name-with-pgbouncer
+            options["connect_args"] = {
+                "statement_cache_size": 0,
+                "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+            }
+    else:
+        options.update(
+            pool_size=POOL_SIZE,
+            max_overflow=MAX_OVERFLOW,
+            pool_timeout=POOL_TIMEOUT,
+            pool_recycle=POOL_RECYCLE,
+        )
+        if postgres and STATEMENT_TIMEOUT_MS:
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(STATEMENT_TIMEOUT_MS)}}
+    return options
+
+
+def create_async_db_engine(url=ASYNC_DATABASE_URL):
+    """New AsyncEngine with the same pool settings as `engine`"""
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url = make_url(url)
+    if TRANSACTION_POOLER and url.get_backend_name() == "postgresql":
+        # SQLAlchemy's own prepared statement cache on top of asyncpg's
+        url = url.update_query_dict({"prepared_statement_cache_size": "0"})
+    async_engine = create_async_engine(url, **_async_engine_options(url))
+
+    if TRANSACTION_POOLER and STATEMENT_TIMEOUT_MS and url.get_backend_name() == "postgresql":
+        event.listen(async_engine.sync_engine, "begin", _set_local_timeout)
+    return async_engine
+
+
+_async_engine = None
+_async_engine_lock = threading.Lock()
+
+
+def get_async_engine():
+    """Process-wide AsyncEngine (asyncpg), created on first use"""
+    global _async_engine
+    with _async_engine_lock:
+        if _async_engine is None:
+            _async_engine = create_async_db_engine()
+    return _async_engine
+
+
+def async_session_factory(async_engine=None):
+    """async_sessionmaker on `async_engine` (default: the process-wide one)"""
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    # Objects are turned into dicts inside the unit of work; after commit an
+    # expired attribute would need an implicit (and in asyncio, illegal) load
+    return async_sessionmaker(async_engine or get_async_engine(), autoflush=False, expire_on_commit=False)
+
+
+@asynccontextmanager
+async def async_session_scope(session_factory):
+    """Async counterpart of session_scope"""
+    session = session_factory()
+    try:
+        yield session
+        await session.commit()
+    except BaseException:
+        await session.rollback()
+        raise
+    finally:
+        await session.close()
+
+
+def get_connection():
+    """
+    DBAPI connection (psycopg2 API: cursor/commit/rollback/close) from the shared pool.
+
+    close() returns it to the pool. Session-level statement_timeout only applies
+    in session mode; in transaction mode run `SET LOCAL` yourself if needed.
+    """
+    return engine.raw_connection()
+
+
+def pool_metrics():
+    """Pool state plus checkout counters since start (or the last reset)"""
+    pool = engine.pool
+    snapshot = {
+        "mode": POOL_MODE,
+        "checkouts": metrics.checkouts,
+        "connects": metrics.connects,
+        "waits": metrics.waits,
+        "timeouts": metrics.timeouts,
+        "avg_checkout_ms": 1000 * metrics.total_wait / metrics.checkouts if metrics.checkouts else 0.0,
+        "max_checkout_ms": 1000 * metrics.max_wait,
+    }
+    if isinstance(pool, QueuePool):
+        snapshot.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=max(pool.overflow(), 0),
+        )
+    return snapshot
 
-# Create the SQLAlchemy engine
-engine = create_engine(DATABASE_URL)
-# If using Transaction Pooler or Session Pooler, we want to ensure we disable SQLAlchemy client side pooling -
-# https://docs.sqlalchemy.org/en/20/core/pooling.html#switching-pool-implementations
-# engine = create_engine(DATABASE_URL, poolclass=NullPool)
 
 # Test the connection
-try:
-    with engine.connect() as connection:
-        print("Connection successful!")
-        print(f"Connected to: {DBNAME} at {HOST}")
-except Exception as e:
-    print(f"Failed to connect: {e}")
+if __name__ == "__main__":
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+            print("Connection successful!")
+            print(f"Connected to: {DBNAME} at {HOST} (pool mode: {POOL_MODE})")
+            print(f"Pool: {pool_metrics()}")
+    except Exception as e:
+        print(f"Failed to connect: {e}")
@@ -0,0 +1,202 @@
+"""
+In-process registry of the idioma_factor / estado_factor conversion tables.
+
+    from factor_registry import registry
+    adjusted = registry.adjust(prices, from_lang, 'PT-BR', from_cond, 'NM')
+
+Both tables are loaded once into a FactorSnapshot: a name -> code dict plus a
+numpy array of factors per table, code 0 meaning unknown (factor 1.0, like the
+frontend's getAdjustedPrice). Readers always see one consistent snapshot; a
+refresh builds a new one and swaps it in.
+
+Freshness:
+- TTL: after `ttl` seconds the next access runs one cheap version query
+  (md5 of both tables) and reloads only if the factors changed.
+- LISTEN/NOTIFY: `registry.listen()` keeps a dedicated connection listening on
+  CHANNEL (see create_factor_notify.sql) and reloads on the next access after a
+  change. Not available behind a transaction pooler; the TTL still applies.
+"""
+import select
+import sys
+import threading
+import time
+
+import numpy as np
+from sqlalchemy import text
+
+from db_connection import TRANSACTION_POOLER, engine
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+CHANNEL = 'conversion_factors_changed'
+
+# Seconds before the version is checked again
+DEFAULT_TTL = 300
+
+IDIOMA_FACTORS_SQL = text("SELECT idioma, factor FROM idioma_factor")
+ESTADO_FACTORS_SQL = text("SELECT estado, factor FROM estado_factor")
+VERSION_SQL = text("""
+    SELECT (SELECT md5(coalesce(string_agg(idioma || '=' || factor, ',' ORDER BY idioma), '')) FROM idioma_factor)
+        || (SELECT md5(coalesce(string_agg(estado || '=' || factor, ',' ORDER BY estado), '')) FROM estado_factor)
+""")
+
+
+class FactorTable:
+    """Dense integer codes for one table's names; code 0 means unknown (factor 1.0)"""
+
+    def __init__(self, factors):
+        self.codes = {}
+        values = [1.0]
+        for name, factor in factors.items():
+            self.codes[name] = len(values)
+            # Same rule as the frontend: a missing or zero factor counts as 1.0
+            values.append(float(factor or 1.0))
+        self.factors = np.array(values, dtype=np.float64)
+
+    def code(self, name):
+        return self.codes.get(name, 0)
+
+    def encode(self, names):
+        """int32 codes for a sequence of names"""
+        codes = self.codes
+        return np.fromiter((codes.get(name, 0) for name in names), dtype=np.int32, count=len(names))
+
+    def lookup(self, names):
+        """Factor of a name, or an array of factors for names or codes"""
+        if names is None or isinstance(names, str):
+            return self.factors[self.code(names)]
+        names = np.asarray(names)
+        if names.dtype.kind in 'iu':
+            return self.factors[names]
+        return self.factors[self.encode(names.tolist())]
+
+
+class FactorSnapshot:
+    """Immutable view of both tables at one version"""
+
+    def __init__(self, idioma_factors, estado_factors, version=None):
+        self.idioma = FactorTable(idioma_factors)
+        self.estado = FactorTable(estado_factors)
+        self.version = version
+        self.loaded_at = time.time()
+
+    def adjust(self, prices, from_lang, to_lang, from_cond, to_cond):
+        """See FactorRegistry.adjust; codes must come from this snapshot"""
+        prices = np.asarray(prices, dtype=np.float64)
+        return (prices
+                * self.idioma.lookup(to_lang) / self.idioma.lookup(from_lang)
+                * self.estado.lookup(to_cond) / self.estado.lookup(from_cond))
+
+
+class FactorRegistry:
+    """Conversion factors cached in memory, refreshed by TTL/version or NOTIFY"""
+
+    def __init__(self, bind=engine, ttl=DEFAULT_TTL):
+        self.bind = bind
+        self.ttl = ttl
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._stale = False
+        self._lock = threading.Lock()
+        self._listener = None
+
+    @classmethod
+    def static(cls, idioma_factors, estado_factors):
+        """Registry over fixed factors, never touching the database"""
+        registry = cls(bind=None, ttl=None)
+        registry._snapshot = FactorSnapshot(idioma_factors, estado_factors, version='static')
+        return registry
+
+    @property
+    def snapshot(self):
+        """Current FactorSnapshot, refreshed first if the TTL expired or a NOTIFY arrived"""
+        snapshot = self._snapshot
+        if snapshot is not None and (self.bind is None or not self._expired()):
+            return snapshot
+        with self._lock:
+            if self._snapshot is None or self._expired():
+                self._refresh()
+            return self._snapshot
+
+    def _expired(self):
+        return self._stale or (self.ttl is not None and time.monotonic() - self._checked_at >= self.ttl)
+
+    def _refresh(self, force=False):
+        # The flag is cleared before reading, so a NOTIFY during the read forces another refresh
+        self._stale = False
+        with self.bind.connect() as connection:
+            version = connection.execute(VERSION_SQL).scalar()
+            if force or self._snapshot is None or version != self._snapshot.version:
+                idioma = {row[0]: row[1] for row in connection.execute(IDIOMA_FACTORS_SQL)}
+                estado = {row[0]: row[1] for row in connection.execute(ESTADO_FACTORS_SQL)}
+                self._snapshot = FactorSnapshot(idioma, estado, version)
+                print(f"[INFO] Fatores de conversão carregados ({len(idioma)} idiomas, {len(estado)} estados)")
+        self._checked_at = time.monotonic()
+
+    def refresh(self, force=False):
+        """Check the version now (reload if changed, or always with force=True)"""
+        if self.bind is None:
+            return self._snapshot
+        with self._lock:
+            self._refresh(force)
+            return self._snapshot
+
+    def invalidate(self):
+        """Make the next access check the version (called on NOTIFY)"""
+        self._stale = True
+
+    def adjust(self, prices, from_lang, to_lang, from_cond, to_cond):
+        """
+        Convert prices between variants: price * to_factor / from_factor for
+        idioma and estado. Each argument is a scalar or an array of names
+        broadcastable against prices. Pre-encoded codes are only valid for the
+        snapshot that produced them: use snapshot.adjust for those.
+        """
+        return self.snapshot.adjust(prices, from_lang, to_lang, from_cond, to_cond)
+
+    def listen(self, channel=CHANNEL, reconnect_delay=5.0):
+        """Start a daemon thread that invalidates the registry on NOTIFY"""
+        if TRANSACTION_POOLER:
+            print("[INFO] LISTEN indisponível no transaction pooler; usando apenas o TTL")
+            return None
+        if self._listener is None:
+            self._listener = threading.Thread(
+                target=self._listen, args=(channel, reconnect_delay), name='factor-registry-listen', daemon=True
+            )
+            self._listener.start()
+        return self._listener
+
+    def _listen(self, channel, reconnect_delay):
+        while True:
+            connection = None
+            try:
+                # Dedicated connection: it stays LISTENing for the life of the process
+                connection = self.bind.raw_connection()
+                connection.detach()
+                dbapi_connection = connection.dbapi_connection
+                dbapi_connection.autocommit = True
+                cursor = dbapi_connection.cursor()
+                cursor.execute(f'LISTEN "{channel}"')
+                # Changes made while we were not listening
+                self.invalidate()
+                while True:
+                    if select.select([dbapi_connection], [], [], 60) == ([], [], []):
+                        continue
+                    dbapi_connection.poll()
+                    if dbapi_connection.notifies:
+                        dbapi_connection.notifies.clear()
+                        self.invalidate()
+            except Exception as e:
+                print(f"[ERROR] LISTEN {channel} caiu ({e}); reconectando em {reconnect_delay:.0f}s")
+                if connection is not None:
+                    try:
+                        connection.close()
+                    except Exception:
+                        pass
+                time.sleep(reconnect_delay)
+
+
+# Process-wide registry; nothing is loaded until the first access
+registry = FactorRegistry()
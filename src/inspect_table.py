@@ -1,19 +1,7 @@
-from sqlalchemy import create_engine, text
-from dotenv import load_dotenv
-import os
+from sqlalchemy import text
 
-# Load environment variables
-load_dotenv()
-
-# Database connection
-USER = os.getenv("user")
-PASSWORD = os.getenv("password")
-HOST = os.getenv("host")
-PORT = os.getenv("port")
-DBNAME = os.getenv("dbname")
-
-DATABASE_URL = f"postgresql+psycopg2://{USER}:{PASSWORD}@{HOST}:{PORT}/{DBNAME}?sslmode=require"
-engine = create_engine(DATABASE_URL)
+# Database connection (shared pool)
+from db_connection import engine
 
 # Check existing table structure
 with engine.connect() as connection:
@@ -0,0 +1,366 @@
+"""
+Transaction ledger: holdings and realized P&L from the transactions table.
+
+Transactions (database/transactions-schema.sql) are replayed per user and card
+variant (carta, idioma, estado) in (data, created_at, id) order, in one pass
+over the sorted rows. COMPRA adds units at preco_unitario; VENDA and TRADE
+dispose of units at preco_unitario (a trade is valued like a sale), matched
+against the open lots FIFO or at average cost. Units disposed of beyond the
+quantity held have no cost basis. tipo is free text (the frontend writes
+'compra' / 'venda'), so it is compared upper-cased and trimmed; rows of any
+other tipo are skipped and counted, never booked as sales.
+
+The result is kept in ledger_positions (create_ledger_tables.sql). update()
+reads only transactions created after the watermark in ledger_state and
+applies them on top of the stored positions; a transaction dated before the
+last one applied to its position makes that user's positions replay from
+scratch. Edits and deletes never move the watermark, so a trigger records
+their users in ledger_pending and update() replays those users too.
+
+    ledger = LedgerEngine(method='fifo')
+    ledger.update()
+    ledger.get_holdings(user_id)
+
+Usage:
+    python ledger.py [--method fifo|average] [--rebuild]
+"""
+import argparse
+import json
+import sys
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+
+from db_connection import engine
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+METHODS = ('fifo', 'average')
+
+BUY = 'COMPRA'
+DISPOSALS = ('VENDA', 'TRADE')
+TIPOS = (BUY, *DISPOSALS)
+
+# Transactions committed late can carry a created_at slightly before the
+# watermark; this window is re-read and deduplicated by id
+OVERLAP = timedelta(minutes=10)
+
+_COLUMNS = """
+    id, user_id, carta, coalesce(idioma, '') AS idioma, coalesce(estado, '') AS estado,
+    upper(trim(tipo)) AS tipo, quantidade, preco_unitario, data, created_at
+"""
+
+NEW_TRANSACTIONS_SQL = text(f"""
+    SELECT {_COLUMNS}
+    FROM transactions
+    WHERE created_at > :since
+    ORDER BY data, created_at, id
+""")
+
+USER_TRANSACTIONS_SQL = text(f"""
+    SELECT {_COLUMNS}
+    FROM transactions
+    WHERE user_id = ANY(CAST(:users AS uuid[]))
+    ORDER BY data, created_at, id
+""")
+
+ALL_TRANSACTIONS_SQL = text(f"""
+    SELECT {_COLUMNS}
+    FROM transactions
+    ORDER BY data, created_at, id
+""")
+
+STATE_SQL = text("SELECT watermark, ids_recentes FROM ledger_state WHERE metodo = :metodo")
+
+SAVE_STATE_SQL = text("""
+    INSERT INTO ledger_state (metodo, watermark, ids_recentes) VALUES (:metodo, :watermark, CAST(:ids AS uuid[]))
+    ON CONFLICT (metodo) DO UPDATE SET
+        watermark = EXCLUDED.watermark,
+        ids_recentes = EXCLUDED.ids_recentes,
+        updated_at = NOW()
+""")
+
+LOAD_POSITIONS_SQL = text("""
+    SELECT user_id, carta, idioma, estado, quantidade, custo, realizado, receita, lotes, transacoes,
+           ultima_data, ultima_criacao, ultimo_id
+    FROM ledger_positions
+    WHERE metodo = :metodo AND user_id = ANY(CAST(:users AS uuid[]))
+""")
+
+# Users whose transactions were edited or deleted; taken inside the run's transaction
+TAKE_PENDING_SQL = text("DELETE FROM ledger_pending WHERE metodo = :metodo RETURNING user_id")
+
+CLEAR_PENDING_SQL = text("DELETE FROM ledger_pending WHERE metodo = :metodo")
+
+DELETE_POSITIONS_SQL = text("DELETE FROM ledger_positions WHERE metodo = :metodo AND user_id = ANY(CAST(:users AS uuid[]))")
+
+DELETE_ALL_SQL = text("DELETE FROM ledger_positions WHERE metodo = :metodo")
+
+UPSERT_SQL = text("""
+    INSERT INTO ledger_positions (user_id, metodo, carta, idioma, estado, quantidade, custo, realizado, receita,
+                                  lotes, transacoes, ultima_data, ultima_criacao, ultimo_id)
+    VALUES (:user_id, :metodo, :carta, :idioma, :estado, :quantidade, :custo, :realizado, :receita,
+            CAST(:lotes AS jsonb), :transacoes, :ultima_data, :ultima_criacao, :ultimo_id)
+    ON CONFLICT (user_id, metodo, carta, idioma, estado) DO UPDATE SET
+        quantidade = EXCLUDED.quantidade,
+        custo = EXCLUDED.custo,
+        realizado = EXCLUDED.realizado,
+        receita = EXCLUDED.receita,
+        lotes = EXCLUDED.lotes,
+        transacoes = EXCLUDED.transacoes,
+        ultima_data = EXCLUDED.ultima_data,
+        ultima_criacao = EXCLUDED.ultima_criacao,
+        ultimo_id = EXCLUDED.ultimo_id,
+        updated_at = NOW()
+""")
+
+HOLDINGS_SQL = text("""
+    SELECT carta, nullif(idioma, '') AS idioma, nullif(estado, '') AS estado, quantidade, custo, realizado, receita
+    FROM ledger_positions
+    WHERE metodo = :metodo AND user_id = :user_id AND (quantidade > 0 OR :include_closed)
+    ORDER BY carta, idioma, estado
+""")
+
+
+class Position:
+    """Running state of one (user, carta, idioma, estado)"""
+    __slots__ = ('quantity', 'cost', 'realized', 'proceeds', 'lots', 'count', 'last')
+
+    def __init__(self, quantity=0, cost=0.0, realized=0.0, proceeds=0.0, lots=(), count=0, last=None):
+        self.quantity = quantity
+        self.cost = cost
+        self.realized = realized
+        self.proceeds = proceeds
+        self.lots = deque([list(lot) for lot in lots]) if lots else deque()
+        self.count = count
+        # (data, created_at, id) of the last transaction applied
+        self.last = last
+
+    def apply(self, tipo, quantidade, preco_unitario, fifo=True):
+        """Apply one transaction (tipo in TIPOS, upper-cased); quantities are units, prices per unit"""
+        if tipo == BUY:
+            self.quantity += quantidade
+            self.cost += quantidade * preco_unitario
+            if fifo:
+                self.lots.append([quantidade, preco_unitario])
+            return
+        if tipo not in DISPOSALS:
+            raise ValueError(f"tipo de transação inválido: {tipo!r} (use {', '.join(TIPOS)})")
+
+        matched = min(quantidade, self.quantity)
+        if fifo:
+            matched_cost, remaining = 0.0, matched
+            lots = self.lots
+            while remaining:
+                lot = lots[0]
+                take = lot[0] if lot[0] <= remaining else remaining
+                matched_cost += take * lot[1]
+                remaining -= take
+                if take == lot[0]:
+                    lots.popleft()
+                else:
+                    lot[0] -= take
+        else:
+            matched_cost = self.cost * matched / self.quantity if matched else 0.0
+
+        proceeds = quantidade * preco_unitario
+        self.quantity -= matched
+        self.cost = self.cost - matched_cost if self.quantity else 0.0
+        self.proceeds += proceeds
+        self.realized += proceeds - matched_cost
+
+
+def _key(row):
+    return (str(row.user_id), row.carta, row.idioma, row.estado)
+
+
+def _sort_key(row):
+    return (row.data, row.created_at, str(row.id))
+
+
+def replay(rows, method='fifo', positions=None):
+    """
+    Apply transaction rows sorted by (data, created_at, id) in one pass.
+
+    rows are (id, user_id, carta, idioma, estado, tipo, quantidade,
+    preco_unitario, data, created_at), the columns of _COLUMNS; positions (key -> Position) is
+    updated in place and returned. Rows whose tipo is not in TIPOS are skipped.
+    """
+    fifo = method == 'fifo'
+    positions = {} if positions is None else positions
+    get = positions.get
+    skipped = {}
+    for id_, user_id, carta, idioma, estado, tipo, quantidade, preco_unitario, data, created_at in rows:
+        if tipo not in TIPOS:
+            skipped[tipo] = skipped.get(tipo, 0) + 1
+            continue
+        key = (str(user_id), carta, idioma, estado)
+        position = get(key)
+        if position is None:
+            position = positions[key] = Position()
+        position.apply(tipo, quantidade, float(preco_unitario), fifo)
+        position.count += 1
+        position.last = (data, created_at, str(id_))
+    if skipped:
+        print(f"[ERROR] Transações com tipo desconhecido ignoradas: "
+              f"{', '.join(f'{tipo!r} x{count}' for tipo, count in skipped.items())}")
+    return positions
+
+
+class LedgerEngine:
+    """Materialized ledger positions, kept up to date incrementally"""
+    def __init__(self, bind=engine, method='fifo'):
+        if method not in METHODS:
+            raise ValueError(f"method inválido: {method!r} (use {', '.join(METHODS)})")
+        self.bind = bind
+        self.method = method
+
+    def _lock(self, connection):
+        connection.execute(text("SELECT pg_advisory_xact_lock(hashtext(:name))"), {'name': f"ledger_{self.method}"})
+
+    def _save(self, connection, positions, keys):
+        rows = []
+        for key in keys:
+            position = positions[key]
+            user_id, carta, idioma, estado = key
+            rows.append({
+                'user_id': user_id, 'metodo': self.method, 'carta': carta, 'idioma': idioma, 'estado': estado,
+                'quantidade': position.quantity, 'custo': round(position.cost, 2),
+                'realizado': round(position.realized, 2), 'receita': round(position.proceeds, 2),
+                'lotes': json.dumps(list(position.lots)), 'transacoes': position.count,
+                'ultima_data': position.last[0], 'ultima_criacao': position.last[1], 'ultimo_id': position.last[2],
+            })
+        if rows:
+            connection.execute(UPSERT_SQL, rows)
+
+    def _save_state(self, connection, rows, watermark):
+        """rows: every applied transaction that may still fall in the overlap window"""
+        watermark = max([watermark, *(row.created_at for row in rows)])
+        ids = sorted({str(row.id) for row in rows if row.created_at > watermark - OVERLAP})
+        connection.execute(SAVE_STATE_SQL, {'metodo': self.method, 'watermark': watermark, 'ids': ids})
+
+    def rebuild(self):
+        """Replay every transaction from scratch"""
+        start = time.perf_counter()
+        with self.bind.begin() as connection:
+            self._lock(connection)
+            connection.execute(CLEAR_PENDING_SQL, {'metodo': self.method})
+            rows = connection.execute(ALL_TRANSACTIONS_SQL).all()
+            positions = replay(rows, self.method)
+            connection.execute(DELETE_ALL_SQL, {'metodo': self.method})
+            self._save(connection, positions, positions)
+            self._save_state(connection, rows, datetime(1970, 1, 1, tzinfo=timezone.utc))
+        print(f"[OK] Ledger ({self.method}) reconstruído: {len(rows)} transações, {len(positions)} posições "
+              f"em {(time.perf_counter() - start) * 1000:.0f} ms")
+        return len(rows)
+
+    def update(self):
+        """Apply transactions created since the last run and replay users with edits or deletes
+
+        Returns how many new transactions were applied.
+        """
+        with self.bind.connect() as connection:
+            if connection.execute(STATE_SQL, {'metodo': self.method}).first() is None:
+                return self.rebuild()
+
+        start = time.perf_counter()
+        with self.bind.begin() as connection:
+            self._lock(connection)
+            state = connection.execute(STATE_SQL, {'metodo': self.method}).first()
+            # Taken before reading transactions, so edits committed after this are left for the next run
+            pending = {str(user_id) for user_id in connection.execute(TAKE_PENDING_SQL, {'metodo': self.method}).scalars()}
+            applied = {str(value) for value in state.ids_recentes}
+            window = connection.execute(NEW_TRANSACTIONS_SQL, {'since': state.watermark - OVERLAP}).all()
+            rows = [row for row in window if str(row.id) not in applied]
+            if not rows and not pending:
+                print(f"[INFO] Ledger ({self.method}) já está em dia")
+                return 0
+
+            users = sorted({str(row.user_id) for row in rows})
+            positions = {}
+            for stored in connection.execute(LOAD_POSITIONS_SQL, {'metodo': self.method, 'users': users}):
+                positions[(str(stored.user_id), stored.carta, stored.idioma, stored.estado)] = Position(
+                    stored.quantidade, float(stored.custo), float(stored.realizado), float(stored.receita),
+                    [(quantity, float(price)) for quantity, price in stored.lotes], stored.transacoes,
+                    (stored.ultima_data, stored.ultima_criacao, str(stored.ultimo_id)))
+
+            # A transaction sorting before what its position already applied
+            # (backdated, or committed late) makes its user replay from scratch
+            replay_users = pending | {
+                str(row.user_id) for row in rows
+                if _key(row) in positions and _sort_key(row) < positions[_key(row)].last
+            }
+            changed = set()
+            new_rows = [row for row in rows if str(row.user_id) not in replay_users]
+            replay(new_rows, self.method, positions)
+            changed.update(_key(row) for row in new_rows)
+
+            if replay_users:
+                users = sorted(replay_users)
+                history = connection.execute(USER_TRANSACTIONS_SQL, {'users': users}).all()
+                replayed = replay(history, self.method)
+                connection.execute(DELETE_POSITIONS_SQL, {'metodo': self.method, 'users': users})
+                positions.update(replayed)
+                changed.update(replayed)
+
+            self._save(connection, positions, changed)
+            self._save_state(connection, window, state.watermark)
+        print(f"[OK] Ledger ({self.method}): {len(rows)} transações novas aplicadas, "
+              f"{len(replay_users)} usuário(s) reprocessado(s) ({len(pending)} com edições), em {(time.perf_counter() - start) * 1000:.0f} ms")
+        return len(rows)
+
+    def get_holdings(self, user_id, include_closed=False):
+        """Positions of a user: quantity, open cost, average cost and realized P&L"""
+        try:
+            with self.bind.connect() as connection:
+                rows = connection.execute(HOLDINGS_SQL, {'metodo': self.method, 'user_id': user_id,
+                                                         'include_closed': include_closed}).all()
+        except Exception as e:
+            print(f"[ERROR] Erro ao buscar posições do ledger: {e}")
+            return []
+        return [
+            {
+                'carta': row.carta,
+                'idioma': row.idioma,
+                'estado': row.estado,
+                'quantidade': row.quantidade,
+                'custo': float(row.custo),
+                'custo_medio': round(float(row.custo) / row.quantidade, 2) if row.quantidade else 0,
+                'realizado': float(row.realizado),
+                'receita': float(row.receita),
+            }
+            for row in rows
+        ]
+
+    def get_summary(self, user_id):
+        """Totals over every position of a user, closed ones included"""
+        holdings = self.get_holdings(user_id, include_closed=True)
+        return {
+            'quantidade': sum(item['quantidade'] for item in holdings),
+            'custo': round(sum(item['custo'] for item in holdings), 2),
+            'realizado': round(sum(item['realizado'] for item in holdings), 2),
+            'receita': round(sum(item['receita'] for item in holdings), 2),
+            'posicoes_abertas': sum(1 for item in holdings if item['quantidade'] > 0),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--method', default='fifo', choices=METHODS)
+    parser.add_argument('--rebuild', action='store_true', help='Reprocessa todas as transações')
+    args = parser.parse_args()
+
+    ledger = LedgerEngine(method=args.method)
+    try:
+        ledger.rebuild() if args.rebuild else ledger.update()
+    except Exception as e:
+        print(f"[ERROR] Erro ao atualizar ledger: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
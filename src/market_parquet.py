@@ -0,0 +1,286 @@
+"""
+Columnar Parquet snapshots of the market price tables, for analytics off Supabase.
+
+    python market_parquet.py sync                  # append new collection days of every source
+    python market_parquet.py sync --full           # export every day again
+    python market_parquet.py info
+
+Layout: <root>/<table>/dia=YYYY-MM-DD/part-0.parquet, one file per collection
+day (data_coleta::date, the same day the rollups use), rows sorted by card.
+carta/idioma/estado and the other low-cardinality text columns are
+dictionary-encoded, prices are float64 and uuids strings. A sync exports the
+newest day already on disk again (it may have been taken mid-collection) and
+appends every later day; older files are never touched.
+
+MarketDataset reads those files memory-mapped, with filters pushed down to
+the row groups:
+
+    data = MarketDataset()
+    offers = data.read('myp_cards_meg', start=date(2026, 1, 1), filters=[('idioma', '=', 'ING')])
+    data.history('Pikachu ex', 'ING', 'NM')    # [{'date', 'price'}], like PriceRollups.get_history
+    data.daily_rollup('myp_cards_meg')         # card_price_daily columns, computed locally
+
+Environment: MARKET_PARQUET_DIR (default ./market_parquet).
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+from datetime import date
+from decimal import Decimal
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from sqlalchemy import text
+
+from db_connection import engine
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+# Exported tables: card name column(s) (coalesced in order), price column and
+# the text columns stored dictionary-encoded
+SOURCES = {
+    'myp_cards_meg': {
+        'carta': ['carta'], 'price': 'valor',
+        'dictionary': ['carta', 'idioma', 'estado', 'vendedor'],
+    },
+    'cartas_precos_liga': {
+        'carta': ['slug_carta', 'carta', 'nome'], 'price': 'preco',
+        'dictionary': ['slug_carta', 'carta', 'nome', 'idioma', 'estado', 'vendedor'],
+    },
+    'psa_raw_prices': {
+        'carta': ['card_name'], 'price': 'price',
+        'dictionary': ['card_name', 'grade'],
+    },
+    'pricecharting_overview': {
+        'carta': ['card_name'], 'price': 'ungraded_price',
+        'dictionary': ['card_name', 'card_slug'],
+    },
+}
+
+PARTITION = 'dia'
+FILE_NAME = 'part-0.parquet'
+
+# Collection days from :desde on; the table name comes from SOURCES only
+DAYS_SQL = """
+    SELECT data_coleta::date AS dia
+    FROM {table}
+    WHERE data_coleta >= CAST(:desde AS date)
+    GROUP BY 1
+    ORDER BY 1
+"""
+
+DAY_SQL = """
+    SELECT *
+    FROM {table}
+    WHERE data_coleta >= CAST(:dia AS date) AND data_coleta < CAST(:dia AS date) + 1
+    ORDER BY {carta}
+"""
+
+
+def default_root():
+    return os.getenv('MARKET_PARQUET_DIR') or 'market_parquet'
+
+
+def _plain_column(values):
+    """Decimal -> float64 and UUID -> str, so pyarrow infers numeric / string columns"""
+    sample = values.dropna()
+    if sample.empty:
+        return values
+    first = sample.iloc[0]
+    if isinstance(first, Decimal):
+        return pd.to_numeric(values, errors='coerce').astype('float64')
+    if isinstance(first, uuid.UUID):
+        return values.map(lambda value: None if value is None else str(value))
+    return values
+
+
+def to_arrow(frame, config):
+    """Arrow table of one day of a source: plain types, float64 price, dictionary-encoded text"""
+    frame = frame.apply(_plain_column)
+    if config['price'] in frame:
+        frame[config['price']] = pd.to_numeric(frame[config['price']], errors='coerce').astype('float64')
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    for name in config['dictionary']:
+        index = table.schema.get_field_index(name)
+        if index < 0:
+            continue
+        kind = table.schema.field(index).type
+        if pa.types.is_string(kind) or pa.types.is_large_string(kind) or pa.types.is_null(kind):
+            table = table.set_column(index, name, pc.dictionary_encode(pc.cast(table[name], pa.string())))
+    return table
+
+
+def carta_column(table, config):
+    """Card name of every row: first non-null of the source's carta columns, as plain strings"""
+    columns = [pc.cast(table[name], pa.string()) for name in config['carta'] if name in table.column_names]
+    return pc.coalesce(*columns) if len(columns) > 1 else columns[0]
+
+
+class ParquetExporter:
+    """Incremental export of the market tables to the Parquet layout above"""
+
+    def __init__(self, bind=engine, root=None):
+        self.bind = bind
+        self.root = root or default_root()
+
+    def sync(self, sources=None, full=False):
+        """Export new collection days of each source; returns {source: {'days', 'rows'}} (None on error)"""
+        results = {}
+        for source in sources or SOURCES:
+            try:
+                results[source] = self.sync_source(source, full)
+            except Exception as e:
+                print(f"[ERROR] Erro ao exportar {source}: {e}")
+                results[source] = None
+        return results
+
+    def sync_source(self, source, full=False):
+        config = SOURCES[source]
+        days = MarketDataset(self.root).days(source)
+        # The newest day on disk is exported again: it may have been partial
+        since = date.min if full or not days else days[-1]
+        start = time.perf_counter()
+        rows = 0
+
+        with self.bind.connect() as connection:
+            pending = connection.execute(text(DAYS_SQL.format(table=source)), {'desde': since}).scalars().all()
+            query = text(DAY_SQL.format(table=source, carta=', '.join(config['carta'])))
+            for day in pending:
+                frame = pd.read_sql(query, connection, params={'dia': day})
+                self._write(source, day, to_arrow(frame, config))
+                rows += len(frame)
+
+        print(f"[OK] {source}: {len(pending)} dias, {rows} linhas exportadas em "
+              f"{time.perf_counter() - start:.1f} s")
+        return {'days': len(pending), 'rows': rows}
+
+    def _write(self, source, day, table):
+        directory = os.path.join(self.root, source, f"{PARTITION}={day.isoformat()}")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, FILE_NAME)
+        # Readers never see a half-written file
+        tmp_path = f"{path}.tmp"
+        pq.write_table(table, tmp_path, compression='zstd')
+        os.replace(tmp_path, path)
+
+
+class MarketDataset:
+    """Memory-mapped reader of the exported Parquet files"""
+
+    def __init__(self, root=None):
+        self.root = root or default_root()
+
+    def days(self, source):
+        """Exported collection days of a source, oldest first"""
+        directory = os.path.join(self.root, source)
+        if not os.path.isdir(directory):
+            return []
+        prefix = f"{PARTITION}="
+        return sorted(
+            date.fromisoformat(name[len(prefix):]) for name in os.listdir(directory)
+            if name.startswith(prefix) and os.path.exists(os.path.join(directory, name, FILE_NAME))
+        )
+
+    def path(self, source, day):
+        return os.path.join(self.root, source, f"{PARTITION}={day.isoformat()}", FILE_NAME)
+
+    def read(self, source, columns=None, start=None, end=None, filters=None):
+        """
+        Rows of the days in [start, end] as one Arrow table, with a date32 'dia' column.
+
+        filters uses the pyarrow.parquet syntax ([('idioma', '=', 'ING')], or a list
+        of such lists for OR) and is applied while reading. Returns None when no
+        exported day is in range.
+        """
+        tables = []
+        for day in self.days(source):
+            if (start and day < start) or (end and day > end):
+                continue
+            table = pq.read_table(self.path(source, day), columns=columns, filters=filters, memory_map=True)
+            tables.append(table.append_column(PARTITION, pa.array([day] * table.num_rows, pa.date32())))
+        if not tables:
+            return None
+        return pa.concat_tables(tables, promote_options='default')
+
+    def history(self, carta, idioma='ING', estado='NM', source='myp_cards_meg', metric='min', start=None, end=None):
+        """Daily price of a card as [{'date', 'price'}] (forecast input); metric: min, median, mean or max"""
+        config = SOURCES[source]
+        variant = [(name, '=', value) for name, value in (('idioma', idioma), ('estado', estado)) if value]
+        # Any of the card columns may hold the name (the frontend matches liga by slug, nome or carta)
+        filters = [[(name, '=', carta), *variant] for name in config['carta']]
+        try:
+            table = self.read(source, columns=[*config['carta'], config['price']], start=start, end=end,
+                              filters=filters)
+        except Exception as e:
+            print(f"[ERROR] Erro ao ler histórico de {carta} em {source}: {e}")
+            return []
+        if table is None:
+            return []
+        prices = table.select([PARTITION, config['price']]).to_pandas()
+        prices = prices[prices[config['price']] > 0]
+        daily = prices.groupby(PARTITION)[config['price']].agg(metric)
+        return [{'date': day.isoformat(), 'price': round(float(price), 2)} for day, price in daily.items()]
+
+    def daily_rollup(self, source='myp_cards_meg', start=None, end=None):
+        """Per (carta, idioma, estado, dia) offer statistics, the card_price_daily columns, as a DataFrame"""
+        config = SOURCES[source]
+        table = self.read(source, start=start, end=end)
+        if table is None:
+            return pd.DataFrame()
+        keys = ['carta'] + [name for name in ('idioma', 'estado') if name in table.column_names]
+        columns = {'carta': carta_column(table, config), PARTITION: table[PARTITION], 'preco': table[config['price']]}
+        for name in keys[1:]:
+            # Missing idioma/estado are stored as '' in the rollup tables
+            columns[name] = pc.fill_null(pc.cast(table[name], pa.string()), '')
+        offers = pa.table(columns).to_pandas()
+        offers = offers[offers['preco'] > 0]
+        grouped = offers.groupby([*keys, PARTITION])['preco']
+        return grouped.agg(
+            ofertas='count', preco_min='min', preco_mediana='median', preco_medio='mean', preco_max='max'
+        ).reset_index()
+
+    def info(self):
+        """Days, rows and bytes on disk per exported source"""
+        summary = {}
+        for source in SOURCES:
+            days = self.days(source)
+            paths = [self.path(source, day) for day in days]
+            summary[source] = {
+                'days': len(days),
+                'first': days[0].isoformat() if days else None,
+                'last': days[-1].isoformat() if days else None,
+                'rows': sum(pq.ParquetFile(path).metadata.num_rows for path in paths),
+                'bytes': sum(os.path.getsize(path) for path in paths),
+            }
+        return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['sync', 'info'])
+    parser.add_argument('--root', help='Diretório dos arquivos (padrão: MARKET_PARQUET_DIR)')
+    parser.add_argument('--source', action='append', choices=list(SOURCES), help='Tabela (repetível; padrão: todas)')
+    parser.add_argument('--full', action='store_true', help='Exporta todos os dias de novo')
+    args = parser.parse_args()
+
+    if args.command == 'sync':
+        results = ParquetExporter(root=args.root).sync(args.source, args.full)
+        if any(result is None for result in results.values()):
+            sys.exit(1)
+        return
+
+    print("-" * 60)
+    for source, summary in MarketDataset(args.root).info().items():
+        print(f"  {source:24s} {summary['days']:4d} dias ({summary['first']} a {summary['last']}), "
+              f"{summary['rows']} linhas, {summary['bytes'] / 1024 / 1024:.1f} MB")
+    print("-" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""
+Read-through cache for PortfolioCardService.
+
+    service = CachedPortfolioService(PortfolioCardService(), PortfolioCache.from_env())
+    service.get_all_cards(user_id)      # database once, then cache until a change
+    service.update_card(card_id, qtd=2) # invalidates that card and its user only
+
+get_card_by_id, get_all_cards, get_top_cards and get_portfolio_stats go through
+the cache (get_top_cards by='market_value' does not: it depends on market
+prices, which no card write invalidates); every other call goes straight to
+the wrapped service. Entries are JSON, so both backends return fresh copies:
+
+- MemoryBackend: in-process LRU with TTL (the default).
+- RedisBackend: any client with the redis-py get/set/incr API, shared by every
+  process; a local Redis-compatible server can stand in for the real one.
+
+Invalidation uses generation counters instead of key scans: every key embeds
+the current generation of its user (or card), and a change only increments
+the counters it touches, through the service's change listener. Entries of
+the old generation are never read again and age out by TTL/LRU. Results that
+are empty or None are not cached, since the service also returns them on
+errors.
+
+Only writes that go through the wrapped service (or a bulk_import given this
+cache) invalidate. Writes from the frontend, from SQL or from another process
+with its own MemoryBackend are not seen: those entries stay stale until
+PORTFOLIO_CACHE_TTL expires, so keep the TTL at the staleness you accept.
+
+Environment: PORTFOLIO_CACHE_URL (redis://..., optional),
+PORTFOLIO_CACHE_SIZE (default 1024), PORTFOLIO_CACHE_TTL (seconds, default 300;
+the longest an entry survives writes made outside this process' service).
+"""
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from portfolio_service import MARKET_VALUE
+from serialization import dumps, loads
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+# Generation counter for reads that are not scoped to one user (get_all_cards / get_portfolio_stats without user_id)
+ALL_USERS = '*'
+
+
+class CacheMetrics:
+    """Thread-safe hit/miss/eviction counters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.stores = 0
+            self.evictions = 0
+            self.expirations = 0
+            self.invalidations = 0
+            self.errors = 0
+
+    def record(self, counter, amount=1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def snapshot(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'stores': self.stores,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'errors': self.errors,
+            }
+
+
+class MemoryBackend:
+    """In-process LRU with TTL; generation counters are kept apart and never evicted"""
+
+    def __init__(self, max_entries=1024, ttl=300, metrics=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.metrics = metrics
+        self._entries = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at > now:
+                self._entries.move_to_end(key)
+                return value
+            del self._entries[key]
+        if self.metrics:
+            self.metrics.record('expirations')
+        return None
+
+    def set(self, key, value):
+        evicted = 0
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+        if evicted and self.metrics:
+            self.metrics.record('evictions', evicted)
+
+    def counter(self, key):
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisBackend:
+    """Shared cache on a Redis-compatible server; entries expire through SET ... EX"""
+
+    def __init__(self, client, ttl=300, prefix='portfolio', metrics=None):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.metrics = metrics
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        # Optional dependency: only needed when PORTFOLIO_CACHE_URL is set
+        import redis
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def get(self, key):
+        value = self.client.get(f"{self.prefix}:{key}")
+        return value.decode() if isinstance(value, bytes) else value
+
+    def set(self, key, value):
+        self.client.set(f"{self.prefix}:{key}", value, ex=int(self.ttl))
+
+    def counter(self, key):
+        value = self.client.get(f"{self.prefix}:gen:{key}")
+        return int(value) if value is not None else 0
+
+    def incr(self, key):
+        return self.client.incr(f"{self.prefix}:gen:{key}")
+
+
+class PortfolioCache:
+    """Generation-keyed JSON cache over a backend"""
+
+    def __init__(self, backend=None, metrics=None):
+        self.metrics = metrics or CacheMetrics()
+        self.backend = backend or MemoryBackend(metrics=self.metrics)
+        if getattr(self.backend, 'metrics', None) is None:
+            self.backend.metrics = self.metrics
+
+    @classmethod
+    def from_env(cls):
+        metrics = CacheMetrics()
+        ttl = float(os.getenv('PORTFOLIO_CACHE_TTL', '300'))
+        url = os.getenv('PORTFOLIO_CACHE_URL')
+        if url:
+            backend = RedisBackend.from_url(url, ttl=ttl, metrics=metrics)
+        else:
+            backend = MemoryBackend(int(os.getenv('PORTFOLIO_CACHE_SIZE', '1024')), ttl, metrics)
+        return cls(backend, metrics)
+
+    def key(self, name, scope, args):
+        """Cache key of a read: method, arguments and the scope's current generation"""
+        generation = self.backend.counter(scope)
+        return f"{name}:{scope}:{generation}:{json.dumps(args, sort_keys=True, default=str)}"
+
+    def read_through(self, name, scope, args, loader):
+        """Cached value of loader() for (name, args) in `scope` ('user:<id>', 'card:<id>' or ALL_USERS)"""
+        try:
+            key = self.key(name, scope, args)
+            cached = self.backend.get(key)
+        except Exception as e:
+            # The cache is an optimization: a broken backend falls back to the database
+            print(f"[ERROR] Erro ao ler cache do portfolio: {e}")
+            self.metrics.record('errors')
+            return loader()
+
+        if cached is not None:
+            self.metrics.record('hits')
+            return loads(cached)
+        self.metrics.record('misses')
+
+        value = loader()
+        if value:
+            try:
+                self.backend.set(key, dumps(value))
+                self.metrics.record('stores')
+            except Exception as e:
+                print(f"[ERROR] Erro ao gravar cache do portfolio: {e}")
+                self.metrics.record('errors')
+        return value
+
+    def invalidate_users(self, user_ids):
+        """Invalidate the reads of these users and the cross-user reads (e.g. after a bulk import)"""
+        self.invalidate(ALL_USERS, *sorted({_user_scope(user_id) for user_id in user_ids if user_id}))
+
+    def invalidate(self, *scopes):
+        """Move scopes to a new generation; their old entries are never read again"""
+        for scope in scopes:
+            try:
+                self.backend.incr(scope)
+                self.metrics.record('invalidations')
+            except Exception as e:
+                print(f"[ERROR] Erro ao invalidar cache do portfolio ({scope}): {e}")
+                self.metrics.record('errors')
+
+
+def _user_scope(user_id):
+    return f"user:{user_id}" if user_id else ALL_USERS
+
+
+class CachedPortfolioService:
+    """PortfolioCardService with cached reads and change-driven invalidation"""
+
+    def __init__(self, service, cache=None):
+        self.service = service
+        self.cache = cache or PortfolioCache()
+        service.add_listener(self.on_card_change)
+
+    def __getattr__(self, name):
+        # Writes and uncached reads go straight to the service
+        return getattr(self.service, name)
+
+    def on_card_change(self, event, card, previous=None):
+        """PortfolioCardService listener: invalidate the card, its user(s) and the cross-user reads"""
+        scopes = {f"card:{card['id']}", ALL_USERS}
+        for value in (card, previous):
+            if value and value.get('user_id'):
+                scopes.add(_user_scope(value['user_id']))
+        self.cache.invalidate(*sorted(scopes))
+
+    def get_card_by_id(self, card_id):
+        return self.cache.read_through('card', f"card:{card_id}", [str(card_id)],
+                                       lambda: self.service.get_card_by_id(card_id))
+
+    def get_all_cards(self, user_id=None):
+        return self.cache.read_through('all_cards', _user_scope(user_id), [str(user_id)],
+                                       lambda: self.service.get_all_cards(user_id))
+
+    def get_portfolio_stats(self, user_id=None):
+        return self.cache.read_through('stats', _user_scope(user_id), [str(user_id)],
+                                       lambda: self.service.get_portfolio_stats(user_id))
+
+    def get_top_cards(self, user_id, limit=5, by='price', prices=None):
+        if by == MARKET_VALUE or not user_id:
+            # Market value changes with prices, which no card write invalidates; a missing user_id raises in the service
+            return self.service.get_top_cards(user_id, limit, by, prices)
+        return self.cache.read_through('top_cards', f"user:{user_id}", [str(user_id), limit, by],
+                                       lambda: self.service.get_top_cards(user_id, limit, by))
+
+    def cache_metrics(self):
+        return self.cache.metrics.snapshot()
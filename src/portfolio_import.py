@@ -0,0 +1,293 @@
+"""
+Bulk import of portfolio lots into portfolio_cards.
+
+Rows (CSV, JSON/JSONL or any iterable of dicts) are validated one by one and
+spooled to a temporary CSV, then streamed into the table with PostgreSQL COPY
+inside a single transaction. If COPY is not available (other drivers, poolers
+that reject it) the same spool is replayed as multi-row INSERT batches.
+Invalid rows are skipped and listed in the returned report. Given a
+PortfolioCache, the users that received lots are invalidated after commit.
+
+Usage:
+    python portfolio_import.py compras.csv --user-id <uuid> [--dry-run]
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import tempfile
+import uuid
+from datetime import date, datetime, timezone
+from decimal import Decimal, InvalidOperation
+
+from db_connection import engine
+from portfolio_service import PortfolioCard
+
+COLUMNS = ['id', 'carta', 'data_compra', 'preco_compra', 'idioma', 'qtd', 'estado', 'user_id', 'created_at']
+COPY_SQL = f"COPY portfolio_cards ({', '.join(COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+
+# Rows per INSERT batch when COPY is not available
+BATCH_SIZE = 1000
+
+# Spool stays in memory up to this size, then moves to disk
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+
+def _parse_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    value = str(value).strip()
+    for fmt in ('%Y-%m-%d', '%d/%m/%Y'):
+        try:
+            return datetime.strptime(value[:10], fmt).date()
+        except ValueError:
+            pass
+    raise ValueError(f"data_compra inválida: {value!r}")
+
+
+# Integer part grouped in thousands by `sep`: 1.234.567 / 1,234
+_GROUPED = {sep: re.compile(rf'\d{{1,3}}(?:{re.escape(sep)}\d{{3}})+') for sep in '.,'}
+
+# One separator followed by exactly 3 digits: 1.234 or 1,234 may be thousands or decimals
+_AMBIGUOUS = re.compile(r'[1-9]\d{0,2}[.,]\d{3}')
+
+
+def _normalize_number(text):
+    """'1.234,56' / '1,234.56' / '1234,5' -> '1234.56' style; raises ValueError when ambiguous"""
+    digits = text.lstrip('+-')
+    separators = [char for char in digits if char in '.,']
+    if not separators:
+        return text
+    if _AMBIGUOUS.fullmatch(digits):
+        raise ValueError(f"preco_compra ambíguo: {text!r} (use 1234.00, 1.234,00 ou 1,234.00)")
+
+    # The last separator is the decimal one, unless it repeats (1.234.567: thousands only)
+    decimal_sep = separators[-1] if separators.count(separators[-1]) == 1 else None
+    if decimal_sep is None:
+        integer, fraction = digits, ''
+    else:
+        integer, _, fraction = digits.rpartition(decimal_sep)
+    thousands = {char for char in integer if char in '.,'}
+    if len(thousands) > 1 or (decimal_sep is not None and not fraction.isdigit()):
+        raise ValueError(f"preco_compra inválido: {text!r}")
+    if thousands and not _GROUPED[thousands.pop()].fullmatch(integer):
+        raise ValueError(f"preco_compra inválido: {text!r} (grupos de milhar devem ter 3 dígitos)")
+    integer = integer.replace('.', '').replace(',', '')
+    sign = text[:len(text) - len(digits)]
+    return f"{sign}{integer}.{fraction}" if fraction else f"{sign}{integer}"
+
+
+def _parse_price(value):
+    if isinstance(value, str):
+        # Planilhas em pt-BR (1.234,56) ou en-US (1,234.56)
+        value = _normalize_number(value.strip().replace('R$', '').strip())
+    try:
+        price = Decimal(str(value))
+    except (InvalidOperation, ValueError):
+        raise ValueError(f"preco_compra inválido: {value!r}")
+    if not price.is_finite() or price < 0:
+        raise ValueError(f"preco_compra inválido: {value!r}")
+    return price
+
+
+def _text(row, field):
+    """Stripped text of a field; numbers (JSON input) become their str(), None is ''"""
+    value = row.get(field)
+    if value is None:
+        return ''
+    if isinstance(value, (dict, list)):
+        raise ValueError(f"{field} inválido: {value!r}")
+    return str(value).strip()
+
+
+def validate_row(row, user_id=None):
+    """Normalize one input row to a tuple in COLUMNS order; raises ValueError"""
+    carta = _text(row, 'carta')
+    if not carta:
+        raise ValueError("carta é obrigatória")
+
+    if row.get('data_compra') in (None, ''):
+        raise ValueError("data_compra é obrigatória")
+    data_compra = _parse_date(row['data_compra'])
+
+    if row.get('preco_compra') in (None, ''):
+        raise ValueError("preco_compra é obrigatório")
+    preco_compra = _parse_price(row['preco_compra'])
+
+    qtd = row.get('qtd')
+    try:
+        qtd = 1 if qtd in (None, '') else int(qtd)
+    except (TypeError, ValueError):
+        raise ValueError(f"qtd inválida: {qtd!r}")
+    if qtd <= 0:
+        raise ValueError(f"qtd inválida: {qtd!r}")
+
+    row_user_id = row.get('user_id') or user_id
+    if row_user_id:
+        try:
+            row_user_id = uuid.UUID(str(row_user_id))
+        except ValueError:
+            raise ValueError(f"user_id inválido: {row_user_id!r}")
+
+    return (
+        uuid.uuid4(),
+        carta,
+        data_compra,
+        preco_compra,
+        _text(row, 'idioma') or 'PT-BR',
+        qtd,
+        _text(row, 'estado') or 'NM',
+        row_user_id,
+        datetime.now(timezone.utc),
+    )
+
+
+def read_rows(path):
+    """Iterate dicts from a .csv, .json (list) or .jsonl/.ndjson file"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.json':
+        with open(path, encoding='utf-8') as f:
+            yield from json.load(f)
+    elif ext in ('.jsonl', '.ndjson'):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            sample = f.read(4096)
+            f.seek(0)
+            dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+            yield from csv.DictReader(f, dialect=dialect)
+
+
+def _spool(rows, user_id, errors, user_ids):
+    """Validate rows into a temporary CSV, adding their owners to user_ids; returns (spool, valid row count)"""
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES, mode='w+', newline='', encoding='utf-8')
+    writer = csv.writer(spool)
+    count = 0
+    user_index = COLUMNS.index('user_id')
+    for index, row in enumerate(rows, 1):
+        try:
+            values = validate_row(row, user_id)
+        except (ValueError, AttributeError) as e:
+            errors.append({'row': index, 'error': str(e)})
+            continue
+        # Empty unquoted fields are NULL for COPY ... (FORMAT csv)
+        writer.writerow(['' if v is None else v.isoformat() if isinstance(v, (date, datetime)) else v for v in values])
+        user_ids.add(values[user_index])
+        count += 1
+    spool.seek(0)
+    return spool, count
+
+
+def _spooled_batches(spool, batch_size):
+    """Read the spool back as typed dicts, batch_size rows at a time"""
+    batch = []
+    for values in csv.reader(spool):
+        row = dict(zip(COLUMNS, values))
+        batch.append({
+            'id': uuid.UUID(row['id']),
+            'carta': row['carta'],
+            'data_compra': date.fromisoformat(row['data_compra']),
+            'preco_compra': Decimal(row['preco_compra']),
+            'idioma': row['idioma'],
+            'qtd': int(row['qtd']),
+            'estado': row['estado'],
+            'user_id': uuid.UUID(row['user_id']) if row['user_id'] else None,
+            'created_at': datetime.fromisoformat(row['created_at']),
+        })
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _copy(connection, spool):
+    """Stream the spool through COPY; False if the driver has no COPY support"""
+    cursor = connection.connection.dbapi_connection.cursor()
+    if not hasattr(cursor, 'copy_expert'):
+        cursor.close()
+        return False
+    try:
+        cursor.copy_expert(COPY_SQL, spool)
+    finally:
+        cursor.close()
+    return True
+
+
+def bulk_import(rows, user_id=None, bind=engine, batch_size=BATCH_SIZE, dry_run=False, cache=None):
+    """
+    Import many lots in one transaction.
+
+    Returns {'valid', 'inserted', 'failed', 'errors': [{'row', 'error'}], 'method'}, where
+    'row' is the 1-based position of the row in the input. cache (a
+    portfolio_cache.PortfolioCache) has the importing users invalidated after
+    commit; COPY bypasses PortfolioCardService, so its listeners never see these rows.
+    """
+    errors = []
+    user_ids = set()
+    spool, valid = _spool(rows, user_id, errors, user_ids)
+    report = {'valid': valid, 'inserted': 0, 'failed': len(errors), 'errors': errors, 'method': None}
+
+    with spool:
+        if dry_run or not valid:
+            return report
+
+        try:
+            with bind.begin() as connection:
+                copied = False
+                savepoint = connection.begin_nested()
+                try:
+                    copied = _copy(connection, spool)
+                    savepoint.commit()
+                except Exception as e:
+                    savepoint.rollback()
+                    print(f"[INFO] COPY indisponível ({e}); usando INSERT em lotes")
+
+                if copied:
+                    report['method'] = 'copy'
+                else:
+                    spool.seek(0)
+                    for batch in _spooled_batches(spool, batch_size):
+                        connection.execute(PortfolioCard.__table__.insert(), batch)
+                    report['method'] = 'executemany'
+        except Exception as e:
+            print(f"[ERROR] Erro na importação, nenhuma linha gravada: {e}")
+            report['errors'].append({'row': None, 'error': str(e)})
+            return report
+
+    report['inserted'] = valid
+    if cache is not None:
+        cache.invalidate_users(user_ids)
+    print(f"[OK] {valid} cartas importadas via {report['method']} ({len(errors)} linhas com erro)")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path', help='Arquivo .csv, .json ou .jsonl')
+    parser.add_argument('--user-id', help='Dono dos lotes sem coluna user_id')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--dry-run', action='store_true', help='Só valida, não grava')
+    args = parser.parse_args()
+
+    report = bulk_import(read_rows(args.path), user_id=args.user_id, batch_size=args.batch_size, dry_run=args.dry_run)
+
+    print("\n" + "-" * 60)
+    print(f"  Válidas:    {report['valid']}")
+    print(f"  Importadas: {report['inserted']}")
+    print(f"  Com erro:   {report['failed']}")
+    for error in report['errors'][:50]:
+        print(f"    - linha {error['row']}: {error['error']}")
+    if len(report['errors']) > 50:
+        print(f"    ... e mais {len(report['errors']) - 50}")
+    print("-" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,9 @@
-from sqlalchemy import create_engine, Column, String, Numeric, Date, DateTime, Integer, text
-from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy import Column, String, Numeric, Date, DateTime, Integer, func, and_, or_, select
+from sqlalchemy.orm import declarative_base
 from sqlalchemy.dialects.postgresql import UUID
 from datetime import datetime, date
-from dotenv import load_dotenv
-import os
+import base64
+import heapq
 import sys
 import uuid
 
@@ -11,18 +11,11 @@ import uuid
 if sys.platform == 'win32':
     sys.stdout.reconfigure(encoding='utf-8')
 
-# Load environment variables
-load_dotenv()
-
-# Database connection
-USER = os.getenv("user")
-PASSWORD = os.getenv("password")
-HOST = os.getenv("host")
-PORT = os.getenv("port")
-DBNAME = os.getenv("dbname")
-
-DATABASE_URL = f"postgresql+psycopg2://{USER}:{PASSWORD}@{HOST}:{PORT}/{DBNAME}?sslmode=require"
-engine = create_engine(DATABASE_URL, echo=False)
+# Database connection (shared pool) and per-operation sessions
+from db_connection import SessionLocal, session_scope
+from serialization import (
+    NATIVE_TYPES, decimals_to_float, iso_strings, ndjson, to_records, transpose, uuid_strings
+)
 
 # Create base class for models
 Base = declarative_base()
@@ -57,13 +50,169 @@ class PortfolioCard(Base):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
-# Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# to_dict() keys, selected as plain columns by the read paths so no ORM
+# object is built per row (see card_records)
+CARD_FIELDS = ('id', 'carta', 'data_compra', 'preco_compra', 'idioma', 'qtd', 'estado', 'user_id', 'created_at')
+CARD_COLUMNS = tuple(getattr(PortfolioCard, field) for field in CARD_FIELDS)
+
+def card_records(rows, native=False):
+    """to_dict() of each CARD_COLUMNS row, converted one column at a time
+    
+    native=True leaves ids, dates and timestamps as Python objects when
+    serialization.dumps formats them itself (orjson), for callers that only
+    need the JSON bytes.
+    """
+    columns = transpose(rows, len(CARD_FIELDS))
+    columns[3] = decimals_to_float(columns[3])
+    if not (native and NATIVE_TYPES):
+        columns[0] = uuid_strings(columns[0])
+        columns[2] = iso_strings(columns[2])
+        columns[7] = uuid_strings(columns[7])
+        columns[8] = iso_strings(columns[8])
+    return to_records(CARD_FIELDS, columns)
+
+# Largest page served by get_cards_page
+MAX_PAGE_SIZE = 500
+
+def encode_cursor(card):
+    """Opaque pagination cursor for the (data_compra, id) position of a card"""
+    raw = f"{card.data_compra.isoformat()}|{card.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor; raises ValueError on malformed cursors"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        data_compra, card_id = raw.split('|')
+        return date.fromisoformat(data_compra), uuid.UUID(card_id)
+    except Exception:
+        raise ValueError(f"Cursor inválido: {cursor!r}")
+
+def keyset_statement(user_id=None, cursor=None):
+    """Cards ordered by (data_compra DESC, id), optionally after a cursor"""
+    query = select(PortfolioCard).order_by(PortfolioCard.data_compra.desc(), PortfolioCard.id)
+    if user_id:
+        query = query.where(PortfolioCard.user_id == user_id)
+    if cursor:
+        data_compra, card_id = decode_cursor(cursor)
+        query = query.where(or_(
+            PortfolioCard.data_compra < data_compra,
+            and_(PortfolioCard.data_compra == data_compra, PortfolioCard.id > card_id)
+        ))
+    return query
+
+
+# get_top_cards rankings computed in SQL; each ORDER BY matches an index in
+# create_portfolio_indexes.sql, so a user's top N is an index range scan
+TOP_CARDS_ORDER = {
+    'price': PortfolioCard.preco_compra,
+    'cost': PortfolioCard.preco_compra * PortfolioCard.qtd,
+}
+# Ranking by current market value, priced in Python by valuation.PriceIndex
+MARKET_VALUE = 'market_value'
+
+def top_cards_statement(user_id, limit=5, by='price'):
+    """A user's cards ordered by purchase price or total cost (preco_compra * qtd), highest first"""
+    if by not in TOP_CARDS_ORDER:
+        raise ValueError(f"Ordenação inválida: {by!r} (use {', '.join([*TOP_CARDS_ORDER, MARKET_VALUE])})")
+    return (select(*CARD_COLUMNS)
+            .where(PortfolioCard.user_id == user_id)
+            .order_by(TOP_CARDS_ORDER[by].desc(), PortfolioCard.id)
+            .limit(limit))
+
+
+def user_cards_statement(user_id=None):
+    """A user's cards in no particular order (any index leading with user_id serves it)"""
+    query = select(*CARD_COLUMNS)
+    if user_id:
+        query = query.where(PortfolioCard.user_id == user_id)
+    return query
+
+
+def rank_by_market_value(cards, limit=5, prices=None):
+    """Top cards by market value, with 'market_price' / 'market_value' added; unpriced lots are left out"""
+    from valuation import PriceIndex
+    if prices is None:
+        prices = PriceIndex.load()
+    lots = prices.value_lots(cards)['lots']
+    # Ties broken by id, so the ranking does not depend on the scan order
+    ranked = heapq.nsmallest(
+        limit, (pair for pair in zip(cards, lots) if pair[1]['market_value'] is not None),
+        key=lambda pair: (-pair[1]['market_value'], pair[0]['id'])
+    )
+    return [{**card, 'market_price': lot['market_price'], 'market_value': lot['market_value']} for card, lot in ranked]
+
+
+def stats_statement(user_id=None):
+    """One row per (estado, idioma): lots, quantity and amount invested"""
+    # The database returns a row per (estado, idioma) pair instead of every
+    # lot, and fold_stats builds the totals from those rows
+    query = select(
+        PortfolioCard.estado,
+        PortfolioCard.idioma,
+        func.count(PortfolioCard.id),
+        func.coalesce(func.sum(PortfolioCard.qtd), 0),
+        func.coalesce(func.sum(func.coalesce(PortfolioCard.preco_compra, 0) * PortfolioCard.qtd), 0)
+    ).group_by(PortfolioCard.estado, PortfolioCard.idioma)
+    if user_id:
+        query = query.where(PortfolioCard.user_id == user_id)
+    return query
+
+
+def fold_stats(rows):
+    """Portfolio statistics dict from stats_statement rows"""
+    stats = {
+        'total_cards': 0,
+        'total_quantity': 0,
+        'total_invested': 0,
+        'cards_by_condition': {},
+        'cards_by_language': {}
+    }
+    total_invested = 0.0
+    
+    for estado, idioma, count, quantity, invested in rows:
+        quantity = int(quantity)
+        stats['total_cards'] += count
+        stats['total_quantity'] += quantity
+        total_invested += float(invested)
+        
+        # Group by condition
+        condition = estado or 'Unknown'
+        stats['cards_by_condition'][condition] = stats['cards_by_condition'].get(condition, 0) + quantity
+        
+        # Group by language
+        language = idioma or 'Unknown'
+        stats['cards_by_language'][language] = stats['cards_by_language'].get(language, 0) + quantity
+    
+    stats['total_invested'] = round(total_invested, 2)
+    return stats
 
 # Database operations
 class PortfolioCardService:
-    def __init__(self):
-        self.session = SessionLocal()
+    """Portfolio operations; every call runs in its own short-lived session
+    
+    Sessions come from session_scope, so a service instance holds no connection
+    between calls and can be shared by the threads of a pool.
+    """
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+        self._listeners = []
+    
+    def add_listener(self, callback):
+        """Call callback(event, card, previous) after each committed change
+        
+        event is 'add', 'update' or 'delete'; card is the card dict after the
+        change (before it, for deletes) and previous the dict before an update.
+        """
+        self._listeners.append(callback)
+    
+    def _notify_change(self, event, card, previous=None):
+        # A failing listener must not turn a committed change into an error
+        for callback in self._listeners:
+            try:
+                callback(event, card, previous)
+            except Exception as e:
+                print(f"[ERROR] Erro no listener de alterações ({event}): {e}")
     
     def add_card(self, carta, data_compra, preco_compra, idioma='PT-BR', qtd=1, estado='NM', user_id=None):
         """Add a new card to the portfolio"""
@@ -77,32 +226,76 @@ class PortfolioCardService:
                 estado=estado,
                 user_id=user_id
             )
-            self.session.add(new_card)
-            self.session.commit()
-            print(f"[OK] Carta '{carta}' adicionada com sucesso! ID: {new_card.id}")
-            return new_card.to_dict()
+            with session_scope(self.session_factory) as session:
+                session.add(new_card)
+                session.flush()
+                card = new_card.to_dict()
+            print(f"[OK] Carta '{carta}' adicionada com sucesso! ID: {card['id']}")
+            self._notify_change('add', card)
+            return card
         except Exception as e:
-            self.session.rollback()
             print(f"[ERROR] Erro ao adicionar carta: {e}")
             return None
     
     def get_all_cards(self, user_id=None):
         """Get all cards from the portfolio"""
         try:
-            query = self.session.query(PortfolioCard).order_by(PortfolioCard.data_compra.desc())
+            query = select(*CARD_COLUMNS).order_by(PortfolioCard.data_compra.desc())
             if user_id:
-                query = query.filter(PortfolioCard.user_id == user_id)
-            cards = query.all()
-            return [card.to_dict() for card in cards]
+                query = query.where(PortfolioCard.user_id == user_id)
+            with session_scope(self.session_factory) as session:
+                return card_records(session.execute(query).all())
         except Exception as e:
             print(f"[ERROR] Erro ao buscar cartas: {e}")
             return []
     
+    def iter_cards(self, user_id=None, batch_size=1000, cursor=None, native=False):
+        """Stream cards as lists of dicts using a server-side cursor
+        
+        Each batch is fetched as plain rows and converted column-wise
+        (card_records), so no ORM object is built.
+        """
+        statement = keyset_statement(user_id, cursor).with_only_columns(*CARD_COLUMNS)
+        # The session (and its connection) lives until the generator is exhausted or closed
+        with session_scope(self.session_factory) as session:
+            result = session.execute(statement, execution_options={'stream_results': True, 'yield_per': batch_size})
+            for rows in result.partitions():
+                yield card_records(rows, native)
+    
+    def iter_cards_ndjson(self, user_id=None, batch_size=1000, cursor=None):
+        """Stream cards as NDJSON bytes, one chunk per batch, for chunked HTTP responses"""
+        for batch in self.iter_cards(user_id, batch_size, cursor, native=True):
+            yield ndjson(batch)
+    
+    def get_cards_page(self, user_id=None, cursor=None, limit=100):
+        """Get one page of cards as {"cards": [...], "next_cursor": str or None}
+        
+        The result is JSON-ready, so the portfolio views can page through it by
+        passing next_cursor back until it is None. A malformed cursor or limit
+        raises ValueError instead of reading as an empty last page.
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        statement = keyset_statement(user_id, cursor).with_only_columns(*CARD_COLUMNS)
+        try:
+            # Fetch one extra row to know whether there is a next page
+            with session_scope(self.session_factory) as session:
+                cards = session.execute(statement.limit(limit + 1)).all()
+                has_more = len(cards) > limit
+                cards = cards[:limit]
+                return {
+                    'cards': card_records(cards),
+                    'next_cursor': encode_cursor(cards[-1]) if has_more else None
+                }
+        except Exception as e:
+            print(f"[ERROR] Erro ao buscar página de cartas: {e}")
+            return {'cards': [], 'next_cursor': None}
+    
     def get_card_by_id(self, card_id):
         """Get a specific card by ID"""
         try:
-            card = self.session.query(PortfolioCard).filter(PortfolioCard.id == card_id).first()
-            return card.to_dict() if card else None
+            with session_scope(self.session_factory) as session:
+                card = session.query(PortfolioCard).filter(PortfolioCard.id == card_id).first()
+                return card.to_dict() if card else None
         except Exception as e:
             print(f"[ERROR] Erro ao buscar carta: {e}")
             return None
@@ -110,80 +303,78 @@ class PortfolioCardService:
     def update_card(self, card_id, **kwargs):
         """Update a card's information"""
         try:
-            card = self.session.query(PortfolioCard).filter(PortfolioCard.id == card_id).first()
+            previous = None
+            with session_scope(self.session_factory) as session:
+                card = session.query(PortfolioCard).filter(PortfolioCard.id == card_id).first()
+                if card:
+                    previous = card.to_dict()
+                    for key, value in kwargs.items():
+                        if hasattr(card, key):
+                            setattr(card, key, value)
+                    session.flush()
+                    card = card.to_dict()
             if card:
-                for key, value in kwargs.items():
-                    if hasattr(card, key):
-                        setattr(card, key, value)
-                self.session.commit()
                 print(f"[OK] Carta ID {card_id} atualizada com sucesso!")
-                return card.to_dict()
+                self._notify_change('update', card, previous)
+                return card
             else:
                 print(f"[ERROR] Carta ID {card_id} não encontrada")
                 return None
         except Exception as e:
-            self.session.rollback()
             print(f"[ERROR] Erro ao atualizar carta: {e}")
             return None
     
     def delete_card(self, card_id):
         """Delete a card from the portfolio"""
         try:
-            card = self.session.query(PortfolioCard).filter(PortfolioCard.id == card_id).first()
+            with session_scope(self.session_factory) as session:
+                card = session.query(PortfolioCard).filter(PortfolioCard.id == card_id).first()
+                if card:
+                    deleted = card.to_dict()
+                    session.delete(card)
             if card:
-                self.session.delete(card)
-                self.session.commit()
                 print(f"[OK] Carta ID {card_id} deletada com sucesso!")
+                self._notify_change('delete', deleted)
                 return True
             else:
                 print(f"[ERROR] Carta ID {card_id} não encontrada")
                 return False
         except Exception as e:
-            self.session.rollback()
             print(f"[ERROR] Erro ao deletar carta: {e}")
             return False
     
     def get_portfolio_stats(self, user_id=None):
         """Get portfolio statistics"""
         try:
-            cards = self.get_all_cards(user_id)
-            total_invested = sum(card['preco_compra'] * card['qtd'] for card in cards)
-            
-            stats = {
-                'total_cards': len(cards),
-                'total_quantity': sum(card['qtd'] for card in cards),
-                'total_invested': round(total_invested, 2),
-                'cards_by_condition': {},
-                'cards_by_language': {}
-            }
-            
-            # Group by condition
-            for card in cards:
-                condition = card['estado'] or 'Unknown'
-                stats['cards_by_condition'][condition] = stats['cards_by_condition'].get(condition, 0) + card['qtd']
-            
-            # Group by language
-            for card in cards:
-                language = card['idioma'] or 'Unknown'
-                stats['cards_by_language'][language] = stats['cards_by_language'].get(language, 0) + card['qtd']
-            
-            return stats
+            with session_scope(self.session_factory) as session:
+                rows = session.execute(stats_statement(user_id)).all()
+            return fold_stats(rows)
         except Exception as e:
             print(f"[ERROR] Erro ao calcular estatísticas: {e}")
             return None
     
-    def get_top_cards(self, limit=5):
-        """Get top cards by purchase price"""
+    def get_top_cards(self, user_id, limit=5, by='price', prices=None):
+        """Get a user's top cards by purchase price ('price'), total cost ('cost') or market value ('market_value')
+        
+        user_id is required: rankings never mix users' cards.
+        'market_value' loads a PriceIndex unless one is given.
+        """
+        if not user_id:
+            raise ValueError("get_top_cards requer user_id")
         try:
-            cards = self.session.query(PortfolioCard).order_by(PortfolioCard.preco_compra.desc()).limit(limit).all()
-            return [card.to_dict() for card in cards]
+            with session_scope(self.session_factory) as session:
+                if by == MARKET_VALUE:
+                    cards = card_records(session.execute(user_cards_statement(user_id)).all())
+                else:
+                    return card_records(session.execute(top_cards_statement(user_id, limit, by)).all())
+            return rank_by_market_value(cards, limit, prices)
         except Exception as e:
             print(f"[ERROR] Erro ao buscar top cartas: {e}")
             return []
     
     def close(self):
-        """Close the database session"""
-        self.session.close()
+        """No-op: sessions are closed at the end of each operation"""
+        pass
 
 # Example usage
 if __name__ == "__main__":
@@ -226,13 +417,14 @@ if __name__ == "__main__":
         for language, count in stats['cards_by_language'].items():
             print(f"    - {language}: {count}")
     
-    # Get top 5 most expensive cards
+    # Get each user's top 5 most expensive cards
     print("\n" + "-"*60)
-    print("[INFO] Top 5 Cartas Mais Caras:")
+    print("[INFO] Top 5 Cartas Mais Caras por Usuário:")
     print("-"*60)
-    top_cards = service.get_top_cards(5)
-    for i, card in enumerate(top_cards, 1):
-        print(f"  {i}. {card['carta']} - R$ {card['preco_compra']:.2f}")
+    for user_id in sorted({card['user_id'] for card in cards or [] if card['user_id']}):
+        print(f"  Usuário {user_id}:")
+        for i, card in enumerate(service.get_top_cards(user_id, 5), 1):
+            print(f"    {i}. {card['carta']} - R$ {card['preco_compra']:.2f}")
     
     # Close connection
     service.close()
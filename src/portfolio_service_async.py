@@ -0,0 +1,216 @@
+"""
+Async PortfolioCardService on SQLAlchemy asyncio + asyncpg.
+
+Same methods and return values as PortfolioCardService, awaited:
+
+    service = AsyncPortfolioCardService()
+    cards = await service.get_all_cards(user_id)
+
+Each call runs in its own AsyncSession, so one instance serves any number of
+concurrent requests on an event loop without holding a worker thread for the
+database round trip.
+"""
+import asyncio
+import inspect
+import sys
+
+from sqlalchemy import select
+
+from db_connection import async_session_factory, async_session_scope
+from portfolio_service import (
+    CARD_COLUMNS, MARKET_VALUE, MAX_PAGE_SIZE, PortfolioCard, card_records, encode_cursor, fold_stats,
+    keyset_statement, rank_by_market_value, stats_statement, top_cards_statement, user_cards_statement
+)
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+
+class AsyncPortfolioCardService:
+    """Portfolio operations as coroutines; every call runs in its own AsyncSession"""
+    def __init__(self, session_factory=None):
+        # Built on first use: creating the engine needs asyncpg
+        self._session_factory = session_factory
+        self._listeners = []
+
+    @property
+    def session_factory(self):
+        if self._session_factory is None:
+            self._session_factory = async_session_factory()
+        return self._session_factory
+
+    def add_listener(self, callback):
+        """Call callback(event, card, previous) after each committed change
+        
+        Same events as PortfolioCardService.add_listener; a callback that
+        returns an awaitable is awaited.
+        """
+        self._listeners.append(callback)
+
+    async def _notify_change(self, event, card, previous=None):
+        # A failing listener must not turn a committed change into an error
+        for callback in self._listeners:
+            try:
+                result = callback(event, card, previous)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                print(f"[ERROR] Erro no listener de alterações ({event}): {e}")
+
+    async def add_card(self, carta, data_compra, preco_compra, idioma='PT-BR', qtd=1, estado='NM', user_id=None):
+        """Add a new card to the portfolio"""
+        try:
+            new_card = PortfolioCard(
+                carta=carta,
+                data_compra=data_compra,
+                preco_compra=preco_compra,
+                idioma=idioma,
+                qtd=qtd,
+                estado=estado,
+                user_id=user_id
+            )
+            async with async_session_scope(self.session_factory) as session:
+                session.add(new_card)
+                await session.flush()
+                card = new_card.to_dict()
+            print(f"[OK] Carta '{carta}' adicionada com sucesso! ID: {card['id']}")
+            await self._notify_change('add', card)
+            return card
+        except Exception as e:
+            print(f"[ERROR] Erro ao adicionar carta: {e}")
+            return None
+
+    async def get_all_cards(self, user_id=None):
+        """Get all cards from the portfolio"""
+        try:
+            query = select(*CARD_COLUMNS).order_by(PortfolioCard.data_compra.desc())
+            if user_id:
+                query = query.where(PortfolioCard.user_id == user_id)
+            async with async_session_scope(self.session_factory) as session:
+                return card_records((await session.execute(query)).all())
+        except Exception as e:
+            print(f"[ERROR] Erro ao buscar cartas: {e}")
+            return []
+
+    async def get_cards_page(self, user_id=None, cursor=None, limit=100):
+        """Get one page of cards as {"cards": [...], "next_cursor": str or None}
+        
+        Raises ValueError on a malformed cursor or limit, like PortfolioCardService.
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        statement = keyset_statement(user_id, cursor).with_only_columns(*CARD_COLUMNS)
+        try:
+            async with async_session_scope(self.session_factory) as session:
+                cards = (await session.execute(statement.limit(limit + 1))).all()
+                has_more = len(cards) > limit
+                cards = cards[:limit]
+                return {
+                    'cards': card_records(cards),
+                    'next_cursor': encode_cursor(cards[-1]) if has_more else None
+                }
+        except Exception as e:
+            print(f"[ERROR] Erro ao buscar página de cartas: {e}")
+            return {'cards': [], 'next_cursor': None}
+
+    async def get_card_by_id(self, card_id):
+        """Get a specific card by ID"""
+        try:
+            async with async_session_scope(self.session_factory) as session:
+                card = await session.scalar(select(PortfolioCard).where(PortfolioCard.id == card_id))
+                return card.to_dict() if card else None
+        except Exception as e:
+            print(f"[ERROR] Erro ao buscar carta: {e}")
+            return None
+
+    async def update_card(self, card_id, **kwargs):
+        """Update a card's information"""
+        try:
+            previous = None
+            async with async_session_scope(self.session_factory) as session:
+                card = await session.scalar(select(PortfolioCard).where(PortfolioCard.id == card_id))
+                if card:
+                    previous = card.to_dict()
+                    for key, value in kwargs.items():
+                        if hasattr(card, key):
+                            setattr(card, key, value)
+                    await session.flush()
+                    card = card.to_dict()
+            if card:
+                print(f"[OK] Carta ID {card_id} atualizada com sucesso!")
+                await self._notify_change('update', card, previous)
+                return card
+            else:
+                print(f"[ERROR] Carta ID {card_id} não encontrada")
+                return None
+        except Exception as e:
+            print(f"[ERROR] Erro ao atualizar carta: {e}")
+            return None
+
+    async def delete_card(self, card_id):
+        """Delete a card from the portfolio"""
+        try:
+            async with async_session_scope(self.session_factory) as session:
+                card = await session.scalar(select(PortfolioCard).where(PortfolioCard.id == card_id))
+                if card:
+                    deleted = card.to_dict()
+                    await session.delete(card)
+            if card:
+                print(f"[OK] Carta ID {card_id} deletada com sucesso!")
+                await self._notify_change('delete', deleted)
+                return True
+            else:
+                print(f"[ERROR] Carta ID {card_id} não encontrada")
+                return False
+        except Exception as e:
+            print(f"[ERROR] Erro ao deletar carta: {e}")
+            return False
+
+    async def get_portfolio_stats(self, user_id=None):
+        """Get portfolio statistics"""
+        try:
+            async with async_session_scope(self.session_factory) as session:
+                rows = (await session.execute(stats_statement(user_id))).all()
+            return fold_stats(rows)
+        except Exception as e:
+            print(f"[ERROR] Erro ao calcular estatísticas: {e}")
+            return None
+
+    async def get_top_cards(self, user_id, limit=5, by='price', prices=None):
+        """Get a user's top cards by purchase price ('price'), total cost ('cost') or market value ('market_value')"""
+        if not user_id:
+            raise ValueError("get_top_cards requer user_id")
+        try:
+            async with async_session_scope(self.session_factory) as session:
+                if by == MARKET_VALUE:
+                    cards = card_records((await session.execute(user_cards_statement(user_id))).all())
+                else:
+                    return card_records((await session.execute(top_cards_statement(user_id, limit, by))).all())
+            # Loading a PriceIndex is blocking I/O and NumPy work
+            return await asyncio.to_thread(rank_by_market_value, cards, limit, prices)
+        except Exception as e:
+            print(f"[ERROR] Erro ao buscar top cartas: {e}")
+            return []
+
+    async def close(self):
+        """No-op: sessions are closed at the end of each operation"""
+        pass
+
+
+# Example usage
+if __name__ == "__main__":
+    async def main():
+        service = AsyncPortfolioCardService()
+        cards, stats = await asyncio.gather(service.get_all_cards(), service.get_portfolio_stats())
+        print(f"[INFO] {len(cards)} cartas no portfolio")
+        if stats:
+            print(f"  Quantidade Total: {stats['total_quantity']}")
+            print(f"  Total Investido: R$ {stats['total_invested']:.2f}")
+        user_ids = sorted({card['user_id'] for card in cards if card['user_id']})
+        rankings = await asyncio.gather(*(service.get_top_cards(user_id, 5) for user_id in user_ids))
+        for user_id, top_cards in zip(user_ids, rankings):
+            print(f"  Usuário {user_id}:")
+            for i, card in enumerate(top_cards, 1):
+                print(f"    {i}. {card['carta']} - R$ {card['preco_compra']:.2f}")
+
+    asyncio.run(main())
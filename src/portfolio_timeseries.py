@@ -0,0 +1,302 @@
+"""
+Daily market-value curve of a user's portfolio, stored in portfolio_value_daily.
+
+The curve is built as a (variant x day) matrix: quantity changes are placed on
+their day and np.cumsum gives the holdings of every day; the daily price
+rollups (price_rollups.py) are placed the same way and forward-filled with
+np.maximum.accumulate, so the value of every day is one broadcast product and
+a sum. Lots of a card variant without its own quote are priced from another
+variant of the same card (same idioma first, then same estado) converted with
+idioma/estado factors, like valuation.PriceIndex; lots with no quote at all yet count at cost.
+
+Changing a lot does not rebuild the history: triggers on portfolio_cards and
+transactions (create_portfolio_value_table.sql) mark the user as stale from
+the earliest affected day (portfolio_value_pending), whoever wrote the row,
+and get_curve() recomputes only the days from there on. attach() registers a
+PortfolioCardService listener that does the same from Python, for databases
+without the triggers.
+
+    timeseries = PortfolioTimeSeries()
+    timeseries.attach(service)
+    timeseries.get_curve(user_id)
+"""
+import sys
+import time
+from datetime import date
+
+import numpy as np
+from sqlalchemy import bindparam, text
+
+from db_connection import engine
+from factor_registry import registry
+from valuation import _card_key
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+# Holdings come from the open lots, or from the transaction ledger
+# (database/transactions-schema.sql: tipo COMPRA / VENDA / TRADE, free text in
+# any case, read like ledger.py; other tipos are left out)
+EVENTS_SQL = {
+    'portfolio': text("""
+        SELECT carta, idioma, estado, data_compra AS dia, qtd AS quantidade, qtd * preco_compra AS custo
+        FROM portfolio_cards
+        WHERE user_id = :user_id AND data_compra IS NOT NULL
+    """),
+    'transactions': text("""
+        SELECT carta, idioma, estado, data AS dia,
+               CASE WHEN upper(trim(tipo)) = 'COMPRA' THEN quantidade ELSE -quantidade END AS quantidade,
+               CASE WHEN upper(trim(tipo)) = 'COMPRA' THEN quantidade * preco_unitario END AS custo
+        FROM transactions
+        WHERE user_id = :user_id AND upper(trim(tipo)) IN ('COMPRA', 'VENDA', 'TRADE')
+        ORDER BY data, created_at
+    """),
+}
+
+# Quotes from `desde` on, plus the last one before it to carry forward
+PRICES_SQL = text("""
+    SELECT carta, nullif(idioma, '') AS idioma, nullif(estado, '') AS estado, dia, preco_min AS preco
+    FROM card_price_daily
+    WHERE lower(carta) IN :cartas AND dia >= :desde
+    UNION ALL
+    (SELECT DISTINCT ON (carta, idioma, estado)
+            carta, nullif(idioma, ''), nullif(estado, ''), dia, preco_min
+     FROM card_price_daily
+     WHERE lower(carta) IN :cartas AND dia < :desde
+     ORDER BY carta, idioma, estado, dia DESC)
+""").bindparams(bindparam('cartas', expanding=True))
+
+
+def _sql_card_key(carta):
+    """Key for lower(carta) IN :cartas: str.lower() like Postgres lower(); casefold() maps 'ß' to 'ss'"""
+    return (carta or '').strip().lower()
+
+PENDING_SQL = text("SELECT desde, updated_at FROM portfolio_value_pending WHERE user_id = :user_id")
+
+MARK_PENDING_SQL = text("""
+    INSERT INTO portfolio_value_pending (user_id, desde) VALUES (:user_id, :desde)
+    ON CONFLICT (user_id) DO UPDATE SET
+        desde = LEAST(portfolio_value_pending.desde, EXCLUDED.desde),
+        updated_at = NOW()
+""")
+
+# Only clears the mark this recompute covered; a newer change keeps it
+CLEAR_PENDING_SQL = text("""
+    DELETE FROM portfolio_value_pending
+    WHERE user_id = :user_id AND desde >= :desde AND updated_at <= :updated_at
+""")
+
+LAST_DAY_SQL = text("SELECT max(dia) FROM portfolio_value_daily WHERE user_id = :user_id")
+
+DELETE_SQL = text("DELETE FROM portfolio_value_daily WHERE user_id = :user_id AND dia >= :desde")
+
+INSERT_SQL = text("""
+    INSERT INTO portfolio_value_daily (user_id, dia, quantidade, custo, valor_mercado, valor_sem_cotacao)
+    VALUES (:user_id, :dia, :quantidade, :custo, :valor_mercado, :valor_sem_cotacao)
+""")
+
+CURVE_SQL = text("""
+    SELECT dia, quantidade, custo, valor_mercado, valor_sem_cotacao
+    FROM portfolio_value_daily
+    WHERE user_id = :user_id AND dia >= :start AND dia <= :end
+    ORDER BY dia
+""")
+
+
+def _average_cost(events):
+    """Transaction events with sells costed at the running average cost of their variant"""
+    held = {}
+    costed = []
+    for carta, idioma, estado, dia, quantidade, custo in events:
+        key = (_card_key(carta), idioma, estado)
+        quantity, cost = held.get(key, (0, 0.0))
+        if custo is None:
+            # Sells and trades leave at the average cost (quantidade is negative)
+            custo = cost / quantity * quantidade if quantity > 0 else 0.0
+        quantity, cost = quantity + quantidade, cost + float(custo)
+        held[key] = (quantity, cost) if quantity > 0 else (0, 0.0)
+        costed.append((carta, idioma, estado, dia, quantidade, custo))
+    return costed
+
+
+def _offsets(days, start):
+    """Day numbers of datetime.date values relative to start (negative before it)"""
+    return np.fromiter((day.toordinal() for day in days), dtype=np.int64, count=len(days)) - start.toordinal()
+
+
+def build_curve(events, price_rows, start, end, snapshot=None):
+    """
+    Daily curve from `start` to `end` (inclusive).
+
+    events: (carta, idioma, estado, dia, quantidade, custo) quantity/cost
+    changes; changes before `start` count as holdings on `start`.
+    price_rows: (carta, idioma, estado, dia, preco) quotes; a quote before
+    `start` is carried forward into it.
+    Returns a dict of arrays: dia, quantidade, custo, valor_mercado,
+    valor_sem_cotacao.
+    """
+    snapshot = snapshot or registry.snapshot
+    n_days = (end - start).days + 1
+    days = np.datetime64(start, 'D') + np.arange(n_days)
+
+    variants = {}
+    rows = np.array([variants.setdefault((_card_key(event[0]), event[1], event[2]), len(variants))
+                     for event in events], dtype=np.intp)
+    offsets = _offsets([event[3] for event in events], start)
+    quantities = np.array([event[4] for event in events], dtype=np.float64)
+    costs = np.array([float(event[5] or 0) for event in events], dtype=np.float64)
+    keep = offsets < n_days
+
+    n_variants = len(variants)
+    holdings = np.zeros((n_variants, n_days))
+    cost_basis = np.zeros((n_variants, n_days))
+    index = (rows[keep], np.maximum(offsets[keep], 0))
+    np.add.at(holdings, index, quantities[keep])
+    np.add.at(cost_basis, index, costs[keep])
+    holdings = np.cumsum(holdings, axis=1)
+    cost_basis = np.cumsum(cost_basis, axis=1)
+
+    # Quotes grouped by (carta, idioma, estado), each group contiguous and in date order
+    groups = {}
+    group_ids = np.array([groups.setdefault((_card_key(row[0]), row[1], row[2]), len(groups))
+                          for row in price_rows], dtype=np.int64)
+    quote_offsets = _offsets([row[3] for row in price_rows], start)
+    quote_values = np.array([float(row[4]) for row in price_rows], dtype=np.float64)
+    order = np.lexsort((quote_offsets, group_ids))
+    group_ids, quote_offsets, quote_values = group_ids[order], quote_offsets[order], quote_values[order]
+    bounds = np.searchsorted(group_ids, np.arange(len(groups) + 1))
+    variants_by_card = {}
+    for carta, idioma, estado in groups:
+        variants_by_card.setdefault(carta, []).append((idioma, estado))
+
+    prices = np.full((n_variants, n_days), np.nan)
+    for (carta, idioma, estado), row in variants.items():
+        card_variants = variants_by_card.get(carta)
+        if not card_variants:
+            continue
+        source = (idioma, estado)
+        if source not in card_variants:
+            # Same idioma first, then same estado, like PriceIndex.lookup; converted like getAdjustedPrice
+            source = max(sorted(card_variants, key=str),
+                         key=lambda variant: (variant[0] == idioma, variant[1] == estado))
+        group = groups[(carta, *source)]
+        offsets, values = (quote_offsets[bounds[group]:bounds[group + 1]],
+                           quote_values[bounds[group]:bounds[group + 1]])
+        if source != (idioma, estado):
+            values = snapshot.adjust(values, source[0], idioma, source[1], estado)
+        keep = offsets < n_days
+        # In date order, so the last quote at or before `start` lands on day 0
+        prices[row, np.maximum(offsets[keep], 0)] = values[keep]
+
+    # Forward fill: index of the last quoted day at or before each day
+    quoted = ~np.isnan(prices)
+    last_quoted = np.maximum.accumulate(np.where(quoted, np.arange(n_days), 0), axis=1)
+    filled = np.take_along_axis(prices, last_quoted, axis=1)
+
+    unpriced = np.isnan(filled)
+    at_cost = np.where(unpriced, cost_basis, 0.0)
+    market = np.where(unpriced, cost_basis, holdings * np.nan_to_num(filled))
+    return {
+        'dia': days,
+        'quantidade': holdings.sum(axis=0).astype(np.int64),
+        'custo': cost_basis.sum(axis=0).round(2),
+        'valor_mercado': market.sum(axis=0).round(2),
+        'valor_sem_cotacao': at_cost.sum(axis=0).round(2),
+    }
+
+
+class PortfolioTimeSeries:
+    """Stored, incrementally recomputed portfolio value curves"""
+    def __init__(self, bind=engine, source='portfolio', factors=registry):
+        if source not in EVENTS_SQL:
+            raise ValueError(f"source inválida: {source!r} (use {', '.join(EVENTS_SQL)})")
+        self.bind = bind
+        self.source = source
+        self.factors = factors
+
+    def attach(self, service):
+        """Mark users stale whenever `service` adds, edits or deletes a lot (the triggers already cover it)"""
+        service.add_listener(self.on_card_change)
+        return self
+
+    def on_card_change(self, event, card, previous=None):
+        """PortfolioCardService listener: stale from the earliest data_compra involved"""
+        user_id = card.get('user_id') or (previous or {}).get('user_id')
+        dates = [value['data_compra'] for value in (card, previous) if value and value.get('data_compra')]
+        if user_id and dates:
+            self.mark_pending(user_id, min(date.fromisoformat(value) for value in dates))
+
+    def mark_pending(self, user_id, since):
+        with self.bind.begin() as connection:
+            connection.execute(MARK_PENDING_SQL, {'user_id': user_id, 'desde': since})
+
+    def recompute(self, user_id, since=None, until=None):
+        """Rewrite the stored curve from `since` (default: first lot) to `until` (default: today)"""
+        start_time = time.perf_counter()
+        until = until or date.today()
+        with self.bind.begin() as connection:
+            pending = connection.execute(PENDING_SQL, {'user_id': user_id}).first()
+            events = connection.execute(EVENTS_SQL[self.source], {'user_id': user_id}).all()
+            if self.source == 'transactions':
+                events = _average_cost(events)
+            first_day = min((row[3] for row in events), default=None)
+            since = since or first_day or date.min
+            # Days before the first lot (it may have moved later) are only deleted
+            start = max(since, first_day) if first_day else None
+
+            connection.execute(DELETE_SQL, {'user_id': user_id, 'desde': since})
+            days = 0
+            if start is not None and start <= until:
+                cartas = sorted({_sql_card_key(row[0]) for row in events})
+                price_rows = connection.execute(PRICES_SQL, {'cartas': cartas, 'desde': start}).all()
+                curve = build_curve(events, price_rows, start, until, self.factors.snapshot)
+                rows = [
+                    {'user_id': user_id, 'dia': day, 'quantidade': quantity, 'custo': cost,
+                     'valor_mercado': market, 'valor_sem_cotacao': at_cost}
+                    for day, quantity, cost, market, at_cost in zip(
+                        curve['dia'].tolist(), curve['quantidade'].tolist(), curve['custo'].tolist(),
+                        curve['valor_mercado'].tolist(), curve['valor_sem_cotacao'].tolist())
+                ]
+                connection.execute(INSERT_SQL, rows)
+                days = len(rows)
+            if pending is not None:
+                connection.execute(CLEAR_PENDING_SQL, {'user_id': user_id, 'desde': since,
+                                                       'updated_at': pending.updated_at})
+        print(f"[OK] Curva do portfolio recalculada a partir de {since}: {days} dia(s) "
+              f"em {(time.perf_counter() - start_time) * 1000:.0f} ms")
+        return days
+
+    def refresh(self, user_id, today=None):
+        """Bring the stored curve up to date: pending changes first, then new days"""
+        today = today or date.today()
+        with self.bind.connect() as connection:
+            pending = connection.execute(PENDING_SQL, {'user_id': user_id}).first()
+            last_day = connection.execute(LAST_DAY_SQL, {'user_id': user_id}).scalar()
+
+        if last_day is None:
+            return self.recompute(user_id, until=today)
+        # The last stored day is redone too: its rollup may have changed since
+        since = last_day if last_day < today else None
+        if pending is not None:
+            since = min(pending.desde, since or pending.desde)
+        if since is None:
+            return 0
+        return self.recompute(user_id, since, until=today)
+
+    def get_curve(self, user_id, start=None, end=None):
+        """[{'date', 'value', 'cost', 'quantity', 'unpricedCost'}] after refreshing stale days"""
+        try:
+            self.refresh(user_id)
+            with self.bind.connect() as connection:
+                rows = connection.execute(CURVE_SQL, {'user_id': user_id, 'start': start or date.min,
+                                                      'end': end or date.max}).all()
+        except Exception as e:
+            print(f"[ERROR] Erro ao calcular curva do portfolio: {e}")
+            return []
+        return [
+            {'date': row.dia.isoformat(), 'value': float(row.valor_mercado), 'cost': float(row.custo),
+             'quantity': row.quantidade, 'unpricedCost': float(row.valor_sem_cotacao)}
+            for row in rows
+        ]
+
@@ -0,0 +1,220 @@
+"""
+Daily, weekly and monthly offer-price rollups of myp_cards_meg.
+
+Charts, analytics, forecasts and valuation read card_price_daily /
+card_price_weekly / card_price_monthly (create_card_price_rollups.sql) instead
+of scanning raw offers. update() folds only the collection days from the
+watermark's day on; each of those days is recomputed as a whole and upserted,
+then its week and month are rebuilt from the daily rows, and the watermark
+moves forward in the same transaction. The watermark's own day is always
+recomputed, since a run in the middle of a scrape sees it only partially.
+Running it twice changes nothing.
+
+    rollups = PriceRollups()
+    rollups.update()
+    rollups.get_history('Charizard ex', idioma='ING', estado='NM')  # /api/forecast input
+
+Usage:
+    python price_rollups.py [--rebuild]
+"""
+import argparse
+import sys
+import time
+from datetime import date, datetime
+from decimal import Decimal
+
+from sqlalchemy import text
+
+from db_connection import engine
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+JOB = 'card_price'
+
+# granularity -> (table, period column)
+TABLES = {
+    'daily': ('card_price_daily', 'dia'),
+    'weekly': ('card_price_weekly', 'periodo'),
+    'monthly': ('card_price_monthly', 'periodo'),
+}
+
+METRICS = ('preco_min', 'preco_mediana', 'preco_medio', 'preco_max')
+
+LOCK_SQL = text("SELECT pg_advisory_xact_lock(hashtext('card_price_rollups'))")
+
+WATERMARK_SQL = text("SELECT watermark FROM rollup_watermarks WHERE job = :job")
+
+# Collection days from the watermark's day on (all of them when there is none).
+# Rows collected later on that day may not sort after the watermark (a scrape
+# still running, or data_coleta stored as a date), so the day is redone.
+NEW_DAYS_SQL = text("""
+    SELECT data_coleta::date AS dia, max(data_coleta) AS ultima_coleta
+    FROM myp_cards_meg
+    WHERE data_coleta >= coalesce(CAST(:watermark AS date), '-infinity')
+    GROUP BY 1
+    ORDER BY 1
+""")
+
+DAILY_SQL = text("""
+    INSERT INTO card_price_daily (carta, idioma, estado, dia, ofertas, preco_min, preco_mediana,
+                                  preco_medio, preco_max, preco_soma)
+    SELECT carta, coalesce(idioma, ''), coalesce(estado, ''), data_coleta::date,
+           count(*), min(preco), percentile_cont(0.5) WITHIN GROUP (ORDER BY preco),
+           avg(preco), max(preco), sum(preco)
+    FROM (
+        SELECT carta, idioma, estado, data_coleta, valor::numeric AS preco
+        FROM myp_cards_meg
+        WHERE data_coleta >= :inicio AND data_coleta < CAST(:fim AS date) + 1
+          AND carta IS NOT NULL
+    ) offers
+    WHERE data_coleta::date = ANY(:dias) AND preco > 0
+    GROUP BY 1, 2, 3, 4
+    ON CONFLICT (carta, idioma, estado, dia) DO UPDATE SET
+        ofertas = EXCLUDED.ofertas,
+        preco_min = EXCLUDED.preco_min,
+        preco_mediana = EXCLUDED.preco_mediana,
+        preco_medio = EXCLUDED.preco_medio,
+        preco_max = EXCLUDED.preco_max,
+        preco_soma = EXCLUDED.preco_soma,
+        computed_at = NOW()
+""")
+
+
+def _period_sql(granularity):
+    """Rebuild the weeks/months of the given days from card_price_daily"""
+    table, _ = TABLES[granularity]
+    unit = 'week' if granularity == 'weekly' else 'month'
+    return text(f"""
+        INSERT INTO {table} (carta, idioma, estado, periodo, dias, ofertas, preco_min, preco_mediana,
+                             preco_medio, preco_max, preco_soma)
+        SELECT carta, idioma, estado, date_trunc('{unit}', dia)::date,
+               count(*), sum(ofertas), min(preco_min),
+               percentile_cont(0.5) WITHIN GROUP (ORDER BY preco_mediana),
+               sum(preco_soma) / sum(ofertas), max(preco_max), sum(preco_soma)
+        FROM card_price_daily
+        WHERE dia >= date_trunc('{unit}', CAST(:inicio AS date))
+          AND date_trunc('{unit}', dia) = ANY(
+              SELECT date_trunc('{unit}', d) FROM unnest(CAST(:dias AS date[])) AS d)
+        GROUP BY 1, 2, 3, 4
+        ON CONFLICT (carta, idioma, estado, periodo) DO UPDATE SET
+            dias = EXCLUDED.dias,
+            ofertas = EXCLUDED.ofertas,
+            preco_min = EXCLUDED.preco_min,
+            preco_mediana = EXCLUDED.preco_mediana,
+            preco_medio = EXCLUDED.preco_medio,
+            preco_max = EXCLUDED.preco_max,
+            preco_soma = EXCLUDED.preco_soma,
+            computed_at = NOW()
+    """)
+
+
+SAVE_WATERMARK_SQL = text("""
+    INSERT INTO rollup_watermarks (job, watermark) VALUES (:job, :watermark)
+    ON CONFLICT (job) DO UPDATE SET watermark = EXCLUDED.watermark, updated_at = NOW()
+""")
+
+# Latest daily rollup per (carta, idioma, estado), the input of valuation.PriceIndex
+LATEST_SQL = text("""
+    SELECT DISTINCT ON (carta, idioma, estado)
+           carta, nullif(idioma, '') AS idioma, nullif(estado, '') AS estado, preco_min, dia
+    FROM card_price_daily
+    ORDER BY carta, idioma, estado, dia DESC
+""")
+
+
+def _json_value(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+class PriceRollups:
+    """Incremental price rollups and their query API"""
+    def __init__(self, bind=engine):
+        self.bind = bind
+
+    def update(self, rebuild=False):
+        """Fold new collection days into the rollups; returns the number of days rewritten"""
+        start = time.perf_counter()
+        with self.bind.begin() as connection:
+            # Concurrent runs queue here instead of computing the same days twice
+            connection.execute(LOCK_SQL)
+            watermark = None if rebuild else connection.execute(WATERMARK_SQL, {'job': JOB}).scalar()
+            new_days = connection.execute(NEW_DAYS_SQL, {'watermark': watermark}).all()
+            if not new_days:
+                print(f"[INFO] Rollups de preço já estão em dia (watermark {watermark})")
+                return 0
+
+            days = [row.dia for row in new_days]
+            params = {'dias': days, 'inicio': days[0], 'fim': days[-1]}
+            connection.execute(DAILY_SQL, params)
+            for granularity in ('weekly', 'monthly'):
+                connection.execute(_period_sql(granularity), params)
+            connection.execute(SAVE_WATERMARK_SQL, {'job': JOB, 'watermark': max(row.ultima_coleta for row in new_days)})
+
+        print(f"[OK] {len(days)} dia(s) de rollup atualizados ({days[0]} a {days[-1]}) "
+              f"em {(time.perf_counter() - start) * 1000:.0f} ms")
+        return len(days)
+
+    def get_series(self, carta, idioma=None, estado=None, granularity='daily', start=None, end=None):
+        """Rollup rows of one card, oldest first; idioma/estado None means every variant"""
+        if granularity not in TABLES:
+            raise ValueError(f"granularity inválida: {granularity!r} (use {', '.join(TABLES)})")
+        table, period = TABLES[granularity]
+
+        where = ["carta = :carta"]
+        params = {'carta': carta}
+        for column, value in (('idioma', idioma), ('estado', estado)):
+            if value is not None:
+                where.append(f"{column} = :{column}")
+                params[column] = value
+        if start is not None:
+            where.append(f"{period} >= :start")
+            params['start'] = start
+        if end is not None:
+            where.append(f"{period} <= :end")
+            params['end'] = end
+
+        try:
+            with self.bind.connect() as connection:
+                rows = connection.execute(text(f"""
+                    SELECT {period} AS date, nullif(idioma, '') AS idioma, nullif(estado, '') AS estado,
+                           ofertas, {', '.join(METRICS)}
+                    FROM {table}
+                    WHERE {' AND '.join(where)}
+                    ORDER BY {period}, idioma, estado
+                """), params).mappings().all()
+        except Exception as e:
+            print(f"[ERROR] Erro ao buscar rollups de preço: {e}")
+            return []
+        return [{key: _json_value(value) for key, value in row.items()} for row in rows]
+
+    def get_history(self, carta, idioma='ING', estado='NM', metric='preco_mediana', granularity='daily',
+                    start=None, end=None):
+        """One variant as [{'date', 'price'}], the historical format of /api/forecast"""
+        if metric not in METRICS:
+            raise ValueError(f"metric inválida: {metric!r} (use {', '.join(METRICS)})")
+        rows = self.get_series(carta, idioma, estado, granularity, start, end)
+        return [{'date': row['date'], 'price': row[metric]} for row in rows]
+
+    def latest_prices(self):
+        """(carta, idioma, estado, preco_min, dia) of the newest day of every variant"""
+        with self.bind.connect() as connection:
+            return connection.execute(LATEST_SQL).all()
+
+
+# Example usage
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rebuild', action='store_true', help='Ignora o watermark e recalcula todo o histórico')
+    args = parser.parse_args()
+
+    try:
+        PriceRollups().update(rebuild=args.rebuild)
+    except Exception as e:
+        print(f"[ERROR] Erro ao atualizar rollups de preço: {e}")
+        sys.exit(1)
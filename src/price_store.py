@@ -0,0 +1,205 @@
+"""
+Compact columnar in-memory store of market offers.
+
+A list of row dicts keeps a dict plus a full str per carta/idioma/estado/vendedor
+for every offer; PriceStore keeps one NumPy array per column instead:
+
+    preco     float32
+    dia       int32   days since 1970-01-01 (data_coleta::date)
+    carta     int32   codes into interned name tables (Dictionary)
+    vendedor  int32
+    idioma    int16
+    estado    int16
+
+Rows are sorted by (carta, dia), and offsets[code]:offsets[code + 1] is the
+slice of one card, so per-card reads are array views:
+
+    store = PriceStore.load(since=date(2026, 1, 1))
+    offers = store.card('Pikachu ex')        # {'preco': array, 'dia': array, ...}
+    store.history('Pikachu ex', 'ING', 'NM') # [{'date', 'price'}], daily minimum
+
+load() streams a server-side psycopg2 cursor in batches of tuples straight into
+the arrays; no per-row dict or ORM object is built.
+"""
+import sys
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+from db_connection import engine
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+EPOCH = date(1970, 1, 1)
+EPOCH_ORDINAL = EPOCH.toordinal()
+
+# Categorical columns and the dtype of their codes
+CATEGORIES = (('carta', np.int32), ('idioma', np.int16), ('estado', np.int16), ('vendedor', np.int32))
+
+# Same column order as CATEGORIES + (preco, dia); the day and price conversions
+# happen in the database so the cursor yields plain ints and floats
+OFFERS_SQL = """
+    SELECT carta, idioma, estado, vendedor, valor::float8, data_coleta::date - DATE '1970-01-01'
+    FROM myp_cards_meg
+    WHERE data_coleta >= %(desde)s AND carta IS NOT NULL
+"""
+
+BATCH_SIZE = 50_000
+
+
+class Dictionary:
+    """Interned strings <-> dense integer codes (None is a value like any other)"""
+
+    def __init__(self, dtype=np.int32):
+        self.dtype = np.dtype(dtype)
+        self.values = []
+        self._codes = {}
+
+    def __len__(self):
+        return len(self.values)
+
+    def intern(self, value):
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self.values)
+            if code > np.iinfo(self.dtype).max:
+                raise OverflowError(f"Mais de {np.iinfo(self.dtype).max + 1} valores distintos para {self.dtype}")
+            self._codes[value] = code
+            self.values.append(value)
+        return code
+
+    def encode(self, values):
+        """Codes array for a sequence of values, interning new ones"""
+        return np.fromiter(map(self.intern, values), dtype=self.dtype, count=len(values))
+
+    def code(self, value):
+        """Code of a known value, or -1"""
+        return self._codes.get(value, -1)
+
+    def decode(self, codes):
+        return [self.values[code] for code in codes.tolist()]
+
+
+class PriceStore:
+    """Offers as NumPy columns sorted by (carta, dia), with per-card offsets"""
+
+    def __init__(self, preco, dia, codes, dictionaries):
+        """codes/dictionaries: {name: array} / {name: Dictionary} for each CATEGORIES column"""
+        self.dictionaries = dictionaries
+        order = np.lexsort((dia, codes['carta']))
+        self.preco = np.ascontiguousarray(preco[order], dtype=np.float32)
+        self.dia = np.ascontiguousarray(dia[order], dtype=np.int32)
+        self.codes = {name: codes[name][order] for name, _ in CATEGORIES}
+        counts = np.bincount(self.codes['carta'], minlength=len(dictionaries['carta']))
+        self.offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.offsets[1:])
+
+    @classmethod
+    def from_rows(cls, rows, batch_size=BATCH_SIZE):
+        """Build from an iterable of (carta, idioma, estado, vendedor, preco, dia) tuples
+
+        dia is days since EPOCH, a date or a datetime (its date part).
+        """
+        rows = iter(rows)
+        return cls._build(iter(lambda: [row for _, row in zip(range(batch_size), rows)], []))
+
+    @classmethod
+    def from_cursor(cls, cursor, batch_size=BATCH_SIZE):
+        """Build from an executed DB-API cursor yielding OFFERS_SQL's columns"""
+        return cls._build(iter(lambda: cursor.fetchmany(batch_size), []))
+
+    @classmethod
+    def load(cls, bind=engine, since=EPOCH, batch_size=BATCH_SIZE):
+        """Load myp_cards_meg offers collected since `since` through a server-side cursor"""
+        start = time.perf_counter()
+        connection = bind.raw_connection()
+        try:
+            cursor = connection.cursor(name='price_store')
+            cursor.itersize = batch_size
+            cursor.execute(OFFERS_SQL, {'desde': since})
+            store = cls.from_cursor(cursor, batch_size)
+            cursor.close()
+            connection.commit()
+        finally:
+            connection.close()
+        print(f"[INFO] {len(store)} ofertas carregadas em {(time.perf_counter() - start) * 1000:.0f} ms "
+              f"({store.nbytes / 1024 / 1024:.1f} MB)")
+        return store
+
+    @classmethod
+    def _build(cls, batches):
+        dictionaries = {name: Dictionary(dtype) for name, dtype in CATEGORIES}
+        chunks = {name: [] for name in (*dictionaries, 'preco', 'dia')}
+        for batch in batches:
+            carta, idioma, estado, vendedor, preco, dia = zip(*batch)
+            for name, values in (('carta', carta), ('idioma', idioma), ('estado', estado), ('vendedor', vendedor)):
+                chunks[name].append(dictionaries[name].encode(values))
+            chunks['preco'].append(np.array(preco, dtype=np.float32))
+            dia = [day.toordinal() - EPOCH_ORDINAL if isinstance(day, date) else day for day in dia]
+            chunks['dia'].append(np.array(dia, dtype=np.int32))
+
+        def column(name, dtype):
+            return np.concatenate(chunks[name]) if chunks[name] else np.empty(0, dtype=dtype)
+
+        codes = {name: column(name, dtype) for name, dtype in CATEGORIES}
+        return cls(column('preco', np.float32), column('dia', np.int32), codes, dictionaries)
+
+    def __len__(self):
+        return len(self.preco)
+
+    @property
+    def nbytes(self):
+        """Bytes held by the arrays (the interned names are shared and not counted)"""
+        return (self.preco.nbytes + self.dia.nbytes + self.offsets.nbytes
+                + sum(codes.nbytes for codes in self.codes.values()))
+
+    def cards(self):
+        return [carta for carta, count in zip(self.dictionaries['carta'].values, np.diff(self.offsets)) if count]
+
+    def card_slice(self, carta):
+        """Row slice of a card (empty if unknown)"""
+        code = self.dictionaries['carta'].code(carta)
+        if code < 0:
+            return slice(0, 0)
+        return slice(int(self.offsets[code]), int(self.offsets[code + 1]))
+
+    def card(self, carta):
+        """A card's offers as array views {'preco', 'dia', 'idioma', 'estado', 'vendedor'}, sorted by dia"""
+        rows = self.card_slice(carta)
+        offers = {'preco': self.preco[rows], 'dia': self.dia[rows]}
+        for name, _ in CATEGORIES[1:]:
+            offers[name] = self.codes[name][rows]
+        return offers
+
+    def rows(self, carta):
+        """A card's offers as dicts (decoded; for callers that need the old row format)"""
+        rows = self.card_slice(carta)
+        decoded = {name: self.dictionaries[name].decode(self.codes[name][rows]) for name, _ in CATEGORIES}
+        days = self.dia[rows].tolist()
+        return [{
+            'carta': decoded['carta'][i],
+            'idioma': decoded['idioma'][i],
+            'estado': decoded['estado'][i],
+            'vendedor': decoded['vendedor'][i],
+            'valor': float(price),
+            'data_coleta': EPOCH + timedelta(days=days[i]),
+        } for i, price in enumerate(self.preco[rows].tolist())]
+
+    def history(self, carta, idioma=None, estado=None):
+        """Daily minimum positive price of a card variant as [{'date', 'price'}]"""
+        offers = self.card(carta)
+        mask = offers['preco'] > 0
+        for name, value in (('idioma', idioma), ('estado', estado)):
+            if value is not None:
+                mask &= offers[name] == self.dictionaries[name].code(value)
+        prices, days = offers['preco'][mask], offers['dia'][mask]
+        if not len(days):
+            return []
+        # Rows are sorted by day within the card, so each day is one run
+        starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+        minimums = np.minimum.reduceat(prices, starts)
+        return [{'date': (EPOCH + timedelta(days=day)).isoformat(), 'price': round(float(price), 2)}
+                for day, price in zip(days[starts].tolist(), minimums.tolist())]
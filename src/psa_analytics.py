@@ -0,0 +1,257 @@
+"""
+PSA graded-price analytics over psa_raw_prices.
+
+For every card (grouped by lower(trim(card_name)), like the PSA tab) and
+collection date, computes as of that date:
+- the latest price per grade: median of the listings on the newest day the
+  grade was seen (raw/ungraded is grade 0);
+- the PSA 10 / raw multiplier;
+- the ROI of buying raw, grading and selling as PSA 10 (and PSA 9), after the
+  grading fee, shipping and the marketplace's selling fee;
+- a 0-100 liquidity score from the listings in the trailing window.
+
+All of it is pandas group-bys over the whole frame; the results go to
+psa_card_stats (create_psa_stats_table.sql), one snapshot per collection date:
+
+    psa = PsaAnalytics()
+    psa.update()                  # computes the dates not cached yet
+    psa.get_stats(limit=20)       # newest date, best ROI first
+
+Fees (USD) come from PSA_GRADING_FEE (default 25), PSA_SHIPPING_COST (default 5)
+and PSA_SELLING_FEE (fraction, default 0.13).
+
+Usage:
+    python psa_analytics.py [--rebuild]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from db_connection import engine
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+RAW = 0.0
+# Trailing window of the liquidity score
+LIQUIDITY_DAYS = 30
+
+LOCK_SQL = text("SELECT pg_advisory_xact_lock(hashtext('psa_card_stats'))")
+
+DATES_SQL = text("""
+    SELECT DISTINCT data_coleta::date AS dia
+    FROM psa_raw_prices
+    WHERE data_coleta >= coalesce(CAST(:desde AS date), '-infinity')
+    ORDER BY 1
+""")
+
+LAST_COMPUTED_SQL = text("SELECT max(data_coleta) FROM psa_card_stats")
+
+RAW_SQL = text("""
+    SELECT card_name, grade::text AS grade, price::float8 AS price, data_coleta::date AS dia
+    FROM psa_raw_prices
+    WHERE data_coleta < CAST(:ate AS date) + 1 AND price > 0 AND card_name IS NOT NULL
+""")
+
+DELETE_SQL = text("DELETE FROM psa_card_stats WHERE data_coleta = ANY(:dias)")
+
+INSERT_SQL = text("""
+    INSERT INTO psa_card_stats (data_coleta, card_key, card_name, preco_raw, preco_psa9, preco_psa10,
+                                precos_por_nota, multiplicador_psa10, roi_psa9, roi_psa10,
+                                ofertas_janela, dias_janela, liquidez, ultima_coleta)
+    VALUES (:data_coleta, :card_key, :card_name, :preco_raw, :preco_psa9, :preco_psa10,
+            CAST(:precos_por_nota AS jsonb), :multiplicador_psa10, :roi_psa9, :roi_psa10,
+            :ofertas_janela, :dias_janela, :liquidez, :ultima_coleta)
+""")
+
+STATS_COLUMNS = ('card_key', 'card_name', 'preco_raw', 'preco_psa9', 'preco_psa10', 'precos_por_nota',
+                 'multiplicador_psa10', 'roi_psa9', 'roi_psa10', 'ofertas_janela', 'dias_janela', 'liquidez',
+                 'ultima_coleta')
+
+ORDERINGS = ('roi_psa10', 'multiplicador_psa10', 'liquidez', 'preco_psa10')
+
+
+def parse_grades(grades):
+    """Numeric grade of each listing: 'PSA 10' / '10' -> 10.0, 'Raw' / 'Ungraded' -> 0.0, else NaN"""
+    labels = grades.astype('string').str.strip().str.lower()
+    numbers = pd.to_numeric(labels.str.extract(r'(\d+(?:\.5)?)', expand=False), errors='coerce')
+    raw = labels.str.contains(r'raw|ungraded|sem nota', na=False)
+    return numbers.where(numbers.between(1, 10)).mask(raw, RAW).astype('float64')
+
+
+def _grade_label(grade):
+    return 'raw' if grade == RAW else f"{grade:g}"
+
+
+def compute_stats(raw, as_of, grading_fee, shipping, selling_fee, window=LIQUIDITY_DAYS):
+    """
+    Stats of every card as of `as_of` from listings (card_name, grade, price, dia).
+
+    Returns a DataFrame with STATS_COLUMNS, one row per card seen up to as_of.
+    """
+    listings = raw[(raw['dia'] <= as_of) & (raw['price'] > 0)].copy()
+    listings['grade'] = parse_grades(listings['grade'])
+    listings = listings.dropna(subset=['grade'])
+    if listings.empty:
+        return pd.DataFrame(columns=STATS_COLUMNS)
+    listings['card_key'] = listings['card_name'].str.strip().str.lower()
+
+    # Latest price per grade: median of the newest day of each (card, grade)
+    newest = listings.groupby(['card_key', 'grade'])['dia'].transform('max')
+    latest = listings[listings['dia'] == newest].groupby(['card_key', 'grade'])['price'].median()
+    by_grade = latest.unstack('grade')
+    stats = pd.DataFrame(index=by_grade.index)
+    for column, grade in (('preco_raw', RAW), ('preco_psa9', 9.0), ('preco_psa10', 10.0)):
+        stats[column] = by_grade[grade] if grade in by_grade else np.nan
+
+    # Newest spelling of each card and its last collection day
+    named = listings.sort_values('dia').groupby('card_key').agg(card_name=('card_name', 'last'), ultima_coleta=('dia', 'max'))
+    stats = stats.join(named)
+
+    stats['multiplicador_psa10'] = stats['preco_psa10'] / stats['preco_raw']
+    # Buy raw, pay grading and shipping, sell graded minus the selling fee
+    cost = stats['preco_raw'] + grading_fee + shipping
+    for column, grade in (('roi_psa9', 'preco_psa9'), ('roi_psa10', 'preco_psa10')):
+        stats[column] = (stats[grade] * (1 - selling_fee) - cost) / cost
+
+    recent = listings[listings['dia'] > as_of - timedelta(days=window)]
+    activity = recent.groupby('card_key').agg(ofertas_janela=('price', 'size'), dias_janela=('dia', 'nunique'))
+    stats = stats.join(activity)
+    stats[['ofertas_janela', 'dias_janela']] = stats[['ofertas_janela', 'dias_janela']].fillna(0).astype(int)
+    most_listed = stats['ofertas_janela'].max()
+    stats['liquidez'] = (100 * np.log1p(stats['ofertas_janela']) / np.log1p(most_listed)) if most_listed else 0.0
+
+    # {"raw": 12.5, "9": 40.0, "10": 120.0}
+    grades = latest.reset_index()
+    grades['label'] = grades['grade'].map(_grade_label)
+    grades['price'] = grades['price'].round(2)
+    stats['precos_por_nota'] = grades.groupby('card_key')[['label', 'price']].apply(
+        lambda group: dict(zip(group['label'], group['price']))
+    )
+    return stats.reset_index()[list(STATS_COLUMNS)]
+
+
+def _db_value(value):
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    if isinstance(value, np.generic):
+        return _db_value(value.item())
+    return value
+
+
+class PsaAnalytics:
+    """Batch PSA analytics cached per collection date, and its query API"""
+
+    def __init__(self, bind=engine, grading_fee=None, shipping=None, selling_fee=None):
+        self.bind = bind
+        self.grading_fee = float(os.getenv('PSA_GRADING_FEE', '25')) if grading_fee is None else grading_fee
+        self.shipping = float(os.getenv('PSA_SHIPPING_COST', '5')) if shipping is None else shipping
+        self.selling_fee = float(os.getenv('PSA_SELLING_FEE', '0.13')) if selling_fee is None else selling_fee
+
+    def update(self, rebuild=False):
+        """Compute the collection dates not cached yet; returns the number of dates written"""
+        start = time.perf_counter()
+        with self.bind.begin() as connection:
+            connection.execute(LOCK_SQL)
+            # The newest cached date is computed again: its scrape may have been partial
+            since = None if rebuild else connection.execute(LAST_COMPUTED_SQL).scalar()
+            dates = connection.execute(DATES_SQL, {'desde': since}).scalars().all()
+            if not dates:
+                print(f"[INFO] Estatísticas PSA já estão em dia (última data {since})")
+                return 0
+
+            raw = pd.read_sql(RAW_SQL, connection, params={'ate': dates[-1]})
+            rows = []
+            for day in dates:
+                stats = compute_stats(raw, day, self.grading_fee, self.shipping, self.selling_fee)
+                stats['precos_por_nota'] = stats['precos_por_nota'].map(json.dumps)
+                rows.extend({'data_coleta': day, **{key: _db_value(value) for key, value in record.items()}}
+                            for record in stats.to_dict('records'))
+
+            if rebuild:
+                connection.execute(text("DELETE FROM psa_card_stats"))
+            else:
+                connection.execute(DELETE_SQL, {'dias': dates})
+            if rows:
+                connection.execute(INSERT_SQL, rows)
+
+        print(f"[OK] {len(dates)} data(s) de estatísticas PSA ({dates[0]} a {dates[-1]}, {len(rows)} linhas) "
+              f"em {(time.perf_counter() - start) * 1000:.0f} ms")
+        return len(dates)
+
+    def available_dates(self):
+        try:
+            with self.bind.connect() as connection:
+                return connection.execute(
+                    text("SELECT DISTINCT data_coleta FROM psa_card_stats ORDER BY 1")
+                ).scalars().all()
+        except Exception as e:
+            print(f"[ERROR] Erro ao buscar datas PSA: {e}")
+            return []
+
+    def get_stats(self, data_coleta=None, order_by='roi_psa10', limit=None, search=None):
+        """Cards of one date (the newest by default) as dicts, best first by `order_by`"""
+        if order_by not in ORDERINGS:
+            raise ValueError(f"order_by inválido: {order_by!r} (use {', '.join(ORDERINGS)})")
+        params = {'data_coleta': data_coleta, 'limit': limit, 'search': f"%{search.strip().lower()}%" if search else None}
+        try:
+            with self.bind.connect() as connection:
+                rows = connection.execute(text(f"""
+                    SELECT data_coleta, {', '.join(STATS_COLUMNS)}
+                    FROM psa_card_stats
+                    WHERE data_coleta = coalesce(CAST(:data_coleta AS date), (SELECT max(data_coleta) FROM psa_card_stats))
+                      AND (CAST(:search AS text) IS NULL OR card_key LIKE :search)
+                    ORDER BY {order_by} DESC NULLS LAST, card_key
+                    LIMIT :limit
+                """), params).mappings().all()
+        except Exception as e:
+            print(f"[ERROR] Erro ao buscar estatísticas PSA: {e}")
+            return []
+        return [_json_row(row) for row in rows]
+
+    def get_card_history(self, card_name):
+        """Stats of one card on every cached date, oldest first"""
+        try:
+            with self.bind.connect() as connection:
+                rows = connection.execute(text(f"""
+                    SELECT data_coleta, {', '.join(STATS_COLUMNS)}
+                    FROM psa_card_stats
+                    WHERE card_key = lower(trim(:card_name))
+                    ORDER BY data_coleta
+                """), {'card_name': card_name}).mappings().all()
+        except Exception as e:
+            print(f"[ERROR] Erro ao buscar histórico PSA de {card_name}: {e}")
+            return []
+        return [_json_row(row) for row in rows]
+
+
+def _json_row(row):
+    result = {}
+    for key, value in row.items():
+        if hasattr(value, 'isoformat'):
+            value = value.isoformat()
+        elif value is not None and not isinstance(value, (str, int, dict)):
+            value = float(value)
+        result[key] = value
+    return result
+
+
+# Example usage
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rebuild', action='store_true', help='Recalcula todas as datas')
+    args = parser.parse_args()
+
+    try:
+        PsaAnalytics().update(rebuild=args.rebuild)
+    except Exception as e:
+        print(f"[ERROR] Erro ao atualizar estatísticas PSA: {e}")
+        sys.exit(1)
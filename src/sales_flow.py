@@ -0,0 +1,267 @@
+"""
+Real-sales detection for every card at once, stored day by day in sales_flow.
+
+Same rule as detectRealSales (src/utils/sales-detection.ts): an offer listed
+on the previous collected day and gone today was sold. Offers are identified
+by carta + vendedor + preço (the frontend's seller_price key), factorized and
+packed into one int64 per offer; each day is one hash-table membership test
+between the two days' keys, and per-card counts/volumes are np.bincount over
+the card codes.
+
+    engine = SalesFlowEngine()
+    engine.update('myp')                  # newest stored day again + days not in sales_flow yet
+    engine.get_sales_flow('Charizard ex', 'myp')
+
+Usage:
+    python sales_flow.py [--source myp|liga|all] [--since 2025-01-01]
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from db_connection import engine
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+# Column expressions of each offer source
+SOURCES = {
+    'myp': {'table': 'myp_cards_meg', 'carta': 'carta', 'vendedor': 'vendedor', 'preco': 'valor'},
+    'liga': {'table': 'cartas_precos_liga', 'carta': 'coalesce(slug_carta, carta, nome)',
+             'vendedor': 'vendedor', 'preco': 'preco'},
+}
+
+# Days in get_sales_flow's history
+HISTORY_DAYS = 7
+
+UPSERT_SQL = text("""
+    INSERT INTO sales_flow (fonte, carta, data, data_anterior, vendas, volume, ofertas,
+                            vendedores_ativos, vendedores_novos, vendedores_perdidos)
+    VALUES (:fonte, :carta, :data, :data_anterior, :vendas, :volume, :ofertas,
+            :vendedores_ativos, :vendedores_novos, :vendedores_perdidos)
+    ON CONFLICT (fonte, carta, data) DO UPDATE SET
+        data_anterior = EXCLUDED.data_anterior,
+        vendas = EXCLUDED.vendas,
+        volume = EXCLUDED.volume,
+        ofertas = EXCLUDED.ofertas,
+        vendedores_ativos = EXCLUDED.vendedores_ativos,
+        vendedores_novos = EXCLUDED.vendedores_novos,
+        vendedores_perdidos = EXCLUDED.vendedores_perdidos,
+        computed_at = NOW()
+""")
+
+# Newest stored day and the collected day it was compared against
+LAST_DAY_SQL = text("""
+    SELECT data, data_anterior FROM sales_flow
+    WHERE fonte = :fonte
+    ORDER BY data DESC
+    LIMIT 1
+""")
+
+HISTORY_SQL = text("""
+    SELECT data, vendas, volume, vendedores_ativos, vendedores_novos, vendedores_perdidos
+    FROM sales_flow
+    WHERE fonte = :fonte AND carta = :carta
+    ORDER BY data DESC
+    LIMIT :days
+""")
+
+
+def _days_sql(source):
+    columns = SOURCES[source]
+    return text(f"""
+        SELECT DISTINCT data_coleta::date AS dia
+        FROM {columns['table']}
+        WHERE data_coleta >= :since
+        ORDER BY dia
+    """)
+
+
+def _snapshot_sql(source):
+    columns = SOURCES[source]
+    return text(f"""
+        SELECT {columns['carta']} AS carta, {columns['vendedor']} AS vendedor, {columns['preco']} AS preco
+        FROM {columns['table']}
+        WHERE data_coleta >= :dia AND data_coleta < :dia + 1
+    """)
+
+
+def load_snapshot(connection, source, day):
+    """Offers of one collected day as a DataFrame (carta, vendedor, preco)"""
+    rows = connection.execute(_snapshot_sql(source), {'dia': day}).all()
+    offers = pd.DataFrame(rows, columns=['carta', 'vendedor', 'preco'])
+    offers = offers[offers['carta'].notna()]
+    offers['preco'] = pd.to_numeric(offers['preco'], errors='coerce').fillna(0.0).round(2)
+    return offers.reset_index(drop=True)
+
+
+def _codes(*columns):
+    """Shared integer codes for the same column across both days"""
+    codes, uniques = pd.factorize(pd.concat(columns, ignore_index=True))
+    return np.split(codes.astype(np.int64), [len(columns[0])]), len(uniques)
+
+
+def _isin(keys, other):
+    """np.isin through a pandas hash table (O(n) instead of sorting both sides)"""
+    return pd.Series(keys, copy=False).isin(other).to_numpy()
+
+
+def _distinct_per_card(cards, sellers, mask, n_cards, n_sellers):
+    """Distinct sellers per card among the rows in mask"""
+    pairs = np.unique(cards[mask] * n_sellers + sellers[mask])
+    return np.bincount(pairs // n_sellers, minlength=n_cards)
+
+
+def diff_days(previous, current):
+    """
+    Sales between two day snapshots, for every card in either of them.
+
+    Returns a DataFrame indexed by carta with vendas, volume, ofertas,
+    vendedores_ativos, vendedores_novos and vendedores_perdidos.
+    """
+    cards, card_uniques = pd.factorize(pd.concat([previous['carta'], current['carta']], ignore_index=True))
+    prev_cards, curr_cards = np.split(cards.astype(np.int64), [len(previous)])
+    n_cards = len(card_uniques)
+
+    # Offers without a seller share the code of 'unknown', like the frontend's key
+    (prev_sellers, curr_sellers), n_sellers = _codes(previous['vendedor'].fillna('unknown'),
+                                                     current['vendedor'].fillna('unknown'))
+    (prev_prices, curr_prices), n_prices = _codes(previous['preco'], current['preco'])
+
+    # carta + vendedor + preço packed into one int64 per offer
+    prev_offers = (prev_cards * n_sellers + prev_sellers) * n_prices + prev_prices
+    curr_offers = (curr_cards * n_sellers + curr_sellers) * n_prices + curr_prices
+    sold = ~_isin(prev_offers, curr_offers)
+
+    prices = previous['preco'].to_numpy(dtype=np.float64)
+    vendas = np.bincount(prev_cards[sold], minlength=n_cards)
+    volume = np.bincount(prev_cards[sold], weights=prices[sold], minlength=n_cards)
+    ofertas = np.bincount(curr_cards, minlength=n_cards)
+
+    # Seller counts ignore offers without a seller
+    prev_has_seller = previous['vendedor'].notna().to_numpy()
+    curr_has_seller = current['vendedor'].notna().to_numpy()
+    ativos = _distinct_per_card(prev_cards, prev_sellers, sold & prev_has_seller, n_cards, n_sellers)
+
+    # Listing sellers per card on each day, compared as packed (carta, vendedor) pairs
+    prev_pairs = prev_cards * n_sellers + prev_sellers
+    curr_pairs = curr_cards * n_sellers + curr_sellers
+    new_mask = curr_has_seller & ~_isin(curr_pairs, prev_pairs[prev_has_seller])
+    lost_mask = prev_has_seller & ~_isin(prev_pairs, curr_pairs[curr_has_seller])
+    novos = _distinct_per_card(curr_cards, curr_sellers, new_mask, n_cards, n_sellers)
+    perdidos = _distinct_per_card(prev_cards, prev_sellers, lost_mask, n_cards, n_sellers)
+
+    return pd.DataFrame({
+        'vendas': vendas,
+        'volume': volume.round(2),
+        'ofertas': ofertas,
+        'vendedores_ativos': ativos,
+        'vendedores_novos': novos,
+        'vendedores_perdidos': perdidos,
+    }, index=pd.Index(card_uniques, name='carta'))
+
+
+class SalesFlowEngine:
+    """Incremental sales_flow builder and reader"""
+    def __init__(self, bind=engine):
+        self.bind = bind
+
+    def pending_days(self, source, since=None):
+        """(previous day, day) pairs of collected days not in sales_flow yet, plus the newest stored one
+        
+        The newest stored day may have been computed during a partial scrape,
+        when offers not collected yet looked sold; its pair is recomputed and
+        overwritten, like the newest day in price_rollups and psa_analytics.
+        """
+        with self.bind.connect() as connection:
+            last = connection.execute(LAST_DAY_SQL, {'fonte': source}).first()
+            start = last.data_anterior if last else since or pd.Timestamp.min.date()
+            days = [row[0] for row in connection.execute(_days_sql(source), {'since': start})]
+        return list(zip(days, days[1:]))
+
+    def update(self, source='myp', since=None):
+        """Compute and store every pending day; returns the number of days written"""
+        pairs = self.pending_days(source, since)
+        if not pairs:
+            print(f"[INFO] sales_flow ({source}) já está em dia")
+            return 0
+
+        previous = None
+        with self.bind.connect() as connection:
+            for previous_day, day in pairs:
+                start = time.perf_counter()
+                if previous is None:
+                    previous = load_snapshot(connection, source, previous_day)
+                current = load_snapshot(connection, source, day)
+                flow = diff_days(previous, current)
+                rows = [
+                    {'fonte': source, 'carta': carta, 'data': day, 'data_anterior': previous_day, **values}
+                    for carta, values in zip(flow.index, flow.to_dict('records'))
+                ]
+                if rows:
+                    connection.execute(UPSERT_SQL, rows)
+                # One commit per day: a failure leaves earlier days stored and resumable
+                connection.commit()
+                print(f"[OK] {source} {day}: {int(flow['vendas'].sum())} vendas em {len(flow)} cartas "
+                      f"({(time.perf_counter() - start) * 1000:.0f} ms)")
+                previous = current
+        return len(pairs)
+
+    def get_sales_flow(self, carta, source='myp', days=HISTORY_DAYS):
+        """SalesFlowData (sales-flow.model.ts) for one card from stored days, or None"""
+        try:
+            with self.bind.connect() as connection:
+                rows = connection.execute(HISTORY_SQL, {'fonte': source, 'carta': carta, 'days': days}).all()
+        except Exception as e:
+            print(f"[ERROR] Erro ao buscar fluxo de vendas: {e}")
+            return None
+        if not rows:
+            return None
+
+        today = rows[0]
+        yesterday = rows[1] if len(rows) > 1 else None
+        total_sales, total_volume = today.vendas, float(today.volume)
+
+        def diff_pct(current, previous):
+            if previous:
+                return (current - previous) / previous * 100
+            return 100 if current > 0 else 0
+
+        return {
+            'summary': {
+                'totalSales': total_sales,
+                'totalVolume': total_volume,
+                'avgTicket': total_volume / total_sales if total_sales else 0,
+                'activeSellers': today.vendedores_ativos,
+                'diffSalesPct': diff_pct(total_sales, yesterday.vendas if yesterday else 0),
+                'diffVolumePct': diff_pct(total_volume, float(yesterday.volume) if yesterday else 0),
+                'newSellers': today.vendedores_novos,
+                'returningSellers': 0,
+                'lostSellers': today.vendedores_perdidos,
+            },
+            'history': [{'date': row.data.isoformat(), 'sales': row.vendas} for row in reversed(rows)],
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--source', default='all', choices=['all', *SOURCES])
+    parser.add_argument('--since', type=lambda value: pd.Timestamp(value).date(),
+                        help='Primeiro dia no backfill inicial (padrão: todo o histórico)')
+    args = parser.parse_args()
+
+    sources = list(SOURCES) if args.source == 'all' else [args.source]
+    for source in sources:
+        try:
+            SalesFlowEngine().update(source, since=args.since)
+        except Exception as e:
+            print(f"[ERROR] Erro ao atualizar sales_flow ({source}): {e}")
+
+
+if __name__ == "__main__":
+    main()
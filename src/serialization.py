@@ -0,0 +1,131 @@
+"""
+Column-wise JSON serialization for the portfolio APIs.
+
+Row-at-a-time conversion (PortfolioCard.to_dict: str(), isoformat(), float()
+on every attribute of every ORM object) is replaced by converting one column
+of plain result rows at a time and zipping the columns back into dicts:
+
+    rows = session.execute(select(*CARD_COLUMNS)).all()
+    columns = transpose(rows, len(CARD_COLUMNS))
+    columns[3] = decimals_to_float(columns[3])
+    records = to_records(CARD_FIELDS, columns)
+
+dumps() returns bytes. orjson is used when installed: it formats date,
+datetime and UUID values itself (RFC 3339, the same text as isoformat()), so
+callers that only need the bytes can leave those columns untouched
+(NATIVE_TYPES). Without orjson the stdlib json module is used; for the values
+these modules produce (str / int / float / bool / None, lists, dicts with
+string or int keys, Decimal, date, datetime, UUID, NumPy) both write the same
+JSON, byte for byte except the exponent of very large or small floats (1e20
+vs 1e+20). NaN and Infinity are not valid JSON: both write them as null. Dict
+keys of other types (dates, UUIDs) only work with orjson.
+
+ndjson() and iter_ndjson() produce newline-delimited JSON, one record per
+line, for streaming large result sets in chunks.
+"""
+import json
+import math
+import sys
+from datetime import date, datetime
+from decimal import Decimal
+from uuid import UUID
+
+try:
+    import orjson
+except ImportError:  # Optional: the stdlib fallback below is slower
+    orjson = None
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+# dumps() formats date / datetime / UUID natively (no per-value conversion needed)
+NATIVE_TYPES = orjson is not None
+
+
+def _default(value):
+    """Types neither encoder handles on its own"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    if hasattr(value, 'tolist'):  # NumPy scalars and arrays
+        return value.tolist()
+    raise TypeError(f"Tipo não serializável em JSON: {type(value).__name__}")
+
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj):
+        """obj as UTF-8 JSON bytes"""
+        return orjson.dumps(obj, default=_default, option=_OPTIONS)
+
+    loads = orjson.loads
+else:
+    def _finite(obj):
+        """obj with NaN / Infinity floats replaced by None, as orjson writes them"""
+        if isinstance(obj, float):
+            return obj if math.isfinite(obj) else None
+        if isinstance(obj, dict):
+            return {key: _finite(value) for key, value in obj.items()}
+        if isinstance(obj, (list, tuple)):
+            return [_finite(value) for value in obj]
+        return obj
+
+    _encoder = json.JSONEncoder(default=lambda value: _finite(_default(value)), ensure_ascii=False,
+                                separators=(',', ':'), allow_nan=False)
+
+    def dumps(obj):
+        """obj as UTF-8 JSON bytes"""
+        try:
+            text = _encoder.encode(obj)
+        except ValueError:
+            # A non-finite float: copy the structure with None in its place
+            text = _encoder.encode(_finite(obj))
+        return text.encode('utf-8')
+
+    loads = json.loads
+
+
+def transpose(rows, width):
+    """Rows (tuples) -> list of `width` column lists"""
+    if not rows:
+        return [[] for _ in range(width)]
+    return [list(column) for column in zip(*rows)]
+
+
+def to_records(fields, columns):
+    """Column lists -> [{field: value}], one dict per row"""
+    return [dict(zip(fields, values)) for values in zip(*columns)]
+
+
+def iso_strings(values):
+    """isoformat() of each date / datetime, None kept"""
+    return [value.isoformat() if value is not None else None for value in values]
+
+
+def uuid_strings(values):
+    """str() of each UUID, None (or empty) as None"""
+    return [str(value) if value else None for value in values]
+
+
+def decimals_to_float(values, missing=0):
+    """float() of each Decimal; None and zero become `missing`"""
+    return [float(value) if value else missing for value in values]
+
+
+def ndjson(records):
+    """Records as one NDJSON chunk (each record on its own line)"""
+    if not records:
+        return b''
+    return b'\n'.join(map(dumps, records)) + b'\n'
+
+
+def iter_ndjson(batches):
+    """One NDJSON chunk per batch of records (e.g. PortfolioCardService.iter_cards)"""
+    for batch in batches:
+        if batch:
+            yield ndjson(batch)
@@ -1,28 +1,12 @@
-import os
-import psycopg2
-from dotenv import load_dotenv
+from db_connection import get_connection
 from datetime import datetime
 
-load_dotenv()
-
-DB_USER = os.getenv("user")
-DB_PASSWORD = os.getenv("password")
-DB_HOST = os.getenv("host")
-DB_PORT = os.getenv("port")
-DB_NAME = os.getenv("dbname")
-
 # The ID of the user we created: 18d11a9c-90cb-46d8-af9e-7c2ee0899c02
 USER_ID = "18d11a9c-90cb-46d8-af9e-7c2ee0899c02"
 
 def test_insert():
     try:
-        conn = psycopg2.connect(
-            user=DB_USER,
-            password=DB_PASSWORD,
-            host=DB_HOST,
-            port=DB_PORT,
-            dbname=DB_NAME
-        )
+        conn = get_connection()
         cursor = conn.cursor()
 
         print(f"Attempting to insert card for user {USER_ID}...")
@@ -0,0 +1,239 @@
+"""
+Mark-to-market valuation of portfolio lots against myp_cards_meg prices.
+
+    prices = PriceIndex.load()
+    result = prices.value_lots(service.get_all_cards(user_id))
+
+PriceIndex loads the latest preco_minimo_carta of every (carta, idioma,
+estado) in one DISTINCT ON query and keeps it in memory (or, with
+PriceIndex.from_rollups(), the newest daily minimum from card_price_daily). A lot is priced by
+its exact variant when there is one; otherwise by the newest quote of the same
+carta (same idioma first, then same estado, then any), converted with
+idioma_factor / estado_factor the same way the Angular getAdjustedPrice does:
+price * target_factor / source_factor, unknown factors counting as 1.0. The
+factors come from the in-process FactorRegistry, never from a query per
+valuation.
+Card names are matched case-insensitively, like the ILIKE fallback there.
+
+Lot lookups are dict hits; prices, factors, values and P&L for the whole
+portfolio are then computed in one pass of numpy array operations.
+"""
+import sys
+import time
+
+import numpy as np
+from sqlalchemy import text
+
+from db_connection import engine
+from factor_registry import FactorRegistry, registry
+from price_rollups import PriceRollups
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+LATEST_PRICES_SQL = text("""
+    SELECT DISTINCT ON (carta, idioma, estado)
+           carta, idioma, estado, preco_minimo_carta, data_coleta
+    FROM myp_cards_meg
+    WHERE preco_minimo_carta IS NOT NULL AND preco_minimo_carta > 0
+    ORDER BY carta, idioma, estado, data_coleta DESC
+""")
+
+# How a lot was priced
+EXACT = 'exact'
+ADJUSTED = 'adjusted'
+
+
+def _card_key(carta):
+    return (carta or '').strip().casefold()
+
+
+class PriceIndex:
+    """Latest price per (carta, idioma, estado), indexed for portfolio valuation"""
+
+    def __init__(self, rows, factors=None):
+        """rows: iterable of (carta, idioma, estado, price, data_coleta); factors: a FactorRegistry"""
+        self.factors = factors or FactorRegistry.static({}, {})
+
+        # Oldest first, so the newest quote wins in the fallback maps
+        rows = sorted(rows, key=lambda row: (row[4] is not None, row[4] or 0))
+        self.prices = np.empty(len(rows), dtype=np.float64)
+        self.idiomas = []
+        self.estados = []
+        self.date_strings = []
+        self._source_codes = (None, None, None)
+        self.loaded_at = time.time()
+
+        self._exact = {}
+        self._by_idioma = {}
+        self._by_estado = {}
+        self._by_carta = {}
+        for i, (carta, idioma, estado, price, data_coleta) in enumerate(rows):
+            key = _card_key(carta)
+            self.prices[i] = float(price)
+            self.idiomas.append(idioma)
+            self.estados.append(estado)
+            self.date_strings.append(data_coleta.isoformat() if data_coleta else None)
+            self._exact[(key, idioma, estado)] = i
+            self._by_idioma[(key, idioma)] = i
+            self._by_estado[(key, estado)] = i
+            self._by_carta[key] = i
+
+    @classmethod
+    def load(cls, bind=engine, factors=registry):
+        """Load the latest prices from the database"""
+        start = time.perf_counter()
+        with bind.connect() as connection:
+            rows = connection.execute(LATEST_PRICES_SQL).all()
+        index = cls(rows, factors)
+        print(f"[INFO] {len(index)} preços carregados em {(time.perf_counter() - start) * 1000:.0f} ms")
+        return index
+
+    @classmethod
+    def from_rollups(cls, rollups=None, factors=registry):
+        """Load the newest daily minimum of every variant from card_price_daily (price_rollups.py)"""
+        start = time.perf_counter()
+        rows = (rollups or PriceRollups()).latest_prices()
+        index = cls(rows, factors)
+        print(f"[INFO] {len(index)} preços carregados dos rollups em {(time.perf_counter() - start) * 1000:.0f} ms")
+        return index
+
+    def __len__(self):
+        return len(self.prices)
+
+    def source_codes(self, snapshot):
+        """Factor codes of every quote's idioma/estado under a FactorSnapshot (cached per version)"""
+        version, idioma_codes, estado_codes = self._source_codes
+        if version != snapshot.version or idioma_codes is None:
+            idioma_codes = snapshot.idioma.encode(self.idiomas)
+            estado_codes = snapshot.estado.encode(self.estados)
+            self._source_codes = (snapshot.version, idioma_codes, estado_codes)
+        return idioma_codes, estado_codes
+
+    def lookup(self, carta, idioma, estado):
+        """(row, kind) of the quote used for a lot, or (-1, None) if the card has no price"""
+        key = _card_key(carta)
+        row = self._exact.get((key, idioma, estado))
+        if row is not None:
+            return row, EXACT
+        for row in (self._by_idioma.get((key, idioma)), self._by_estado.get((key, estado)), self._by_carta.get(key)):
+            if row is not None:
+                return row, ADJUSTED
+        return -1, None
+
+    def value_lots(self, lots):
+        """
+        Value portfolio lots (dicts as returned by PortfolioCardService).
+
+        Returns {'lots': [...], 'total_market_value', 'total_cost', 'priced_cost',
+        'unrealized_pnl', 'unrealized_pnl_pct', 'coverage': {...}}. Lots without a
+        price have market_value None and are left out of P&L; 'priced_cost' is the
+        cost basis of the priced lots, the base for unrealized_pnl_pct.
+        """
+        n = len(lots)
+        snapshot = self.factors.snapshot
+        matches = []
+
+        # Portfolios repeat the same (carta, idioma, estado) across lots
+        resolved = {}
+        for lot in lots:
+            variant = (lot['carta'], lot.get('idioma'), lot.get('estado'))
+            match = resolved.get(variant)
+            if match is None:
+                match = resolved[variant] = (
+                    *self.lookup(*variant), snapshot.idioma.code(variant[1]), snapshot.estado.code(variant[2])
+                )
+            matches.append(match)
+        row_list, kinds, target_idioma, target_estado = zip(*matches) if matches else ((), (), (), ())
+        rows = np.array(row_list, dtype=np.int64)
+        target_idioma = np.array(target_idioma, dtype=np.int32)
+        target_estado = np.array(target_estado, dtype=np.int32)
+        qtd = np.fromiter((lot.get('qtd') or 0 for lot in lots), dtype=np.float64, count=n)
+        cost = np.fromiter((lot.get('preco_compra') or 0.0 for lot in lots), dtype=np.float64, count=n) * qtd
+
+        priced = rows >= 0
+        source = np.where(priced, rows, 0)
+        if len(self.prices):
+            idioma_codes, estado_codes = self.source_codes(snapshot)
+            adjusted = snapshot.adjust(self.prices[source], idioma_codes[source], target_idioma,
+                                       estado_codes[source], target_estado)
+            market_price = np.where(priced, adjusted, np.nan)
+        else:
+            market_price = np.full(n, np.nan)
+        market_value = market_price * qtd
+        pnl = market_value - cost
+        pnl_pct = np.divide(pnl * 100, cost, out=np.full(n, np.nan), where=priced & (cost > 0))
+
+        total_market_value = float(np.nansum(market_value))
+        priced_cost = float(cost[priced].sum())
+        total_cost = float(cost.sum())
+        unrealized_pnl = total_market_value - priced_cost
+
+        def column(values):
+            # NaN (lot without a price) becomes None
+            return [None if value != value else value for value in np.round(values, 2).tolist()]
+
+        valued = [{
+            'id': lot.get('id'),
+            'carta': lot['carta'],
+            'idioma': lot.get('idioma'),
+            'estado': lot.get('estado'),
+            'qtd': lot.get('qtd') or 0,
+            'cost': lot_cost,
+            'market_price': lot_price,
+            'market_value': lot_value,
+            'pnl': lot_pnl,
+            'pnl_pct': lot_pnl_pct,
+            'match': kind,
+            'price_date': self.date_strings[row] if kind else None,
+        } for lot, lot_cost, lot_price, lot_value, lot_pnl, lot_pnl_pct, kind, row in zip(
+            lots, column(cost), column(market_price), column(market_value), column(pnl), column(pnl_pct),
+            kinds, row_list
+        )]
+
+        priced_lots = int(priced.sum())
+        return {
+            'lots': valued,
+            'total_market_value': round(total_market_value, 2),
+            'total_cost': round(total_cost, 2),
+            'priced_cost': round(priced_cost, 2),
+            'unrealized_pnl': round(unrealized_pnl, 2),
+            'unrealized_pnl_pct': round(unrealized_pnl / priced_cost * 100, 2) if priced_cost else None,
+            'coverage': {
+                'lots': n,
+                'priced_lots': priced_lots,
+                'exact_lots': kinds.count(EXACT),
+                'adjusted_lots': kinds.count(ADJUSTED),
+                'lot_ratio': round(priced_lots / n, 4) if n else None,
+                'cost_ratio': round(priced_cost / total_cost, 4) if total_cost else None,
+            },
+        }
+
+
+def value_portfolio(user_id=None, service=None, prices=None):
+    """Load a user's lots and value them (loads a fresh PriceIndex unless one is given)"""
+    if service is None:
+        from portfolio_service import PortfolioCardService
+        service = PortfolioCardService()
+    prices = prices or PriceIndex.load()
+    return prices.value_lots(service.get_all_cards(user_id))
+
+
+# Example usage
+if __name__ == "__main__":
+    user_id = sys.argv[1] if len(sys.argv) > 1 else None
+    result = value_portfolio(user_id)
+    coverage = result['coverage']
+
+    print("\n" + "-" * 60)
+    print(f"  Valor de mercado:  R$ {result['total_market_value']:.2f}")
+    print(f"  Custo (com preço): R$ {result['priced_cost']:.2f} de R$ {result['total_cost']:.2f}")
+    print(f"  P&L não realizado: R$ {result['unrealized_pnl']:.2f}"
+          + (f" ({result['unrealized_pnl_pct']:.1f}%)" if result['unrealized_pnl_pct'] is not None else ""))
+    print(f"  Cobertura: {coverage['priced_lots']}/{coverage['lots']} lotes "
+          f"({coverage['exact_lots']} exatos, {coverage['adjusted_lots']} ajustados)")
+    for lot in result['lots']:
+        if lot['match'] is None:
+            print(f"    - sem preço: {lot['carta']} ({lot['idioma']}/{lot['estado']})")
+    print("-" * 60)